@@ -0,0 +1,71 @@
+# app/async_exec.py
+"""
+Run blocking MySQL and Bedrock calls off the event loop on a bounded thread pool
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .config import ASYNC_MODE, ASYNC_EXECUTOR_WORKERS
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_stats = {"submitted": 0, "in_flight": 0, "max_in_flight": 0}
+_stats_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Dedicated executor for blocking I/O, sized independently of the default loop executor"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=ASYNC_EXECUTOR_WORKERS, thread_name_prefix="blocking-io")
+    return _executor
+
+
+def shutdown_executor(wait: bool = True):
+    """Stop the executor; a new one is created on the next run_blocking call"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _tracked(func: Callable, *args, **kwargs):
+    with _stats_lock:
+        _stats["in_flight"] += 1
+        _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    try:
+        return func(*args, **kwargs)
+    finally:
+        with _stats_lock:
+            _stats["in_flight"] -= 1
+
+
+async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """Await a blocking call.
+
+    In "threadpool" mode the call runs on the dedicated executor with the caller's
+    context variables, so the event loop keeps serving other requests. "inline"
+    mode calls it directly (the previous behaviour; useful for comparison).
+    """
+    if ASYNC_MODE == "inline":
+        return func(*args, **kwargs)
+    with _stats_lock:
+        _stats["submitted"] += 1
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, _tracked, func, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), call)
+
+
+def get_executor_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({"mode": ASYNC_MODE, "max_workers": ASYNC_EXECUTOR_WORKERS})
+    return stats
@@ -0,0 +1,188 @@
+# app/batch.py
+"""
+Batch NL->SQL: one schema load, deduplicated questions, AIMD-bounded Bedrock fan-out, parallel execution
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from .config import (
+    BATCH_MAX_QUESTIONS, BATCH_BEDROCK_CONCURRENCY, BATCH_QUERY_CONCURRENCY,
+    BATCH_MAX_RETRIES, BATCH_BACKOFF_BASE, BATCH_BACKOFF_MAX
+)
+from .pagination import execute_sql_page
+from .planner import QueryRejectedError, gate_generated_sql
+from .sql_validation import SQLValidationError, validate_generated_sql
+from .schema_prompt import compile_schema_prompt
+from .sql_cache import generate_sql_cached, normalize_question
+from .timeouts import RequestBudget, run_with_deadline
+
+_THROTTLING_CODES = {
+    "ThrottlingException", "TooManyRequestsException", "ServiceUnavailableException",
+    "ModelNotReadyException", "RequestLimitExceeded"
+}
+
+
+def is_throttling_error(exc: BaseException) -> bool:
+    """True when a Bedrock ClientError with a throttling code is anywhere in the exception chain"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, ClientError) and exc.response.get("Error", {}).get("Code") in _THROTTLING_CODES:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and grows by ~1 per window of successes (AIMD)"""
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = float(self.max_limit)
+        self.throttled = 0
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def release(self, throttled: bool = False):
+        async with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.limit = max(self.min_limit, self.limit / 2)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter keeps retries from a throttled burst from landing together
+    return random.uniform(0, min(BATCH_BACKOFF_MAX, BATCH_BACKOFF_BASE * 2 ** attempt))
+
+
+async def _generate(question: str, schema_text: str, limiter: AdaptiveLimiter):
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        throttled = False
+        try:
+            return await run_with_deadline(
+                generate_sql_cached, question, schema_text, timeout=RequestBudget().for_generation()
+            )
+        except Exception as e:
+            throttled = is_throttling_error(e)
+            if not throttled or attempt >= BATCH_MAX_RETRIES:
+                raise
+        finally:
+            await limiter.release(throttled)
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+async def _run_one(question: str, schema: Dict[str, Any], execute: bool, page_size: Optional[int],
+                   limiter: AdaptiveLimiter, db_slots: asyncio.Semaphore) -> Dict[str, Any]:
+    started = time.perf_counter()
+    item: Dict[str, Any] = {}
+    try:
+        schema_prompt = compile_schema_prompt(schema, question)
+        sql_query, cache_hit = await _generate(question, schema_prompt.text, limiter)
+        item.update({"generated_sql": sql_query, "cache_hit": cache_hit})
+        # Repairs call Bedrock, so validation holds a generation slot (the check itself is local and quick)
+        await limiter.acquire()
+        try:
+            checked = await run_with_deadline(
+                validate_generated_sql, question, sql_query, schema, schema_prompt.text,
+                timeout=RequestBudget().for_generation()
+            )
+        finally:
+            await limiter.release()
+        sql_query = checked.sql
+        item.update({"generated_sql": sql_query, "validation": checked.report})
+        if execute:
+            async with db_slots:
+                gate = await run_with_deadline(
+                    gate_generated_sql, question, sql_query, schema_prompt.text, schema=schema,
+                    timeout=RequestBudget().for_generation()
+                )
+                item.update({"generated_sql": gate.sql, "plan": gate.plan})
+                result, _ = await run_with_deadline(
+                    execute_sql_page, gate.sql, gate.page_size or page_size, None, max_age=0, cap=gate.page_size,
+                    timeout=RequestBudget().for_execution()
+                )
+            item["result"] = result
+        item["status"] = "success"
+    except QueryRejectedError as e:
+        item.update({"status": "error", "error": str(e), "plan": e.plan})
+    except SQLValidationError as e:
+        item.update({"status": "error", "error": str(e), "validation": e.report})
+    except Exception as e:
+        item.update({"status": "error", "error": str(e)})
+    item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return item
+
+
+def check_batch_size(questions: List[str]):
+    if not questions:
+        raise ValueError("Batch has no questions")
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        raise ValueError(f"Batch has {len(questions)} questions; the limit is {BATCH_MAX_QUESTIONS}")
+
+
+async def run_batch(questions: List[str], schema: Dict[str, Any], execute: bool = False,
+                    page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Yield one {"index", "question", ...} item per question as it finishes, then a summary.
+
+    The schema is loaded once by the caller; each question gets its own pruned
+    prompt from it. Identical questions (after normalization) are generated and
+    executed once and reported under each of their indexes. Bedrock calls share
+    an AdaptiveLimiter; execution is bounded by BATCH_QUERY_CONCURRENCY slots.
+    Cancelling the consumer cancels outstanding work and kills running statements.
+    """
+    check_batch_size(questions)
+    started = time.perf_counter()
+
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(normalize_question(question), []).append(index)
+
+    limiter = AdaptiveLimiter(BATCH_BEDROCK_CONCURRENCY)
+    db_slots = asyncio.Semaphore(max(BATCH_QUERY_CONCURRENCY, 1))
+
+    async def run_group(indexes: List[int]):
+        return indexes, await _run_one(questions[indexes[0]], schema, execute, page_size, limiter, db_slots)
+
+    tasks = [asyncio.ensure_future(run_group(indexes)) for indexes in groups.values()]
+    succeeded = failed = 0
+    try:
+        for finished in asyncio.as_completed(tasks):
+            indexes, item = await finished
+            for index in indexes:
+                if item["status"] == "success":
+                    succeeded += 1
+                else:
+                    failed += 1
+                yield {"index": index, "question": questions[index], **item}
+    finally:
+        # Consumer went away mid-batch: stop the remaining work (statements are killed via run_with_deadline)
+        for task in tasks:
+            task.cancel()
+
+    yield {"summary": {
+        "total": len(questions),
+        "unique": len(groups),
+        "succeeded": succeeded,
+        "failed": failed,
+        "throttled": limiter.throttled,
+        "final_concurrency": int(limiter.limit),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+    }}
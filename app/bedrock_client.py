@@ -0,0 +1,95 @@
+# app/bedrock_client.py
+"""
+Process-wide Bedrock runtime client with a tuned botocore connection pool
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import boto3
+from botocore.config import Config
+
+from .config import (
+    AWS_REGION, BEDROCK_ENDPOINT_URL, BEDROCK_MAX_POOL_CONNECTIONS,
+    BEDROCK_RETRY_MODE, BEDROCK_MAX_ATTEMPTS, BEDROCK_CONNECT_TIMEOUT, BEDROCK_READ_TIMEOUT,
+    BEDROCK_STREAMING
+)
+
+_client = None
+_client_lock = threading.Lock()
+_stats = {"created": 0, "requests": 0}
+_stream_stats = {"streams": 0, "stopped_early": 0, "ttft_ms_total": 0.0, "ttft_ms_max": 0.0, "total_ms_total": 0.0}
+
+
+def _create_client():
+    config = Config(
+        region_name=AWS_REGION,
+        max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+        connect_timeout=BEDROCK_CONNECT_TIMEOUT,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={"mode": BEDROCK_RETRY_MODE, "max_attempts": BEDROCK_MAX_ATTEMPTS},
+        tcp_keepalive=True
+    )
+    # Credential and endpoint resolution happen once here; the client itself is thread-safe
+    return boto3.session.Session().client(
+        service_name="bedrock-runtime",
+        region_name=AWS_REGION,
+        endpoint_url=BEDROCK_ENDPOINT_URL or None,
+        config=config
+    )
+
+
+def get_bedrock_client():
+    """Return the shared bedrock-runtime client, creating it on first use"""
+    global _client
+    client = _client
+    if client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+                _stats["created"] += 1
+            client = _client
+    with _client_lock:
+        _stats["requests"] += 1
+    return client
+
+
+def reset_bedrock_client():
+    """Drop the shared client so the next call builds a new one (e.g. after config changes)"""
+    global _client
+    with _client_lock:
+        _client = None
+
+
+def record_stream(ttft_ms: Optional[float], total_ms: float, stopped_early: bool):
+    """Account one ConverseStream call (time to first token, total time, early stop)"""
+    with _client_lock:
+        _stream_stats["streams"] += 1
+        _stream_stats["stopped_early"] += int(stopped_early)
+        _stream_stats["total_ms_total"] += total_ms
+        if ttft_ms is not None:
+            _stream_stats["ttft_ms_total"] += ttft_ms
+            _stream_stats["ttft_ms_max"] = max(_stream_stats["ttft_ms_max"], ttft_ms)
+
+
+def get_bedrock_client_stats() -> Dict[str, Any]:
+    """How often the shared client was handed out versus created, plus streaming latencies"""
+    with _client_lock:
+        created = _stats["created"]
+        requests = _stats["requests"]
+        streams = dict(_stream_stats)
+    count = streams["streams"]
+    return {
+        "created": created,
+        "requests": requests,
+        "reused": max(0, requests - created),
+        "endpoint_url": BEDROCK_ENDPOINT_URL or None,
+        "max_pool_connections": BEDROCK_MAX_POOL_CONNECTIONS,
+        "retry_mode": BEDROCK_RETRY_MODE,
+        "streaming": BEDROCK_STREAMING,
+        "streams": count,
+        "streams_stopped_early": streams["stopped_early"],
+        "ttft_ms_avg": round(streams["ttft_ms_total"] / count, 1) if count else 0.0,
+        "ttft_ms_max": round(streams["ttft_ms_max"], 1),
+        "stream_ms_avg": round(streams["total_ms_total"] / count, 1) if count else 0.0
+    }
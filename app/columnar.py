@@ -0,0 +1,183 @@
+# app/columnar.py
+"""
+Columnar result encodings for /sql: Arrow IPC stream, Parquet and compact {columns, data} JSON
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mysql.connector.constants import FieldType
+
+from .serialization import RowSerializer, column_converters, dumps_bytes
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow is optional
+    pa = None
+    pq = None
+
+COLUMNAR_MEDIA_TYPES = {
+    "columnar": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+ARROW_FORMATS = {"arrow", "parquet"}
+
+RowBatches = Iterator[Sequence[Sequence[Any]]]
+
+# cursor.description flags
+_UNSIGNED_FLAG = 32
+_BINARY_FLAG = 128
+
+_INTEGER_TYPES = {
+    FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR,
+    FieldType.BIT
+}
+_BLOB_TYPES = {
+    FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING,
+    FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB
+}
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def _arrow_type(type_code: int, flags: Optional[int]):
+    """Arrow type for a column and whether its values go through the JSON column converter first"""
+    flags = flags or 0
+    if type_code in _INTEGER_TYPES:
+        return (pa.uint64() if flags & _UNSIGNED_FLAG else pa.int64()), False
+    if type_code in (FieldType.FLOAT, FieldType.DOUBLE):
+        return pa.float64(), False
+    if type_code in (FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        # Same float values the JSON formats return; DESCRIBE-level precision is not in the description
+        return pa.float64(), True
+    if type_code in (FieldType.DATE, FieldType.NEWDATE):
+        return pa.date32(), False
+    if type_code in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us"), False
+    if type_code == FieldType.SET:
+        return pa.list_(pa.string()), True
+    if type_code == FieldType.NULL:
+        return pa.null(), False
+    if type_code in _BLOB_TYPES and flags & _BINARY_FLAG:
+        # BINARY/VARBINARY/BLOB keep their bytes; Arrow has a proper binary type
+        return pa.binary(), False
+    # TIME, ENUM, JSON, text and anything unrecognised travel as strings
+    return pa.string(), True
+
+
+def arrow_schema(description: Sequence[Sequence[Any]],
+                 metadata: Optional[Dict[str, str]] = None) -> Tuple[Any, List[Any]]:
+    """Arrow schema for a cursor.description plus the converter (or None) to apply per column"""
+    fields = []
+    converters = []
+    json_converters = column_converters(description)
+    for column, json_converter in zip(description, json_converters):
+        flags = column[7] if len(column) > 7 else None
+        arrow_type, convert = _arrow_type(column[1], flags)
+        fields.append(pa.field(column[0], arrow_type))
+        converters.append(json_converter if convert else None)
+    return pa.schema(fields, metadata=metadata), converters
+
+
+def record_batch(rows: Sequence[Sequence[Any]], schema, converters: List[Any]):
+    """One Arrow RecordBatch from a batch of raw tuple rows, built column by column"""
+    if not rows:
+        return pa.RecordBatch.from_pylist([], schema=schema)
+    columns = list(zip(*rows))
+    arrays = []
+    for values, field, converter in zip(columns, schema, converters):
+        if converter is not None:
+            values = converter(values)
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _DrainSink:
+    """Write-only file object whose buffered bytes are handed out as response chunks.
+
+    tell() keeps counting across drains, which the Parquet writer needs for its footer offsets.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def arrow_chunks(description: Sequence[Sequence[Any]], batches: RowBatches,
+                 metadata: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    """Arrow IPC stream: the schema message, then one record batch message per fetched batch"""
+    schema, converters = arrow_schema(description, metadata)
+    sink = _DrainSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    yield sink.drain()
+    for batch in batches:
+        if batch:
+            writer.write_batch(record_batch(batch, schema, converters))
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def parquet_chunks(description: Sequence[Sequence[Any]], batches: RowBatches,
+                   metadata: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    """Parquet file with one row group per fetched batch, streamed as each group is written"""
+    schema, converters = arrow_schema(description, metadata)
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    yield sink.drain()
+    for batch in batches:
+        if batch:
+            writer.write_batch(record_batch(batch, schema, converters))
+            yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def columnar_json_chunks(envelope: Dict[str, Any], serializer: RowSerializer,
+                         batches: RowBatches) -> Iterator[bytes]:
+    """The /sql response document with result as {columns, data: [[...], ...], row_count}"""
+    head = dumps_bytes(envelope)[:-1]
+    separator = b"," if envelope else b""
+    yield head + separator + b'"result":{"columns":' + dumps_bytes(serializer.columns) + b',"data":['
+    row_count = 0
+    for batch in batches:
+        if not batch:
+            continue
+        prefix = b"," if row_count else b""
+        yield prefix + serializer.encode_values(batch)
+        row_count += len(batch)
+    yield b'],"row_count":' + str(row_count).encode("ascii") + b"}}"
+
+
+def columnar_chunks(envelope: Dict[str, Any], serializer: RowSerializer,
+                    batches: RowBatches, fmt: str) -> Iterator[bytes]:
+    """Chunks for one of COLUMNAR_MEDIA_TYPES; Arrow formats carry the envelope as schema metadata"""
+    if fmt == "columnar":
+        return columnar_json_chunks(envelope, serializer, batches)
+    metadata = {key: str(value) for key, value in envelope.items()}
+    if fmt == "arrow":
+        return arrow_chunks(serializer.description, batches, metadata)
+    return parquet_chunks(serializer.description, batches, metadata)
@@ -1,4 +1,3 @@
-# app/config.py
 import os
 from dotenv import load_dotenv
 
@@ -9,6 +8,139 @@ DB_PORT = int(os.getenv("DB_PORT", 3306))
 DB_NAME = os.getenv("DB_NAME", "mcpdemo1")
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASS = os.getenv("DB_PASSWORD", "password")
+# Read replicas of the DB_* database (comma-separated host[:port]; same user, password and database)
+DB_REPLICAS = [r.strip() for r in os.getenv("DB_REPLICAS", "").split(",") if r.strip()]
+
+# Connection pool
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", 10))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", 1800))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", 300))
+DB_POOL_HEALTH_CHECK = os.getenv("DB_POOL_HEALTH_CHECK", "true").lower() == "true"
+DB_POOL_REAP_INTERVAL = float(os.getenv("DB_POOL_REAP_INTERVAL", 30))
+
+# Datasources: DB_* (plus DB_REPLICAS) is the datasource "default"; DATASOURCES adds named ones as a JSON
+# object, or @path to a JSON file. Reads go to healthy replicas ("round_robin" or "least_in_flight"),
+# failing over to the primary; endpoints are re-checked every DATASOURCE_HEALTH_INTERVAL seconds
+DATASOURCES = os.getenv("DATASOURCES", "")
+DEFAULT_DATASOURCE = os.getenv("DEFAULT_DATASOURCE", "default")
+DATASOURCE_BALANCE = os.getenv("DATASOURCE_BALANCE", "round_robin").lower()
+DATASOURCE_READ_FROM_PRIMARY = os.getenv("DATASOURCE_READ_FROM_PRIMARY", "false").lower() == "true"
+DATASOURCE_HEALTH_INTERVAL = float(os.getenv("DATASOURCE_HEALTH_INTERVAL", 10))
+DATASOURCE_HEALTH_TIMEOUT = float(os.getenv("DATASOURCE_HEALTH_TIMEOUT", 2))
+
+# Schema cache
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", 60))
+SCHEMA_CACHE_CHANGE_DETECTION = os.getenv("SCHEMA_CACHE_CHANGE_DETECTION", "true").lower() == "true"
+
+# Schema introspection
+SCHEMA_INCLUDE_SAMPLES = os.getenv("SCHEMA_INCLUDE_SAMPLES", "true").lower() == "true"
+SCHEMA_SAMPLE_ROWS = int(os.getenv("SCHEMA_SAMPLE_ROWS", 3))
+SCHEMA_SAMPLE_WORKERS = int(os.getenv("SCHEMA_SAMPLE_WORKERS", 4))
+
+# Schema prompt sent to Bedrock
+SCHEMA_PROMPT_PRUNE = os.getenv("SCHEMA_PROMPT_PRUNE", "true").lower() == "true"
+SCHEMA_PROMPT_MAX_TABLES = int(os.getenv("SCHEMA_PROMPT_MAX_TABLES", 15))
+SCHEMA_PROMPT_MAX_COLUMNS = int(os.getenv("SCHEMA_PROMPT_MAX_COLUMNS", 40))
+
+# Generated-SQL cache (backend: memory, sqlite or off; fuzzy threshold 0 disables fuzzy matching)
+SQL_CACHE_BACKEND = os.getenv("SQL_CACHE_BACKEND", "memory").lower()
+SQL_CACHE_PATH = os.getenv("SQL_CACHE_PATH", "nl_sql_cache.sqlite3")
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", 1000))
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", 3600))
+SQL_CACHE_FUZZY_THRESHOLD = float(os.getenv("SQL_CACHE_FUZZY_THRESHOLD", 0))
+
+# Query-result cache (sizes in bytes, TTL in seconds)
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 500))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESULT_CACHE_MAX_ENTRY_BYTES", 4 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 300))
+RESULT_CACHE_CHECKSUM = os.getenv("RESULT_CACHE_CHECKSUM", "false").lower() == "true"
+
+# Async execution of blocking calls ("threadpool" or "inline")
+ASYNC_MODE = os.getenv("ASYNC_MODE", "threadpool").lower()
+ASYNC_EXECUTOR_WORKERS = int(os.getenv("ASYNC_EXECUTOR_WORKERS", 32))
+
+# Streaming responses (rows fetched from MySQL per batch)
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 1000))
+
+# Buffered /sql, /query and MCP results are paged; a LIMIT is injected when the query has none
+# (QUERY_ROW_LIMIT=0 disables the default limit; page_size requests are capped at QUERY_MAX_PAGE_SIZE)
+QUERY_ROW_LIMIT = int(os.getenv("QUERY_ROW_LIMIT", 1000))
+QUERY_MAX_PAGE_SIZE = int(os.getenv("QUERY_MAX_PAGE_SIZE", 10000))
+# Key that signs pagination cursors; the launcher generates one for its workers when unset
+CURSOR_SECRET = os.getenv("CURSOR_SECRET", "")
+
+# Time budgets in seconds (0 disables): a whole request, Bedrock's share of it, and one SQL statement
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 60))
+GENERATION_TIMEOUT_SHARE = float(os.getenv("GENERATION_TIMEOUT_SHARE", 0.5))
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", 30))
+# Streamed results (exports) run past QUERY_TIMEOUT; they get STREAM_TIMEOUT unless the request sets a timeout
+STREAM_TIMEOUT = float(os.getenv("STREAM_TIMEOUT", 0))
+
+# EXPLAIN gate for generated SQL in /query and query_database: "off", "report" (attach the plan),
+# "reject", "regenerate" (ask Bedrock again with the plan as feedback) or "limit" (force a small LIMIT)
+PLAN_GATE_POLICY = os.getenv("PLAN_GATE_POLICY", "report").lower()
+PLAN_MAX_ROWS_EXAMINED = int(os.getenv("PLAN_MAX_ROWS_EXAMINED", 1000000))
+PLAN_MAX_COST = float(os.getenv("PLAN_MAX_COST", 0))
+PLAN_FULL_SCAN_MIN_ROWS = int(os.getenv("PLAN_FULL_SCAN_MIN_ROWS", 100000))
+PLAN_MAX_REGENERATIONS = int(os.getenv("PLAN_MAX_REGENERATIONS", 1))
+PLAN_FORCED_LIMIT = int(os.getenv("PLAN_FORCED_LIMIT", 100))
+
+# Check generated SQL's tables and columns against the cached schema before running it; on problems
+# ask Bedrock again with them, at most SQL_REPAIR_MAX_ATTEMPTS times
+SQL_VALIDATION = os.getenv("SQL_VALIDATION", "true").lower() == "true"
+SQL_REPAIR_MAX_ATTEMPTS = int(os.getenv("SQL_REPAIR_MAX_ATTEMPTS", 2))
+
+# Read-only policy applied to every statement before it reaches MySQL (comma-separated lists):
+# tables that may be read (empty = any), schemas that may not, functions refused on top of the
+# built-in SLEEP/BENCHMARK/GET_LOCK/LOAD_FILE/... list, and how many verdicts to cache
+SQL_ALLOWED_TABLES = {t.strip().lower() for t in os.getenv("SQL_ALLOWED_TABLES", "").split(",") if t.strip()}
+SQL_BLOCKED_SCHEMAS = {
+    s.strip().lower() for s in os.getenv("SQL_BLOCKED_SCHEMAS", "mysql,performance_schema,sys").split(",") if s.strip()
+}
+SQL_DENIED_FUNCTIONS = {f.strip().upper() for f in os.getenv("SQL_DENIED_FUNCTIONS", "").split(",") if f.strip()}
+SQL_SAFETY_CACHE_SIZE = int(os.getenv("SQL_SAFETY_CACHE_SIZE", 4096))
+
+# Batch endpoints: questions per request, concurrent Bedrock calls (halved on throttling, then
+# grown back), concurrent executions, and retry backoff in seconds for throttled calls
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 500))
+BATCH_BEDROCK_CONCURRENCY = int(os.getenv("BATCH_BEDROCK_CONCURRENCY", 8))
+BATCH_QUERY_CONCURRENCY = int(os.getenv("BATCH_QUERY_CONCURRENCY", DB_POOL_MAX_SIZE))
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", 5))
+BATCH_BACKOFF_BASE = float(os.getenv("BATCH_BACKOFF_BASE", 0.5))
+BATCH_BACKOFF_MAX = float(os.getenv("BATCH_BACKOFF_MAX", 20))
+
+# Add a per-stage "timings" block to every response (otherwise only when a request asks with debug=true)
+DEBUG_TIMINGS = os.getenv("DEBUG_TIMINGS", "false").lower() == "true"
+
+# OpenTelemetry span export: "off", "console" (stdout, for testing) or "otlp" (OTEL_EXPORTER_OTLP_ENDPOINT)
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "off").lower()
+TRACING_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "mysql-nlp")
+
+# Server startup: check MySQL/Bedrock settings before serving (exit on failure), then warm the pool,
+# Bedrock client, schema and caches in each worker before it accepts requests
+STARTUP_CHECK = os.getenv("STARTUP_CHECK", "true").lower() == "true"
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+# MCP server over streamable HTTP (start_mcp_server.py --transport http): listen address, and how many
+# tool calls one client session may run at once (further calls wait; 0 = unlimited)
+MCP_HTTP_HOST = os.getenv("MCP_HTTP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", 8001))
+MCP_SESSION_CONCURRENCY = int(os.getenv("MCP_SESSION_CONCURRENCY", 4))
 
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 BEDROCK_MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "amazon.nova-pro-v1:0")
+
+# Bedrock runtime client (BEDROCK_ENDPOINT_URL points at a local stub for testing)
+BEDROCK_ENDPOINT_URL = os.getenv("BEDROCK_ENDPOINT_URL", "")
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", 50))
+BEDROCK_RETRY_MODE = os.getenv("BEDROCK_RETRY_MODE", "adaptive")
+BEDROCK_MAX_ATTEMPTS = int(os.getenv("BEDROCK_MAX_ATTEMPTS", 3))
+BEDROCK_CONNECT_TIMEOUT = float(os.getenv("BEDROCK_CONNECT_TIMEOUT", 5))
+BEDROCK_READ_TIMEOUT = float(os.getenv("BEDROCK_READ_TIMEOUT", 60))
+
+# Generate with ConverseStream and stop reading at the end of the SQL statement
+BEDROCK_STREAMING = os.getenv("BEDROCK_STREAMING", "false").lower() == "true"
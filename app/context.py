@@ -0,0 +1,91 @@
+# app/context.py
+"""
+Long-lived application context for the MCP server: the datasources, Bedrock client, schemas and caches of one process
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .async_exec import run_blocking
+from .bedrock_client import get_bedrock_client
+from .config import STARTUP_WARMUP
+from .datasources import DataSourceRegistry, get_datasources
+from .result_cache import ResultCache, get_result_cache
+from .schema_cache import get_cached_schema, invalidate_schema_cache
+from .sql_cache import SQLCache, get_sql_cache
+from .startup import record_ready, shutdown, warmup
+
+logger = logging.getLogger(__name__)
+
+
+class AppContext:
+    """Resources shared by every tool call for as long as the server process runs.
+
+    Creating the context is cheap; the expensive part (pool connections, Bedrock
+    client, schema introspection) runs in the background once a client session
+    starts, so the first query_database call finds them warm instead of paying
+    for them.
+    """
+
+    def __init__(self):
+        self.datasources: DataSourceRegistry = get_datasources()
+        self.sql_cache: Optional[SQLCache] = get_sql_cache()
+        self.result_cache: Optional[ResultCache] = get_result_cache()
+        self.warmup_report: Optional[Dict[str, Any]] = None
+        self._warmup_task: Optional[asyncio.Task] = None
+
+    @property
+    def bedrock_client(self):
+        return get_bedrock_client()
+
+    def start_warmup(self) -> Optional[asyncio.Task]:
+        """Warm everything on the executor without blocking the session; only the first call does work"""
+        if self._warmup_task is None and STARTUP_WARMUP:
+            self._warmup_task = asyncio.create_task(self._warm())
+        return self._warmup_task
+
+    async def _warm(self):
+        self.warmup_report = await run_blocking(warmup)
+        record_ready(self.warmup_report)
+        logger.info(f"Warmup finished in {self.warmup_report['steps']['total_ms']} ms")
+
+    async def schema(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Schema of the datasource the tool call selected.
+
+        A call made while warmup is still loading it waits on the cache lock instead of loading it twice.
+        """
+        return await run_blocking(get_cached_schema, force_refresh=force_refresh)
+
+    def invalidate_schema(self):
+        invalidate_schema_cache()
+
+    @asynccontextmanager
+    async def lifespan(self, _server: Any) -> AsyncIterator["AppContext"]:
+        """MCP Server lifespan: entered as a session initializes, yields this context to the handlers.
+
+        The context outlives the session; close() releases it when the server exits.
+        """
+        self.start_warmup()
+        yield self
+
+    async def close(self):
+        if self._warmup_task is not None and not self._warmup_task.done():
+            await asyncio.wait([self._warmup_task])
+        shutdown()
+
+
+_context: Optional[AppContext] = None
+_context_lock = threading.Lock()
+
+
+def get_app_context() -> AppContext:
+    """Process-wide context, created on first use (by mcp_server.main or by direct handle_call_tool callers)"""
+    global _context
+    if _context is None:
+        with _context_lock:
+            if _context is None:
+                _context = AppContext()
+    return _context
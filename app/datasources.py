@@ -0,0 +1,407 @@
+# app/datasources.py
+"""
+Named MySQL datasources, each a primary plus read replicas with their own pools, load balancing and failover
+"""
+
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from .config import (
+    DATASOURCE_BALANCE, DATASOURCE_HEALTH_INTERVAL, DATASOURCE_HEALTH_TIMEOUT, DATASOURCE_READ_FROM_PRIMARY,
+    DATASOURCES, DB_HOST, DB_NAME, DB_PASS, DB_POOL_ACQUIRE_TIMEOUT, DB_POOL_HEALTH_CHECK, DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_MAX_LIFETIME, DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE, DB_POOL_REAP_INTERVAL, DB_PORT, DB_REPLICAS, DB_USER,
+    DEFAULT_DATASOURCE
+)
+from .db_pool import ConnectionPool, PoolTimeoutError, PooledConnection, _connect_mysql
+
+logger = logging.getLogger(__name__)
+
+BALANCE_POLICIES = {"round_robin", "least_in_flight"}
+
+_ENDPOINT_KEYS = {"host", "port", "user", "password", "password_env"}
+_DATASOURCE_KEYS = _ENDPOINT_KEYS | {
+    "database", "replicas", "balance", "read_from_primary", "pool_min_size", "pool_max_size"
+}
+
+
+class UnknownDataSourceError(ValueError):
+    """Raised when a request names a datasource that is not configured"""
+
+
+class Endpoint:
+    """One MySQL server of a datasource: its connection pool and whether it is taking traffic"""
+
+    def __init__(self, role: str, host: str, port: int, user: str, password: str, database: str,
+                 min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE):
+        self.role = role
+        self.address = f"{host}:{port}"
+        self._options = {"host": host, "port": port, "user": user, "password": password, "database": database}
+        self.pool = ConnectionPool(
+            functools.partial(_connect_mysql, **self._options),
+            min_size=min_size,
+            max_size=max_size,
+            acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+            max_lifetime=DB_POOL_MAX_LIFETIME,
+            idle_timeout=DB_POOL_IDLE_TIMEOUT,
+            health_check=DB_POOL_HEALTH_CHECK,
+            reap_interval=DB_POOL_REAP_INTERVAL
+        )
+        self.healthy = True
+        self.last_error: Optional[str] = None
+        self._checked_at: Optional[float] = None
+        self._marked_down = 0
+        self._lock = threading.Lock()
+
+    def check(self, timeout: float = DATASOURCE_HEALTH_TIMEOUT) -> bool:
+        """SELECT 1 over a fresh connection (the pool may be busy or hold stale connections)"""
+        try:
+            conn = _connect_mysql(**self._options, connection_timeout=timeout)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            self.mark_down(e)
+            return False
+        finally:
+            self._checked_at = time.time()
+        self.mark_up()
+        return True
+
+    def mark_down(self, error: Exception):
+        with self._lock:
+            self.last_error = str(error)
+            if not self.healthy:
+                return
+            self.healthy = False
+            self._marked_down += 1
+        logger.warning(f"MySQL {self.role} {self.address} taken out of rotation: {error}")
+
+    def mark_up(self):
+        if self.healthy:
+            return
+        with self._lock:
+            self.healthy = True
+            self.last_error = None
+        logger.info(f"MySQL {self.role} {self.address} back in rotation")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "role": self.role,
+            "address": self.address,
+            "healthy": self.healthy,
+            "last_error": self.last_error,
+            "checked_at": round(self._checked_at, 3) if self._checked_at else None,
+            "marked_down": self._marked_down,
+            "pool": self.pool.stats()
+        }
+
+
+# Endpoint every acquire() of the running block must use (see DataSource.pin_endpoint)
+_pinned_endpoint: contextvars.ContextVar = contextvars.ContextVar("pinned_endpoint", default=None)
+
+
+class DataSource:
+    """A database reachable through a primary and any number of read replicas.
+
+    Every statement this service runs is a read, so connections come from the
+    replicas, picked by the balance policy; the primary serves reads only with
+    read_from_primary, when there are no replicas, or when every replica is down.
+    An endpoint that fails to connect is taken out of rotation at once and the
+    next one is tried; the registry's health checks bring it back.
+    """
+
+    def __init__(self, name: str, database: str, primary: Endpoint, replicas: List[Endpoint],
+                 balance: str = DATASOURCE_BALANCE, read_from_primary: bool = DATASOURCE_READ_FROM_PRIMARY):
+        self.name = name
+        self.database = database
+        self.primary = primary
+        self.replicas = replicas
+        self.balance = balance
+        self.read_from_primary = read_from_primary
+        self._turn = itertools.count()
+        self._failovers = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def endpoints(self) -> List[Endpoint]:
+        return [self.primary] + self.replicas
+
+    def readers(self) -> List[Endpoint]:
+        """Endpoints to try for the next read, best first"""
+        rotation = self.replicas + ([self.primary] if self.read_from_primary or not self.replicas else [])
+        candidates = [endpoint for endpoint in rotation if endpoint.healthy]
+        if candidates:
+            shift = next(self._turn) % len(candidates)
+            candidates = candidates[shift:] + candidates[:shift]
+            if self.balance == "least_in_flight":
+                # Stable sort: endpoints with equal load keep their round-robin order
+                candidates.sort(key=lambda endpoint: endpoint.pool.in_use)
+        if self.primary not in rotation and self.primary.healthy:
+            candidates.append(self.primary)
+        # With everything marked down the health state may be stale; trying beats failing outright
+        return candidates or self.endpoints
+
+    def acquire(self) -> PooledConnection:
+        """Borrow a connection from the best endpoint, failing over to the next on connection errors"""
+        pinned = _pinned_endpoint.get()
+        if pinned is not None and pinned in self.endpoints:
+            # No failover: the caller needs this server's view of the data
+            try:
+                return pinned.pool.acquire()
+            except PoolTimeoutError:
+                raise
+            except Exception as e:
+                pinned.mark_down(e)
+                raise
+        error = None
+        for endpoint in self.readers():
+            try:
+                conn = endpoint.pool.acquire()
+            except PoolTimeoutError:
+                # Busy rather than down: the caller's acquire timeout is already spent
+                raise
+            except Exception as e:
+                endpoint.mark_down(e)
+                error = e
+                continue
+            endpoint.mark_up()
+            if error is not None:
+                with self._stats_lock:
+                    self._failovers += 1
+            return conn
+        raise error
+
+    @contextmanager
+    def pin_endpoint(self) -> Iterator[Endpoint]:
+        """Send every acquire() in the block to one endpoint (the first reader), for reads that must agree.
+
+        Replicas apply writes at different times, so e.g. table versions and the
+        rows they describe have to come from the same server. No connection is
+        taken here; the block's first acquire() is the only one that pays for it.
+        """
+        endpoint = self.readers()[0]
+        token = _pinned_endpoint.set(endpoint)
+        try:
+            yield endpoint
+        finally:
+            _pinned_endpoint.reset(token)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "database": self.database,
+            "balance": self.balance,
+            "read_from_primary": self.read_from_primary,
+            "failovers": self._failovers,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints]
+        }
+
+
+class DataSourceRegistry:
+    """Every configured datasource by name, plus the background health checks of their endpoints"""
+
+    def __init__(self, datasources: Dict[str, DataSource], default: str,
+                 health_interval: float = DATASOURCE_HEALTH_INTERVAL,
+                 health_timeout: float = DATASOURCE_HEALTH_TIMEOUT):
+        if default not in datasources:
+            raise ValueError(f"DEFAULT_DATASOURCE={default!r} is not a configured datasource")
+        self.datasources = datasources
+        self.default = default
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._checker = None
+        self._checker_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def get(self, name: Optional[str] = None) -> DataSource:
+        """The named datasource, or the default one for None"""
+        self._ensure_health_checks()
+        datasource = self.datasources.get(name or self.default)
+        if datasource is None:
+            raise UnknownDataSourceError(f"Unknown database '{name}'; expected one of {', '.join(self.names())}")
+        return datasource
+
+    def names(self) -> List[str]:
+        return sorted(self.datasources)
+
+    def endpoints(self) -> Iterator[Endpoint]:
+        for datasource in self.datasources.values():
+            yield from datasource.endpoints
+
+    def check_health(self) -> Dict[str, bool]:
+        """Check every endpoint once; returns address -> healthy"""
+        return {endpoint.address: endpoint.check(self.health_timeout) for endpoint in self.endpoints()}
+
+    def warm(self) -> int:
+        """Open min_size connections on every endpoint; raises after trying all of them if any failed"""
+        created, failed = 0, []
+        for endpoint in self.endpoints():
+            try:
+                created += endpoint.pool.warm()
+            except Exception as e:
+                endpoint.mark_down(e)
+                failed.append(f"{endpoint.address}: {e}")
+        if failed:
+            raise RuntimeError("; ".join(failed))
+        return created
+
+    def max_connections(self) -> int:
+        return sum(endpoint.pool.max_size for endpoint in self.endpoints())
+
+    def close(self):
+        self._stop.set()
+        for endpoint in self.endpoints():
+            endpoint.pool.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "health_interval": self.health_interval,
+            "datasources": {name: self.datasources[name].stats() for name in self.names()}
+        }
+
+    def _ensure_health_checks(self):
+        # Only a datasource with more than one endpoint has anything to fail over to or back from
+        if self._checker is not None or self.health_interval <= 0:
+            return
+        if all(len(datasource.endpoints) == 1 for datasource in self.datasources.values()):
+            return
+        with self._checker_lock:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(target=self._health_loop, name="datasource-health", daemon=True)
+            self._checker.start()
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+
+def _server(spec: Dict[str, Any], base: Dict[str, Any]) -> Dict[str, Any]:
+    """host/port/user/password of one endpoint; what spec leaves out comes from base"""
+    password = os.getenv(spec["password_env"], "") if "password_env" in spec else spec.get("password", base["password"])
+    return {
+        "host": spec.get("host", base["host"]),
+        "port": int(spec.get("port", base["port"])),
+        "user": spec.get("user", base["user"]),
+        "password": password
+    }
+
+
+def _replica_spec(replica: Any) -> Dict[str, Any]:
+    if isinstance(replica, dict):
+        unknown = set(replica) - _ENDPOINT_KEYS
+        if unknown:
+            raise ValueError(f"unknown replica settings: {', '.join(sorted(unknown))}")
+        return replica
+    host, _, port = str(replica).partition(":")
+    return {"host": host, "port": int(port)} if port else {"host": host}
+
+
+def _datasource(name: str, spec: Dict[str, Any]) -> DataSource:
+    """Build one datasource; settings it leaves out come from DB_*, and replicas inherit the primary's"""
+    unknown = set(spec) - _DATASOURCE_KEYS
+    if unknown:
+        raise ValueError(f"datasource {name!r}: unknown settings: {', '.join(sorted(unknown))}")
+    balance = spec.get("balance", DATASOURCE_BALANCE)
+    if balance not in BALANCE_POLICIES:
+        raise ValueError(f"datasource {name!r}: balance {balance!r} is not one of {', '.join(sorted(BALANCE_POLICIES))}")
+    database = spec.get("database", DB_NAME)
+    min_size = int(spec.get("pool_min_size", DB_POOL_MIN_SIZE))
+    max_size = int(spec.get("pool_max_size", DB_POOL_MAX_SIZE))
+    server = _server(spec, {"host": DB_HOST, "port": DB_PORT, "user": DB_USER, "password": DB_PASS})
+    primary = Endpoint("primary", database=database, min_size=min_size, max_size=max_size, **server)
+    try:
+        replicas = [
+            Endpoint("replica", database=database, min_size=min_size, max_size=max_size,
+                     **_server(_replica_spec(replica), server))
+            for replica in spec.get("replicas", [])
+        ]
+    except ValueError as e:
+        raise ValueError(f"datasource {name!r}: {e}")
+    return DataSource(name, database, primary, replicas, balance=balance,
+                      read_from_primary=bool(spec.get("read_from_primary", DATASOURCE_READ_FROM_PRIMARY)))
+
+
+def load_datasources(config: str = DATASOURCES) -> DataSourceRegistry:
+    """Parse DATASOURCES (JSON, or @path to a JSON file) on top of the DB_* datasource "default"."""
+    specs: Dict[str, Any] = {"default": {"replicas": DB_REPLICAS}}
+    if config.strip():
+        try:
+            if config.startswith("@"):
+                with open(config[1:]) as f:
+                    configured = json.load(f)
+            else:
+                configured = json.loads(config)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"DATASOURCES could not be read: {e}")
+        if not isinstance(configured, dict) or not all(isinstance(spec, dict) for spec in configured.values()):
+            raise ValueError("DATASOURCES must be a JSON object of datasource name -> settings object")
+        specs.update(configured)
+    return DataSourceRegistry({name: _datasource(name, spec) for name, spec in specs.items()}, DEFAULT_DATASOURCE)
+
+
+_registry: Optional[DataSourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_datasources() -> DataSourceRegistry:
+    """Process-wide datasource registry, created on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = load_datasources()
+    return _registry
+
+
+def close_datasources():
+    """Close every pool and stop the health checks; a new registry is created on the next get_datasources call"""
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        registry.close()
+
+
+_current_datasource: contextvars.ContextVar = contextvars.ContextVar("datasource", default=None)
+
+
+def current_datasource() -> DataSource:
+    """Datasource selected for the running request (run_blocking carries it to worker threads), else the default"""
+    datasource = _current_datasource.get()
+    return datasource if datasource is not None else get_datasources().get()
+
+
+def select_datasource(name: Optional[str]) -> DataSource:
+    """Route the rest of the current request to the named datasource (None = the default).
+
+    Not undone on return: every HTTP request runs in its own task and context, and
+    a streamed response body that keeps fetching after the handler returns must
+    still see it. Use use_datasource() anywhere else.
+    """
+    datasource = get_datasources().get(name)
+    _current_datasource.set(datasource)
+    return datasource
+
+
+@contextmanager
+def use_datasource(name: Optional[str]) -> Iterator[DataSource]:
+    """Run the block against the named datasource (None = the default)"""
+    datasource = get_datasources().get(name)
+    token = _current_datasource.set(datasource)
+    try:
+        yield datasource
+    finally:
+        _current_datasource.reset(token)
@@ -0,0 +1,342 @@
+# app/db_pool.py
+"""
+Thread-safe MySQL connection pool with health checks, lifetime recycling and idle reaping
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import mysql.connector
+
+from .config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout"""
+
+
+class _PoolEntry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class PooledConnection:
+    """Borrowed connection; close() hands it back to the pool instead of closing it"""
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def pool(self) -> "ConnectionPool":
+        return self._pool
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry)
+
+    def discard(self):
+        """Close the underlying connection instead of returning it (e.g. mid-stream aborts)"""
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._discard(entry)
+
+    def __getattr__(self, name):
+        if self._entry is None:
+            raise AttributeError(f"Connection already returned to pool: {name}")
+        return getattr(self._entry.conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections shared by the API and MCP server"""
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        acquire_timeout: float = 10.0,
+        max_lifetime: float = 1800.0,
+        idle_timeout: float = 300.0,
+        health_check: bool = True,
+        reap_interval: float = 30.0
+    ):
+        if max_size < 1:
+            raise ValueError("Pool max_size must be at least 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.health_check = health_check
+        self.reap_interval = reap_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._total = 0
+        self._closed = False
+        self._reaper = None
+        self._reaper_stop = threading.Event()
+
+        self._created = 0
+        self._discarded = 0
+        self._recycled = 0
+        self._reaped = 0
+        self._health_check_failures = 0
+        self._acquires = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Borrow a connection, creating one if the pool is below max_size"""
+        self._ensure_reaper()
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise Exception("Connection pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._total < self.max_size:
+                        self._total += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"(pool size {self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if entry is None:
+                try:
+                    entry = _PoolEntry(self._connect())
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._created += 1
+            elif self._expired(entry):
+                self._discard(entry)
+                with self._cond:
+                    self._recycled += 1
+                continue
+            elif self.health_check and not self._is_healthy(entry.conn):
+                self._discard(entry)
+                with self._cond:
+                    self._health_check_failures += 1
+                continue
+
+            wait_time = time.monotonic() - started
+            with self._cond:
+                self._acquires += 1
+                if waited:
+                    self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+            return PooledConnection(self, entry)
+
+    def warm(self) -> int:
+        """Open connections until min_size is reached; returns how many were created"""
+        created = 0
+        while True:
+            with self._cond:
+                if self._closed or self._total >= self.min_size:
+                    return created
+                self._total += 1
+            try:
+                entry = _PoolEntry(self._connect())
+            except Exception:
+                with self._cond:
+                    self._total -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._created += 1
+                self._idle.appendleft(entry)
+                self._cond.notify()
+            created += 1
+
+    def reap(self) -> int:
+        """Close idle connections past their idle timeout or max lifetime"""
+        now = time.monotonic()
+        stale = []
+        with self._cond:
+            keep = deque()
+            # Oldest-used connections sit at the left of the deque
+            while self._idle:
+                entry = self._idle.popleft()
+                surplus = self._total - len(stale) > self.min_size
+                if self._expired(entry, now):
+                    stale.append(entry)
+                    self._recycled += 1
+                elif surplus and now - entry.last_used > self.idle_timeout:
+                    stale.append(entry)
+                    self._reaped += 1
+                else:
+                    keep.append(entry)
+            self._idle = keep
+        for entry in stale:
+            self._discard(entry)
+        return len(stale)
+
+    @property
+    def in_use(self) -> int:
+        """Borrowed connections right now (read without the lock; good enough for load balancing)"""
+        return self._total - len(self._idle)
+
+    def kill_query(self, connection_id: int):
+        """KILL QUERY a statement running on one of this pool's connections, on the same server"""
+        kill_query(connection_id, self._connect)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool utilisation and wait times"""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "total": self._total,
+                "in_use": self._total - idle,
+                "idle": idle,
+                "created": self._created,
+                "discarded": self._discarded,
+                "recycled": self._recycled,
+                "reaped": self._reaped,
+                "health_check_failures": self._health_check_failures,
+                "acquires": self._acquires,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_time_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_time_total * 1000 / self._acquires, 3) if self._acquires else 0.0,
+                "wait_time_max_ms": round(self._wait_time_max * 1000, 3)
+            }
+
+    def close(self):
+        """Close all idle connections and stop the reaper; borrowed ones close on return"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        self._reaper_stop.set()
+        for entry in idle:
+            self._discard(entry)
+
+    def _release(self, entry: _PoolEntry):
+        entry.last_used = time.monotonic()
+        with self._cond:
+            if not self._closed and not self._expired(entry, entry.last_used):
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+        self._discard(entry)
+
+    def _discard(self, entry: _PoolEntry):
+        try:
+            entry.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._total -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _expired(self, entry: _PoolEntry, now: Optional[float] = None) -> bool:
+        if self.max_lifetime <= 0:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - entry.created_at > self.max_lifetime
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    def _ensure_reaper(self):
+        if self._reaper is not None or self.reap_interval <= 0:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name="db-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        while not self._reaper_stop.wait(self.reap_interval):
+            try:
+                self.reap()
+                self.warm()
+            except Exception:
+                # The database may be briefly unreachable; try again next round
+                pass
+
+
+def _connect_mysql(host: str = DB_HOST, port: int = DB_PORT, user: str = DB_USER, password: str = DB_PASS,
+                   database: str = DB_NAME, connection_timeout: Optional[float] = None):
+    options = {"connection_timeout": connection_timeout} if connection_timeout else {}
+    conn = mysql.connector.connect(
+        host=host,
+        port=port,
+        user=user,
+        password=password,
+        database=database,
+        autocommit=True,
+        **options
+    )
+    # MySQL 8 caches information_schema.TABLES timestamps for up to a day by default;
+    # schema and result caches rely on them being current. MySQL 5.7 has no such cache.
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+    except mysql.connector.Error:
+        pass
+    finally:
+        cursor.close()
+    return conn
+
+
+def kill_query(connection_id: int, connect: Callable[[], Any] = _connect_mysql):
+    """Abort the statement running on another session; that connection itself stays usable.
+
+    Uses a short-lived connection outside the pool, which may be exhausted by the
+    very statements being killed. connect must reach the server running the statement.
+    """
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"KILL QUERY {int(connection_id)}")
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
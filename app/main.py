@@ -1,24 +1,81 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-import json
-from typing import Dict, Any
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Any, List, Optional
+import os
 from pydantic import BaseModel
-from .shared_utils import execute_sql_query, get_database_schema, generate_sql_from_nl
+from .datasources import UnknownDataSourceError, get_datasources, select_datasource
+from .bedrock_client import get_bedrock_client_stats
+from .schema_cache import get_cached_schema, get_schema_cache_stats, invalidate_schema_cache
+from .schema_prompt import compile_schema_prompt
+from .sql_cache import generate_sql_cached, get_sql_cache
+from .result_cache import get_result_cache
+from .pagination import check_cursor, decode_cursor, execute_sql_page, plan_page
+from .planner import QueryRejectedError, gate_generated_sql
+from .sql_validation import SQLValidationError, get_validation_stats, validate_generated_sql
+from .sql_safety import UnsafeQueryError, get_safety_stats
+from .async_exec import run_blocking, get_executor_stats
+from .timeouts import (
+    ClientDisconnectedError, QueryTimeoutError, RequestBudget, get_timeout_stats, run_with_deadline
+)
+from .streaming import (
+    SSE_HEADERS, STREAM_MEDIA_TYPES, chunked_response, generated_sql_sse_chunks, open_row_stream,
+    rows_streaming_response
+)
+from .columnar import ARROW_FORMATS, COLUMNAR_MEDIA_TYPES, arrow_available, columnar_chunks
+from .serialization import FastJSONResponse, dumps_bytes
+from .batch import check_batch_size, run_batch
+from .metrics import MetricsMiddleware, metrics_available, render_metrics, with_timings
+from .tracing import TracingMiddleware, fastapi_traces_requests, setup_tracing
+from .startup import LAUNCHED_AT_ENV, check_config, get_startup_report, record_ready, shutdown, warmup
+from .config import STARTUP_CHECK, STARTUP_WARMUP
 
 # Pydantic models for request validation
+# database names a configured datasource (see GET /databases); None means DEFAULT_DATASOURCE
 class QueryRequest(BaseModel):
     query: str
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    timeout: Optional[float] = None
+    database: Optional[str] = None
 
 class SQLRequest(BaseModel):
     sql: str
+    max_age: Optional[float] = None
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    timeout: Optional[float] = None
+    database: Optional[str] = None
 
 class GenerateSQLRequest(BaseModel):
     question: str
+    timeout: Optional[float] = None
+    database: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+    page_size: Optional[int] = None
+    database: Optional[str] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown: check, warm up, then release resources after the drain"""
+    if STARTUP_CHECK and not os.getenv(LAUNCHED_AT_ENV):
+        # Not started through start_fastapi_server.py, which checks once before spawning workers
+        problems = await run_blocking(check_config)
+        if problems:
+            raise RuntimeError("Startup check failed: " + "; ".join(problems))
+    record_ready(await run_blocking(warmup) if STARTUP_WARMUP else None)
+    yield
+    # Runs after uvicorn has drained in-flight requests; not on the executor it shuts down
+    shutdown()
 
 app = FastAPI(
     title="MySQL NLP API",
     description="Natural Language Processing API for MySQL databases using AWS Bedrock",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -30,6 +87,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency histograms and per-request stage timings
+app.add_middleware(MetricsMiddleware)
+
+# TRACING_EXPORTER picks the exporter; the middleware is outermost so its server span covers the whole request
+setup_tracing()
+if not fastapi_traces_requests():
+    app.add_middleware(TracingMiddleware)
+
 # All database and Bedrock operations are now handled by shared_utils
 
 
@@ -44,90 +109,404 @@ async def root():
             "/test-db": "Test database connection",
             "/query": "Process natural language query",
             "/schema": "Get database schema",
+            "/databases": "Configured datasources and the health of their primary and replicas",
             "/sql": "Execute raw SQL query",
-            "/generate-sql": "Generate SQL from natural language"
+            "/generate-sql": "Generate SQL from natural language",
+            "/batch/generate-sql": "Generate SQL for a list of questions (NDJSON, one line per question)",
+            "/batch/query": "Generate and execute SQL for a list of questions (NDJSON, one line per question)",
+            "/stats": "Connection pool, cache and Bedrock client statistics",
+            "/metrics": "Prometheus metrics: request and stage latency histograms, Bedrock tokens",
+            "/admin/schema/invalidate": "Drop the cached database schema"
         }
     }
 
+def _select_datasource(name: Optional[str]):
+    """Send the rest of this request to the named datasource"""
+    try:
+        select_datasource(name)
+    except UnknownDataSourceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/test-db")
-async def test_db_connection():
+async def test_db_connection(database: Optional[str] = None):
     """Simple endpoint to check DB connectivity."""
+    _select_datasource(database)
     try:
         from .shared_utils import get_db_connection
-        conn = get_db_connection()
+        conn = await run_blocking(get_db_connection)
         conn.close()
         return {"status": "success", "message": "Connected to MySQL database!"}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/stats")
+async def get_stats():
+    """Connection pool utilisation and wait times"""
+    sql_cache = get_sql_cache()
+    result_cache = get_result_cache()
+    return {
+        "status": "success",
+        "datasources": get_datasources().stats(),
+        "schema_cache": get_schema_cache_stats(),
+        "bedrock_client": get_bedrock_client_stats(),
+        "sql_cache": sql_cache.stats() if sql_cache else None,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "executor": get_executor_stats(),
+        "timeouts": get_timeout_stats(),
+        "sql_validation": get_validation_stats(),
+        "sql_safety": get_safety_stats(),
+        "startup": get_startup_report()
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of latency histograms and Bedrock token counters"""
+    if not metrics_available():
+        raise HTTPException(status_code=503, detail="prometheus_client is not installed on this server")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/admin/schema/invalidate")
+async def invalidate_schema(database: Optional[str] = None):
+    """Drop the cached schema so the next request reloads it from MySQL"""
+    _select_datasource(database)
+    invalidate_schema_cache()
+    return {"status": "success", "message": "Schema cache invalidated"}
+
+@app.get("/databases")
+async def list_databases():
+    """Datasources that database= may name, with the endpoints serving each and their health"""
+    registry = get_datasources()
+    return {
+        "status": "success",
+        "default": registry.default,
+        "databases": {
+            name: {
+                "database": datasource.database,
+                "balance": datasource.balance,
+                "endpoints": [
+                    {"role": endpoint.role, "address": endpoint.address, "healthy": endpoint.healthy}
+                    for endpoint in datasource.endpoints
+                ]
+            }
+            for name, datasource in registry.datasources.items()
+        }
+    }
+
 @app.get("/schema")
-async def get_schema():
+async def get_schema(refresh: bool = False, database: Optional[str] = None):
     """Get database schema information"""
+    _select_datasource(database)
     try:
-        schema = get_database_schema()
+        schema = await run_blocking(get_cached_schema, force_refresh=refresh)
         return {"status": "success", "schema": schema}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting schema: {str(e)}")
 
+def _check_stream_format(response_format: str):
+    if response_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{response_format}'; expected one of {sorted(STREAM_MEDIA_TYPES)}"
+        )
+
+# Accept media types that select a /sql response format when no format= is given
+_ACCEPT_FORMATS = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+    "application/x-ndjson": "ndjson",
+    "application/json": "json"
+}
+SQL_FORMATS = {**STREAM_MEDIA_TYPES, **COLUMNAR_MEDIA_TYPES}
+
+def _negotiate_sql_format(response_format: Optional[str], accept: Optional[str]) -> str:
+    """format= wins; otherwise the highest-q Accept entry we can produce; otherwise json"""
+    if response_format is None:
+        response_format = "json"
+        candidates = []
+        for position, item in enumerate((accept or "").split(",")):
+            media_type, _, params = item.partition(";")
+            quality = 1.0
+            for param in params.split(";"):
+                name, _, value = param.strip().partition("=")
+                if name == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            fmt = _ACCEPT_FORMATS.get(media_type.strip().lower())
+            if fmt and quality > 0:
+                candidates.append((-quality, position, fmt))
+        if candidates:
+            response_format = min(candidates)[2]
+    if response_format not in SQL_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported format '{response_format}'; expected one of {sorted(SQL_FORMATS)}"
+        )
+    if response_format in ARROW_FORMATS and not arrow_available():
+        raise HTTPException(
+            status_code=406,
+            detail=f"Format '{response_format}' needs pyarrow, which is not installed on this server"
+        )
+    return response_format
+
+def _cursor_sql(cursor: str) -> str:
+    try:
+        return decode_cursor(cursor)[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _check_cursor(cursor: str, sql_query: str):
+    try:
+        check_cursor(cursor, sql_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _deadline_error(e: Exception) -> HTTPException:
+    if isinstance(e, ClientDisconnectedError):
+        # nginx's "client closed request"; nobody is left to read it
+        return HTTPException(status_code=499, detail=str(e))
+    return HTTPException(status_code=504, detail=str(e))
+
 @app.post("/query")
-async def process_nl_query(request: QueryRequest):
+async def process_nl_query(
+    request: QueryRequest,
+    http_request: Request,
+    stream: bool = False,
+    response_format: str = Query("json", alias="format"),
+    debug: bool = False
+):
     """
     Accepts a natural language query,
     converts it to SQL via Bedrock,
     executes it on MySQL, and returns results.
+    With stream=true (or format=ndjson) rows are streamed as they are fetched.
+    Otherwise results are paged (page_size, default QUERY_ROW_LIMIT); pass back
+    next_cursor to fetch the next page without generating the SQL again.
+    The timeout (default REQUEST_TIMEOUT) is split between Bedrock and MySQL;
+    the statement is killed on the server if it runs out or the client leaves.
+    A streamed result is bounded by timeout only if one is given, else by STREAM_TIMEOUT.
+    Generated SQL is EXPLAINed first and PLAN_GATE_POLICY applied to costly plans.
+    debug=true adds per-stage timings (schema, Bedrock, execute, fetch, ...) to the response.
+    database selects the datasource; reads go to its replicas.
     """
+    _check_stream_format(response_format)
+    _select_datasource(request.database)
+    cursor_sql = _cursor_sql(request.cursor) if request.cursor else None
+    budget = RequestBudget(request.timeout)
     try:
-        # Get schema for better SQL generation
-        schema = get_database_schema()
-        schema_str = json.dumps(schema, indent=2)
+        plan, forced_limit, validation = None, None, None
+        if cursor_sql is not None:
+            # Later pages re-run the SQL carried by the cursor; Bedrock is not called
+            sql_query, schema_prompt, cache_hit = cursor_sql, None, None
+        else:
+            # Get schema for better SQL generation
+            schema = await run_blocking(get_cached_schema)
+            schema_prompt = compile_schema_prompt(schema, request.query)
+            
+            # Generate SQL from natural language
+            sql_query, cache_hit = await run_with_deadline(
+                generate_sql_cached, request.query, schema_prompt.text,
+                timeout=budget.for_generation(), request=http_request
+            )
+            
+            # Check tables and columns against the schema; Bedrock repairs what does not match
+            checked = await run_with_deadline(
+                validate_generated_sql, request.query, sql_query, schema, schema_prompt.text, budget=budget,
+                timeout=budget.remaining(), request=http_request
+            )
+            sql_query, validation = checked.sql, checked.report
+            
+            # Check the plan before running it; may regenerate, reject or cap the query
+            gate = await run_with_deadline(
+                gate_generated_sql, request.query, sql_query, schema_prompt.text, schema=schema, budget=budget,
+                timeout=budget.remaining(), request=http_request
+            )
+            sql_query, plan, forced_limit = gate.sql, gate.plan, gate.page_size
+        summary = schema_prompt.summary() if schema_prompt else None
         
-        # Generate SQL from natural language
-        sql_query = generate_sql_from_nl(request.query, schema_str)
+        if stream or response_format == "ndjson":
+            stream_sql = plan_page(sql_query, forced_limit, lookahead=False).sql if forced_limit else sql_query
+            serializer, batches = await open_row_stream(
+                stream_sql, timeout=budget.for_stream(), request=http_request
+            )
+            envelope = {
+                "status": "success",
+                "nl_query": request.query,
+                "generated_sql": sql_query,
+                "schema_prompt": summary,
+                "cache_hit": cache_hit,
+                "validation": validation,
+                "plan": plan
+            }
+            return rows_streaming_response(with_timings(envelope, debug), serializer, batches, response_format)
         
-        # Execute the generated SQL
-        result = execute_sql_query(sql_query)
+        page_size = request.page_size
+        if forced_limit:
+            page_size = min(page_size, forced_limit) if page_size else forced_limit
         
-        return {
+        # Execute one page of the generated SQL (max_age=0: /query results are not cached)
+        result, _ = await run_with_deadline(
+            execute_sql_page, sql_query, page_size, request.cursor, max_age=0, cap=forced_limit,
+            timeout=budget.for_execution(), request=http_request
+        )
+        
+        return FastJSONResponse(with_timings({
             "status": "success",
             "nl_query": request.query,
             "generated_sql": sql_query,
+            "schema_prompt": summary,
+            "cache_hit": cache_hit,
+            "validation": validation,
+            "plan": plan,
             "result": result
-        }
+        }, debug))
+    except (QueryTimeoutError, ClientDisconnectedError) as e:
+        raise _deadline_error(e)
+    except QueryRejectedError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "plan": e.plan})
+    except SQLValidationError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e), "validation": e.report})
+    except UnsafeQueryError as e:
+        raise HTTPException(status_code=422, detail=f"Generated SQL refused: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 @app.post("/sql")
-async def execute_sql(request: SQLRequest):
+async def execute_sql(
+    request: SQLRequest,
+    http_request: Request,
+    stream: bool = False,
+    response_format: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None),
+    debug: bool = False
+):
     """
     Execute a raw SQL SELECT query on the database.
+    Results may come from the result cache; max_age=0 forces a fresh read.
+    With stream=true (or format=ndjson) rows bypass the cache and are streamed.
+    format=columnar|arrow|parquet (or a matching Accept header) returns the result
+    column-oriented, encoded batch by batch straight from the cursor.
+    Buffered JSON results are paged (page_size, default QUERY_ROW_LIMIT);
+    pass back next_cursor with the same sql to fetch the next page.
+    Statements get at most timeout seconds (default QUERY_TIMEOUT; streamed and
+    columnar results default to STREAM_TIMEOUT) and are killed on the server if
+    the client disconnects.
+    debug=true adds per-stage timings (execute, fetch, serialize) to buffered JSON responses.
+    database selects the datasource; reads go to its replicas.
     """
+    response_format = _negotiate_sql_format(response_format, accept)
+    _select_datasource(request.database)
+    if request.cursor:
+        _check_cursor(request.cursor, request.sql)
     try:
-        result = execute_sql_query(request.sql)
-        return {
+        if response_format in COLUMNAR_MEDIA_TYPES:
+            serializer, batches = await open_row_stream(
+                request.sql, timeout=RequestBudget(request.timeout).for_stream(), request=http_request
+            )
+            envelope = {"status": "success", "sql_query": request.sql}
+            chunks = columnar_chunks(envelope, serializer, batches, response_format)
+            return chunked_response(chunks, batches, COLUMNAR_MEDIA_TYPES[response_format])
+        
+        if stream or response_format == "ndjson":
+            serializer, batches = await open_row_stream(
+                request.sql, timeout=RequestBudget(request.timeout).for_stream(), request=http_request
+            )
+            envelope = {"status": "success", "sql_query": request.sql}
+            return rows_streaming_response(envelope, serializer, batches, response_format)
+        
+        result, cache_hit = await run_with_deadline(
+            execute_sql_page, request.sql, request.page_size, request.cursor, max_age=request.max_age,
+            timeout=RequestBudget(request.timeout).for_execution(), request=http_request
+        )
+        return FastJSONResponse(with_timings({
             "status": "success",
             "sql_query": request.sql,
+            "cache_hit": cache_hit,
             "result": result
-        }
+        }, debug))
+    except (QueryTimeoutError, ClientDisconnectedError) as e:
+        raise _deadline_error(e)
+    except UnsafeQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"SQL execution error: {str(e)}")
 
 @app.post("/generate-sql")
-async def generate_sql_only(request: GenerateSQLRequest):
+async def generate_sql_only(request: GenerateSQLRequest, http_request: Request, stream: bool = False,
+                            debug: bool = False):
     """
     Generate SQL query from natural language without executing it.
+    With stream=true the completion is sent as server-sent events while Bedrock produces it.
+    database selects the datasource whose schema the SQL is written for.
     """
+    _select_datasource(request.database)
+    budget = RequestBudget(request.timeout)
     try:
         # Get schema for better SQL generation
-        schema = get_database_schema()
-        schema_str = json.dumps(schema, indent=2)
+        schema = await run_blocking(get_cached_schema)
+        schema_prompt = compile_schema_prompt(schema, request.question)
+        
+        if stream:
+            envelope = {
+                "status": "success",
+                "question": request.question,
+                "schema_prompt": schema_prompt.summary()
+            }
+            chunks = generated_sql_sse_chunks(request.question, schema_prompt.text, envelope, budget, debug)
+            return chunked_response(chunks, chunks, "text/event-stream", headers=SSE_HEADERS)
         
         # Generate SQL from natural language
-        sql_query = generate_sql_from_nl(request.question, schema_str)
+        sql_query, cache_hit = await run_with_deadline(
+            generate_sql_cached, request.question, schema_prompt.text,
+            timeout=budget.remaining(), request=http_request
+        )
         
-        return {
+        return with_timings({
             "status": "success",
             "question": request.question,
-            "generated_sql": sql_query
-        }
+            "generated_sql": sql_query,
+            "schema_prompt": schema_prompt.summary(),
+            "cache_hit": cache_hit
+        }, debug)
+    except (QueryTimeoutError, ClientDisconnectedError) as e:
+        raise _deadline_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating SQL: {str(e)}")
+
+async def _batch_lines(items):
+    async for item in items:
+        yield dumps_bytes(item) + b"\n"
+
+async def _batch_response(request: BatchRequest, execute: bool) -> StreamingResponse:
+    try:
+        check_batch_size(request.questions)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # The streamed body runs after this returns and still reads from the selected datasource
+    _select_datasource(request.database)
+    try:
+        # Loaded once for the whole batch; each question still gets its own pruned prompt
+        schema = await run_blocking(get_cached_schema)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting schema: {str(e)}")
+    items = run_batch(request.questions, schema, execute=execute, page_size=request.page_size)
+    return StreamingResponse(_batch_lines(items), media_type=STREAM_MEDIA_TYPES["ndjson"])
+
+@app.post("/batch/generate-sql")
+async def batch_generate_sql(request: BatchRequest):
+    """
+    Generate SQL for many questions at once.
+    Streams one NDJSON line per question as it finishes (with its index), then a summary line.
+    """
+    return await _batch_response(request, execute=False)
+
+@app.post("/batch/query")
+async def batch_query(request: BatchRequest):
+    """
+    Generate and execute SQL for many questions at once.
+    Streams one NDJSON line per question as it finishes (with its index), then a summary line.
+    """
+    return await _batch_response(request, execute=True)
@@ -0,0 +1,205 @@
+# app/metrics.py
+"""
+Hot-path stage timings, Bedrock token counts and Prometheus metrics
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .config import DEBUG_TIMINGS
+
+try:
+    import prometheus_client
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, multiprocess
+except ImportError:  # pragma: no cover - prometheus_client is optional
+    prometheus_client = None
+
+# Stages timed along the request path:
+#   schema_introspection  information_schema reads in get_database_schema (cache misses only)
+#   generate              generate_sql_from_nl end to end, including prompt building
+#   bedrock               the Converse / ConverseStream call itself
+#   validate              local check of generated SQL against the cached schema
+#   explain               EXPLAIN FORMAT=JSON for the plan gate
+#   execute               cursor.execute (the server runs the statement)
+#   fetch                 pulling rows to the client
+#   serialize             converting rows to JSON-ready values
+#   encode                writing the response body
+_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+if prometheus_client is not None:
+    STAGE_SECONDS = Histogram(
+        "nlsql_stage_duration_seconds", "Time spent in each stage of the request path", ["stage"], buckets=_BUCKETS
+    )
+    HTTP_SECONDS = Histogram(
+        "nlsql_http_request_duration_seconds", "HTTP request latency by route and status",
+        ["method", "route", "status"], buckets=_BUCKETS
+    )
+    TOOL_SECONDS = Histogram(
+        "nlsql_mcp_tool_duration_seconds", "MCP tool call latency by tool and outcome",
+        ["tool", "status"], buckets=_BUCKETS
+    )
+    BEDROCK_TOKENS = Counter(
+        "nlsql_bedrock_tokens_total", "Tokens reported in the Bedrock Converse usage field", ["direction"]
+    )
+    SQL_VALIDATIONS = Counter(
+        "nlsql_sql_validations_total", "Generated SQL checked against the schema, by outcome", ["outcome"]
+    )
+    SQL_VALIDATION_ISSUES = Counter(
+        "nlsql_sql_validation_issues_total", "Problems found in generated SQL before any repair", ["kind"]
+    )
+    SQL_REPAIR_ATTEMPTS = Counter(
+        "nlsql_sql_repair_attempts_total", "Bedrock calls made to repair generated SQL"
+    )
+
+
+class Timings:
+    """Per-request accumulator of stage durations (ms) and Bedrock token counts"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tokens = {"input": 0, "output": 0}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds * 1000
+
+    def add_tokens(self, input_tokens: int, output_tokens: int):
+        with self._lock:
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            block: Dict[str, Any] = {f"{stage}_ms": round(ms, 2) for stage, ms in self.stages.items()}
+            if self.tokens["input"] or self.tokens["output"]:
+                block["bedrock_tokens"] = dict(self.tokens)
+        block["elapsed_ms"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return block
+
+
+_current_timings: contextvars.ContextVar = contextvars.ContextVar("timings", default=None)
+
+
+def current_timings() -> Optional[Timings]:
+    return _current_timings.get()
+
+
+@contextmanager
+def request_timings() -> Iterator[Timings]:
+    """Collect stage timings for everything run in this context (worker threads included)"""
+    timings = Timings()
+    token = _current_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_timings.reset(token)
+
+
+def observe(stage: str, seconds: float):
+    if prometheus_client is not None:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the block under stage, whether or not it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def record_bedrock_usage(usage: Optional[Dict[str, Any]]):
+    """Count inputTokens/outputTokens from a Converse response or ConverseStream metadata event"""
+    if not usage:
+        return
+    input_tokens, output_tokens = int(usage.get("inputTokens", 0)), int(usage.get("outputTokens", 0))
+    if prometheus_client is not None:
+        BEDROCK_TOKENS.labels("input").inc(input_tokens)
+        BEDROCK_TOKENS.labels("output").inc(output_tokens)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add_tokens(input_tokens, output_tokens)
+
+
+def record_sql_validation(outcome: str, repair_attempts: int, issue_kinds):
+    """outcome: valid, repaired, unverified or failed"""
+    if prometheus_client is not None:
+        SQL_VALIDATIONS.labels(outcome).inc()
+        for kind in issue_kinds:
+            SQL_VALIDATION_ISSUES.labels(kind).inc()
+        if repair_attempts:
+            SQL_REPAIR_ATTEMPTS.inc(repair_attempts)
+
+
+def record_tool_call(tool: str, status: str, seconds: float):
+    if prometheus_client is not None:
+        TOOL_SECONDS.labels(tool, status).observe(seconds)
+
+
+def with_timings(body: Dict[str, Any], debug: bool = False) -> Dict[str, Any]:
+    """Add a "timings" block to a response body when debug (or DEBUG_TIMINGS) is on"""
+    timings = _current_timings.get()
+    if (debug or DEBUG_TIMINGS) and timings is not None:
+        body["timings"] = timings.as_dict()
+    return body
+
+
+def metrics_available() -> bool:
+    return prometheus_client is not None
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """(body, content type) in the Prometheus text exposition format.
+
+    With several uvicorn workers each process records into PROMETHEUS_MULTIPROC_DIR
+    (set by start_fastapi_server.py), and every scrape aggregates all of them.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return prometheus_client.generate_latest(registry), CONTENT_TYPE_LATEST
+    return prometheus_client.generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency histogram and a Timings collector per HTTP request.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so endpoints still see client
+    disconnects and streamed bodies are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        with request_timings() as timings:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                if prometheus_client is not None:
+                    # Route template, not the raw path, keeps label cardinality bounded
+                    route = getattr(scope.get("route"), "path", None) or "unmatched"
+                    HTTP_SECONDS.labels(scope["method"], route, str(status["code"])).observe(
+                        time.perf_counter() - timings.started
+                    )
@@ -0,0 +1,168 @@
+# app/pagination.py
+"""
+Row limits and offset pagination: rewrite SELECTs with sqlglot and hand out opaque cursor tokens
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from .config import QUERY_ROW_LIMIT, QUERY_MAX_PAGE_SIZE, CURSOR_SECRET
+from .result_cache import execute_sql_query_cached, normalize_sql
+from .sql_safety import check_sql_safety
+
+# Later pages run the SQL a cursor carries without generating or gating it again, so cursors are
+# signed. Without CURSOR_SECRET the key is per process and cursors do not survive a restart.
+_CURSOR_KEY = CURSOR_SECRET.encode("utf-8") if CURSOR_SECRET else secrets.token_bytes(32)
+
+
+@dataclass
+class Page:
+    """One page of a statement: the SQL actually executed and where the page starts"""
+    sql: str
+    offset: int = 0
+    page_size: int = 0
+    paginated: bool = False
+
+
+def page_size_for(requested: Optional[int] = None) -> int:
+    """Requested page size clamped to QUERY_MAX_PAGE_SIZE; QUERY_ROW_LIMIT when none given"""
+    size = QUERY_ROW_LIMIT if requested is None else requested
+    if size <= 0:
+        return 0
+    return min(size, QUERY_MAX_PAGE_SIZE) if QUERY_MAX_PAGE_SIZE > 0 else size
+
+
+def _literal_int(node) -> Optional[int]:
+    value = node.args.get("expression") if node is not None else None
+    if isinstance(value, exp.Literal) and not value.is_string:
+        try:
+            return int(value.this)
+        except ValueError:
+            return None
+    return None
+
+
+def plan_page(sql_query: str, page_size: int, offset: int = 0, lookahead: bool = True) -> Page:
+    """Rewrite the statement to fetch page_size + 1 rows starting at offset.
+
+    The extra row tells whether more rows follow (lookahead=False drops it). A LIMIT/OFFSET already in the
+    query is honoured: pages are carved out of it and never read past it.
+    Statements that are not plain SELECT/UNION queries, or that do not parse,
+    run unchanged.
+    """
+    if page_size <= 0:
+        return Page(sql_query)
+    try:
+        tree = sqlglot.parse_one(sql_query, read="mysql")
+    except SqlglotError:
+        return Page(sql_query)
+    if not isinstance(tree, exp.Query):
+        return Page(sql_query)
+
+    limit_node, offset_node = tree.args.get("limit"), tree.args.get("offset")
+    user_limit = _literal_int(limit_node)
+    user_offset = _literal_int(offset_node) if offset_node is not None else 0
+    if (limit_node is not None and user_limit is None) or user_offset is None:
+        # LIMIT with placeholders or expressions; leave it to the database
+        return Page(sql_query)
+
+    fetch = page_size + 1 if lookahead else page_size
+    if user_limit is not None:
+        fetch = min(fetch, max(user_limit - offset, 0))
+    rewritten = tree.limit(fetch).offset(user_offset + offset)
+    return Page(rewritten.sql(dialect="mysql"), offset=offset, page_size=page_size, paginated=True)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def _signature(body: str) -> str:
+    return _b64encode(hmac.new(_CURSOR_KEY, body.encode("ascii"), hashlib.sha256).digest())
+
+
+def encode_cursor(sql_query: str, offset: int, page_size: int, cap: Optional[int] = None) -> str:
+    """Signed continuation token carrying the original statement, the next offset and the row cap (if any)"""
+    payload = json.dumps({"sql": sql_query, "offset": offset, "page_size": page_size, "cap": cap},
+                         separators=(",", ":"))
+    body = _b64encode(zlib.compress(payload.encode("utf-8")))
+    return f"{body}.{_signature(body)}"
+
+
+def decode_cursor(token: str) -> Tuple[str, int, int, Optional[int]]:
+    """(sql, offset, page_size, cap) from a token produced by encode_cursor; altered tokens are refused"""
+    try:
+        body, _, signature = token.partition(".")
+        if not hmac.compare_digest(signature, _signature(body)):
+            raise ValueError
+        payload = json.loads(zlib.decompress(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))))
+        sql_query, offset, page_size = payload["sql"], int(payload["offset"]), int(payload["page_size"])
+        cap = int(payload["cap"]) if payload.get("cap") is not None else None
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if offset < 0 or page_size <= 0 or (cap is not None and offset + page_size > cap):
+        raise ValueError("Invalid pagination cursor")
+    return sql_query, offset, page_size, cap
+
+
+def check_cursor(token: str, sql_query: str) -> Tuple[int, int, Optional[int]]:
+    """(offset, page_size, cap) from a token, which must have been issued for sql_query"""
+    cursor_sql, offset, page_size, cap = decode_cursor(token)
+    if normalize_sql(cursor_sql) != normalize_sql(sql_query):
+        raise ValueError("Pagination cursor was issued for a different query")
+    return offset, page_size, cap
+
+
+def finish_page(result: Dict[str, Any], page: Page, sql_query: str, cap: Optional[int] = None) -> Dict[str, Any]:
+    """Trim the look-ahead row and add truncated / next_cursor to a result dict.
+
+    No cursor is issued past cap; the last one asks only for the rows left under it.
+    """
+    rows = result["rows"]
+    truncated = page.paginated and len(rows) > page.page_size
+    if truncated:
+        rows = rows[:page.page_size]
+    next_offset = page.offset + page.page_size
+    next_cursor = None
+    if truncated and (cap is None or next_offset < cap):
+        next_size = min(page.page_size, cap - next_offset) if cap is not None else page.page_size
+        next_cursor = encode_cursor(sql_query, next_offset, next_size, cap)
+    return {
+        **result,
+        "rows": rows,
+        "row_count": len(rows),
+        "truncated": truncated,
+        "next_cursor": next_cursor
+    }
+
+
+def execute_sql_page(sql_query: str, page_size: Optional[int] = None, cursor: Optional[str] = None,
+                     max_age: Optional[float] = None, cap: Optional[int] = None) -> Tuple[Dict[str, Any], bool]:
+    """execute_sql_query_cached for one page of the statement; returns (result, cache_hit).
+
+    With a cursor the page size, offset and cap come from the token, which must
+    have been issued for the same statement. cap bounds the rows all pages
+    together may return (the plan gate's forced limit) and travels in the cursor.
+    """
+    # Judge the statement as written, before the LIMIT rewrite re-renders it
+    check_sql_safety(sql_query)
+    offset = 0
+    if cursor:
+        offset, page_size, cap = check_cursor(cursor, sql_query)
+    size = page_size_for(page_size)
+    if cap is not None:
+        size = min(size, cap - offset) if size else cap - offset
+    page = plan_page(sql_query, size, offset)
+    # Each page is its own statement, so the result cache keys pages separately
+    result, cache_hit = execute_sql_query_cached(page.sql, max_age=max_age)
+    return finish_page(result, page, sql_query, cap), cache_hit
@@ -0,0 +1,224 @@
+# app/planner.py
+"""
+EXPLAIN FORMAT=JSON cost gate for generated SQL: report, reject, regenerate or limit expensive plans
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .config import (
+    PLAN_GATE_POLICY, PLAN_MAX_ROWS_EXAMINED, PLAN_MAX_COST, PLAN_FULL_SCAN_MIN_ROWS,
+    PLAN_MAX_REGENERATIONS, PLAN_FORCED_LIMIT, SQL_VALIDATION
+)
+from .metrics import timed
+from .tracing import span, sql_hash
+from .shared_utils import generate_sql_from_nl, get_db_connection
+from .sql_safety import check_sql_safety
+from .sql_cache import get_sql_cache
+from .sql_validation import validate_sql
+from .timeouts import QueryTimeoutError, RequestBudget
+
+PLAN_POLICIES = {"off", "report", "reject", "regenerate", "limit"}
+
+# access_type values that read the whole table or index
+_FULL_SCAN_ACCESS = {"ALL", "index"}
+
+
+class QueryRejectedError(Exception):
+    """Raised when a generated query's plan exceeds the configured limits"""
+
+    def __init__(self, message: str, plan: Dict[str, Any]):
+        super().__init__(message)
+        self.plan = plan
+
+
+@dataclass
+class PlanSummary:
+    """Figures pulled out of an EXPLAIN FORMAT=JSON document"""
+    rows_examined: int = 0
+    query_cost: Optional[float] = None
+    full_scans: List[Dict[str, Any]] = field(default_factory=list)
+    filesort: bool = False
+    temporary_table: bool = False
+    violations: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "estimated_rows_examined": self.rows_examined,
+            "query_cost": self.query_cost,
+            "full_scans": self.full_scans,
+            "filesort": self.filesort,
+            "temporary_table": self.temporary_table,
+            "violations": self.violations
+        }
+
+
+def explain_sql(sql_query: str) -> Dict[str, Any]:
+    """Run EXPLAIN FORMAT=JSON and return the parsed plan"""
+    check_sql_safety(sql_query)
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        with timed("explain"), span("mysql.explain", {"db.system": "mysql", "db.statement.hash": sql_hash(sql_query)},
+                                    kind="client"):
+            cursor.execute(f"EXPLAIN FORMAT=JSON {sql_query.strip().rstrip(';')}")
+        row = cursor.fetchone()
+        cursor.fetchall()
+        plan = row[0] if row else "{}"
+        if isinstance(plan, (bytes, bytearray)):
+            plan = plan.decode("utf-8")
+        return json.loads(plan)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _visit_table(table: Dict[str, Any], loops: float, summary: PlanSummary):
+    per_scan = _number(table.get("rows_examined_per_scan"))
+    summary.rows_examined += int(per_scan * max(loops, 1))
+    access = table.get("access_type")
+    if access in _FULL_SCAN_ACCESS:
+        summary.full_scans.append({
+            "table": table.get("table_name"),
+            "access_type": access,
+            "rows": int(per_scan)
+        })
+    if table.get("using_filesort"):
+        summary.filesort = True
+    # Derived tables and attached subqueries carry their own query blocks
+    _walk(table, 1, summary)
+
+
+def _walk(node: Any, loops: float, summary: PlanSummary):
+    if isinstance(node, list):
+        for item in node:
+            _walk(item, loops, summary)
+        return
+    if not isinstance(node, dict):
+        return
+    for key, value in node.items():
+        if key == "table" and isinstance(value, dict):
+            _visit_table(value, loops, summary)
+        elif key == "nested_loop" and isinstance(value, list):
+            # rows_produced_per_join is cumulative, so each table is scanned once per prefix row
+            prefix = loops
+            for item in value:
+                table = item.get("table", {}) if isinstance(item, dict) else {}
+                _visit_table(table, prefix, summary)
+                prefix = _number(table.get("rows_produced_per_join")) or prefix
+        elif key == "using_filesort" and value is True:
+            summary.filesort = True
+        elif key == "using_temporary_table" and value is True:
+            summary.temporary_table = True
+        else:
+            _walk(value, loops, summary)
+
+
+def summarize_plan(plan: Dict[str, Any]) -> PlanSummary:
+    """Estimated rows examined, query cost, full scans and filesort/temporary flags"""
+    summary = PlanSummary()
+    _walk(plan, 1, summary)
+    query_block = plan.get("query_block", {})
+    cost = query_block.get("cost_info", {}).get("query_cost")
+    if cost is None:
+        # UNION plans report a cost per query specification
+        specs = query_block.get("union_result", {}).get("query_specifications", [])
+        costs = [spec.get("query_block", {}).get("cost_info", {}).get("query_cost") for spec in specs]
+        costs = [c for c in costs if c is not None]
+        cost = sum(_number(c) for c in costs) if costs else None
+    summary.query_cost = round(_number(cost), 2) if cost is not None else None
+
+    if PLAN_MAX_ROWS_EXAMINED > 0 and summary.rows_examined > PLAN_MAX_ROWS_EXAMINED:
+        summary.violations.append(
+            f"estimated {summary.rows_examined} rows examined (limit {PLAN_MAX_ROWS_EXAMINED})"
+        )
+    if PLAN_MAX_COST > 0 and summary.query_cost is not None and summary.query_cost > PLAN_MAX_COST:
+        summary.violations.append(f"query cost {summary.query_cost} (limit {PLAN_MAX_COST:g})")
+    for scan in summary.full_scans:
+        if PLAN_FULL_SCAN_MIN_ROWS > 0 and scan["rows"] >= PLAN_FULL_SCAN_MIN_ROWS:
+            kind = "table" if scan["access_type"] == "ALL" else "index"
+            summary.violations.append(f"full {kind} scan on {scan['table']} (~{scan['rows']} rows)")
+    return summary
+
+
+def _feedback(sql_query: str, summary: PlanSummary) -> str:
+    return (
+        f"The previous query was:\n{sql_query}\n"
+        f"Its EXPLAIN plan shows: {'; '.join(summary.violations)}.\n"
+        "Write a cheaper query for the same question: filter and join on indexed columns, "
+        "avoid scanning whole large tables, and add a LIMIT if the question allows it."
+    )
+
+
+@dataclass
+class GateResult:
+    """SQL to execute, the plan report for the response and any forced page size"""
+    sql: str
+    plan: Optional[Dict[str, Any]] = None
+    page_size: Optional[int] = None
+
+
+def _check_candidate(candidate: str, schema: Optional[Dict[str, Any]]) -> Optional[PlanSummary]:
+    """Plan summary of a regenerated statement, or None when it fails validation, safety or EXPLAIN"""
+    if SQL_VALIDATION and schema and any(issue.kind != "syntax" for issue in validate_sql(candidate, schema)):
+        return None
+    try:
+        return summarize_plan(explain_sql(candidate))
+    except QueryTimeoutError:
+        raise
+    except Exception:
+        return None
+
+
+def gate_generated_sql(question: str, sql_query: str, schema_text: str, policy: Optional[str] = None,
+                       schema: Optional[Dict[str, Any]] = None,
+                       budget: Optional[RequestBudget] = None) -> GateResult:
+    """EXPLAIN the generated SQL and apply PLAN_GATE_POLICY to plans over the limits.
+
+    Regenerated statements are checked against schema (tables and columns) and
+    EXPLAINed; one that fails either is dropped and the current statement kept.
+    No regeneration starts once budget's generation deadline has passed.
+    """
+    policy = PLAN_GATE_POLICY if policy is None else policy
+    if policy not in PLAN_POLICIES:
+        raise ValueError(f"Unknown PLAN_GATE_POLICY: {policy}")
+    if policy == "off":
+        return GateResult(sql_query)
+
+    summary = summarize_plan(explain_sql(sql_query))
+    attempts, accepted = 0, False
+    while (policy == "regenerate" and summary.violations and attempts < PLAN_MAX_REGENERATIONS
+           and not (budget and budget.generation_spent())):
+        attempts += 1
+        candidate = generate_sql_from_nl(question, schema_text, feedback=_feedback(sql_query, summary))
+        candidate_summary = _check_candidate(candidate, schema)
+        if candidate_summary is None or len(candidate_summary.violations) > len(summary.violations):
+            continue
+        sql_query, summary, accepted = candidate, candidate_summary, True
+    cache = get_sql_cache()
+    if accepted and cache is not None:
+        # Replace the expensive answer so the next identical question skips this round trip
+        cache.store(question, schema_text, sql_query)
+
+    report = {"policy": policy, **summary.summary()}
+    if policy == "regenerate":
+        report["regenerations"] = attempts
+    if not summary.violations or policy == "report":
+        report["action"] = "run"
+        return GateResult(sql_query, report)
+    if policy == "limit":
+        report["action"] = "limited"
+        report["forced_limit"] = PLAN_FORCED_LIMIT
+        return GateResult(sql_query, report, page_size=PLAN_FORCED_LIMIT)
+    report["action"] = "rejected"
+    raise QueryRejectedError(f"Query rejected by plan check: {'; '.join(summary.violations)}", report)
@@ -0,0 +1,231 @@
+# app/result_cache.py
+"""
+Query-result cache for execute_sql_query with table-level invalidation
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import (
+    RESULT_CACHE_ENABLED, RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MAX_ENTRY_BYTES, RESULT_CACHE_TTL, RESULT_CACHE_CHECKSUM
+)
+from .datasources import current_datasource
+from .shared_utils import execute_sql_query, get_db_connection
+from .sql_safety import analyze_sql
+
+_STRING_OR_SPACE = re.compile(r"('(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`)|\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace outside quoted literals and drop a trailing semicolon"""
+    normalized = _STRING_OR_SPACE.sub(lambda m: m.group(1) or " ", sql.strip())
+    return normalized.rstrip("; ").strip()
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def _quote(schema: str, table: str) -> str:
+    return ".".join("`" + name.replace("`", "``") + "`" for name in (schema, table))
+
+
+def get_table_versions(tables: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    """Current UPDATE_TIME/CREATE_TIME (and optionally CHECKSUM) per (schema, table), in one round trip"""
+    if not tables:
+        return {}
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        placeholders = ", ".join(["(%s, %s)"] * len(tables))
+        cursor.execute(
+            "SELECT TABLE_SCHEMA, TABLE_NAME, CREATE_TIME, UPDATE_TIME FROM information_schema.TABLES "
+            f"WHERE (TABLE_SCHEMA, TABLE_NAME) IN ({placeholders})",
+            tuple(name for table in tables for name in table)
+        )
+        versions = {}
+        for table_schema, table_name, create_time, update_time in cursor.fetchall():
+            versions[(_text(table_schema), _text(table_name))] = f"{create_time}|{update_time}"
+        if RESULT_CACHE_CHECKSUM and versions:
+            cursor.execute(f"CHECKSUM TABLE {', '.join(_quote(*table) for table in versions)}")
+            for qualified, checksum in cursor.fetchall():
+                table = tuple(_text(qualified).split(".", 1))
+                if table in versions:
+                    versions[table] += f"|{checksum}"
+        return versions
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+
+class ResultCache:
+    """LRU of query results bounded by entry count and total serialized bytes"""
+
+    def __init__(self, max_entries: int = 500, max_bytes: int = 64 * 1024 * 1024,
+                 max_entry_bytes: int = 4 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_table: Dict[Tuple[str, str], set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._oversize = 0
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Cached entry younger than max_age (defaults to the TTL), without version checks"""
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry["stored_at"] > max_age:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, result: Dict[str, Any], versions: Dict[Tuple[str, str], str]) -> bool:
+        size = len(json.dumps(result, default=str))
+        if size > self.max_entry_bytes or size > self.max_bytes:
+            with self._lock:
+                self._oversize += 1
+            return False
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {"result": result, "versions": versions, "size": size,
+                                  "stored_at": time.monotonic()}
+            self._bytes += size
+            for table in versions:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+        return True
+
+    def discard(self, key: str):
+        with self._lock:
+            if self._remove(key):
+                self._stale += 1
+
+    def invalidate_tables(self, tables: List[Tuple[str, str]]) -> int:
+        """Drop every entry that reads from any of the given (schema, table) pairs"""
+        with self._lock:
+            keys = set()
+            for table in tables:
+                keys.update(self._by_table.get(table, ()))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self._hits += 1
+            else:
+                self._misses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "stale": self._stale,
+                "evictions": self._evictions,
+                "oversize": self._oversize
+            }
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry["size"]
+        for table in entry["versions"]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+        return True
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Process-wide result cache, or None when RESULT_CACHE_ENABLED is false"""
+    global _result_cache
+    if _result_cache is None and RESULT_CACHE_ENABLED:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(
+                    max_entries=RESULT_CACHE_MAX_ENTRIES,
+                    max_bytes=RESULT_CACHE_MAX_BYTES,
+                    max_entry_bytes=RESULT_CACHE_MAX_ENTRY_BYTES,
+                    ttl=RESULT_CACHE_TTL
+                )
+    return _result_cache
+
+
+def execute_sql_query_cached(sql_query: str, max_age: Optional[float] = None) -> Tuple[Dict[str, Any], bool]:
+    """execute_sql_query behind the result cache; returns (result, cache_hit).
+
+    A cached result is served only while it is younger than max_age and every
+    referenced table still has the UPDATE_TIME/CREATE_TIME (and checksum, when
+    enabled) recorded when it was stored. max_age=0 bypasses the cache.
+    Entries are kept per datasource endpoint.
+    """
+    cache = get_result_cache()
+    if cache is None or (max_age is not None and max_age <= 0):
+        return execute_sql_query(sql_query), False
+
+    # The safety analyzer's parse lists every table the statement reads (joins, subqueries, CTE bodies)
+    tables = analyze_sql(sql_query).tables
+    if not tables:
+        # Refused, no tables, or a source that is not a plain table: nothing to invalidate on, so never cache
+        return execute_sql_query(sql_query), False
+    tables = list(tables)
+
+    datasource = current_datasource()
+
+    # Replicas lag and keep their own UPDATE_TIMEs: versions and rows are read from one server,
+    # and an entry is only ever checked against the server it was read from
+    with datasource.pin_endpoint() as endpoint:
+        key = f"{datasource.name}@{endpoint.address}:{normalize_sql(sql_query)}"
+        entry = cache.get(key, max_age)
+        if entry is not None:
+            if get_table_versions(list(entry["versions"])) == entry["versions"]:
+                cache.record(hit=True)
+                return entry["result"], True
+            cache.discard(key)
+
+        cache.record(hit=False)
+        # Versions are read before executing so a concurrent write shows up as stale later
+        versions = get_table_versions(tables)
+        result = execute_sql_query(sql_query)
+    if len(versions) == len(tables):
+        cache.put(key, result, versions)
+    return result, False
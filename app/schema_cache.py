@@ -0,0 +1,143 @@
+# app/schema_cache.py
+"""
+Process-wide schema cache with TTL, explicit invalidation and cheap change detection
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .config import SCHEMA_CACHE_TTL, SCHEMA_CACHE_CHANGE_DETECTION
+from .datasources import current_datasource
+from .shared_utils import get_database_schema, get_schema_fingerprint
+
+
+class SchemaCache:
+    """Holds the last loaded schema and decides when it must be reloaded.
+
+    Within the TTL the cached schema is returned without touching MySQL.
+    Once the TTL expires, the fingerprint query (one round trip) is compared
+    with the fingerprint taken at load time, and the full schema is only
+    reloaded when it differs.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Dict[str, Any]],
+        fingerprint: Optional[Callable[[], str]] = None,
+        ttl: float = 60.0
+    ):
+        self._loader = loader
+        self._fingerprint = fingerprint
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._schema = None
+        self._schema_fingerprint = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+
+        self._hits = 0
+        self._loads = 0
+        self._revalidations = 0
+        self._invalidations = 0
+
+    def get(self, force_refresh: bool = False) -> Dict[str, Any]:
+        """Return the schema, reloading it only when it is stale and has changed"""
+        if not force_refresh and self._is_fresh():
+            self._hits += 1
+            return self._schema
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if not force_refresh and self._is_fresh():
+                self._hits += 1
+                return self._schema
+
+            fingerprint = None
+            if self._fingerprint is not None:
+                fingerprint = self._fingerprint()
+                if (
+                    not force_refresh
+                    and self._schema is not None
+                    and fingerprint == self._schema_fingerprint
+                ):
+                    self._revalidations += 1
+                    self._checked_at = time.monotonic()
+                    return self._schema
+
+            schema = self._loader()
+            now = time.monotonic()
+            self._schema = schema
+            self._schema_fingerprint = fingerprint
+            self._checked_at = now
+            self._loaded_at = now
+            self._loads += 1
+            return schema
+
+    def invalidate(self):
+        """Drop the cached schema so the next get() reloads it"""
+        with self._lock:
+            self._schema = None
+            self._schema_fingerprint = None
+            self._checked_at = 0.0
+            self._invalidations += 1
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return self._schema_fingerprint
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/load counters and the age of the cached schema"""
+        cached = self._schema is not None
+        return {
+            "ttl_seconds": self.ttl,
+            "cached": cached,
+            "tables": len(self._schema) if cached else 0,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 3) if cached else None,
+            "hits": self._hits,
+            "loads": self._loads,
+            "revalidations": self._revalidations,
+            "invalidations": self._invalidations
+        }
+
+    def _is_fresh(self) -> bool:
+        return self._schema is not None and time.monotonic() - self._checked_at < self.ttl
+
+
+_schema_caches: Dict[str, SchemaCache] = {}
+_schema_cache_lock = threading.Lock()
+
+
+def get_schema_cache() -> SchemaCache:
+    """Schema cache of the current datasource, created on first use.
+
+    The loader and fingerprint run in the caller's context, so they read from
+    the same datasource the cache belongs to.
+    """
+    name = current_datasource().name
+    cache = _schema_caches.get(name)
+    if cache is None:
+        with _schema_cache_lock:
+            cache = _schema_caches.get(name)
+            if cache is None:
+                cache = _schema_caches[name] = SchemaCache(
+                    get_database_schema,
+                    fingerprint=get_schema_fingerprint if SCHEMA_CACHE_CHANGE_DETECTION else None,
+                    ttl=SCHEMA_CACHE_TTL
+                )
+    return cache
+
+
+def get_schema_cache_stats() -> Dict[str, Any]:
+    """Stats of every datasource's schema cache loaded so far"""
+    return {name: cache.stats() for name, cache in sorted(_schema_caches.items())}
+
+
+def get_cached_schema(force_refresh: bool = False) -> Dict[str, Any]:
+    """Schema of the current datasource from its cache"""
+    return get_schema_cache().get(force_refresh=force_refresh)
+
+
+def invalidate_schema_cache():
+    """Force the current datasource's next schema lookup to reload from MySQL"""
+    get_schema_cache().invalidate()
@@ -0,0 +1,200 @@
+# app/schema_prompt.py
+"""
+Compile the introspected schema into a compact, question-relevant prompt for Bedrock
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .config import SCHEMA_PROMPT_PRUNE, SCHEMA_PROMPT_MAX_TABLES, SCHEMA_PROMPT_MAX_COLUMNS
+
+PROMPT_HEADER = "-- table(column type [PK|UQ|FK->table.column], ...)"
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "give", "how", "i",
+    "in", "is", "it", "list", "many", "me", "much", "of", "on", "or", "please", "show",
+    "tell", "that", "the", "their", "them", "to", "what", "which", "who", "with", "all",
+    "find", "get", "each", "every", "there", "do", "does", "have", "has"
+}
+
+
+@dataclass
+class SchemaPrompt:
+    """Compiled schema text plus the numbers reported back to the caller"""
+    text: str
+    tables: List[str] = field(default_factory=list)
+    total_tables: int = 0
+    tokens: int = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "tables": len(self.tables),
+            "total_tables": self.total_tables,
+            "pruned": len(self.tables) < self.total_tables,
+            "tokens": self.tokens
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English and SQL identifiers)"""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def tokenize(text: str) -> List[str]:
+    """Split identifiers and prose into lowercase terms (snake_case, camelCase, plurals)"""
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    terms = []
+    for word in re.split(r"[^A-Za-z0-9]+", text.lower()):
+        if not word or word in _STOPWORDS:
+            continue
+        terms.append(_stem(word))
+    return terms
+
+
+def _stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class _BM25Index:
+    """BM25 over one document per table (table name weighted above column names)"""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.docs: Dict[str, Counter] = {}
+        for table, info in schema.items():
+            terms = tokenize(table) * 3
+            for column in info.get("columns", []):
+                terms.extend(tokenize(column.get("Field", "")))
+            self.docs[table] = Counter(terms)
+        lengths = [sum(doc.values()) for doc in self.docs.values()]
+        self.avg_len = sum(lengths) / len(lengths) if lengths else 0.0
+        df = Counter()
+        for doc in self.docs.values():
+            df.update(doc.keys())
+        n = len(self.docs)
+        self.idf = {term: math.log((n - freq + 0.5) / (freq + 0.5) + 1) for term, freq in df.items()}
+
+    def score(self, terms: List[str]) -> Dict[str, float]:
+        scores = {}
+        for table, doc in self.docs.items():
+            doc_len = sum(doc.values())
+            total = 0.0
+            for term in set(terms):
+                tf = doc.get(term)
+                if not tf:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * doc_len / (self.avg_len or 1))
+                total += self.idf[term] * tf * (self.k1 + 1) / norm
+            scores[table] = total
+        return scores
+
+
+_index_lock = threading.Lock()
+_index_cache: Tuple[Optional[Dict[str, Any]], Optional[_BM25Index]] = (None, None)
+
+
+def _get_index(schema: Dict[str, Any]) -> _BM25Index:
+    # The schema cache hands out the same dict until it reloads, so one slot is enough
+    global _index_cache
+    cached_schema, index = _index_cache
+    if cached_schema is schema and index is not None:
+        return index
+    with _index_lock:
+        index = _BM25Index(schema)
+        _index_cache = (schema, index)
+    return index
+
+
+def select_tables(schema: Dict[str, Any], question: str, max_tables: int) -> List[str]:
+    """Highest-scoring tables for the question plus the tables they reference by foreign key"""
+    if len(schema) <= max_tables:
+        return list(schema)
+    terms = tokenize(question)
+    scores = _get_index(schema).score(terms) if terms else {}
+    ranked = [table for table, score in sorted(scores.items(), key=lambda item: -item[1]) if score > 0]
+    if not ranked:
+        # Nothing matched; the model is better served by the whole (compact) schema
+        return list(schema)
+
+    selected = ranked[:max_tables]
+    chosen = set(selected)
+    for table in list(selected):
+        for fk in schema[table].get("foreign_keys", []):
+            ref = fk.get("references_table")
+            if ref in schema and ref not in chosen and len(selected) < max_tables * 2:
+                selected.append(ref)
+                chosen.add(ref)
+    return selected
+
+
+def _key_columns(info: Dict[str, Any]) -> Set[str]:
+    keys = {column["Field"] for column in info.get("columns", []) if column.get("Key")}
+    keys.update(fk["column"] for fk in info.get("foreign_keys", []))
+    return keys
+
+
+def compile_table(table: str, info: Dict[str, Any], question_terms: Optional[Set[str]] = None,
+                  max_columns: int = 0) -> str:
+    """Render one table as `table(col type PK, col type FK->t.c)`"""
+    foreign_keys = {fk["column"]: fk for fk in info.get("foreign_keys", [])}
+    columns = info.get("columns", [])
+    if max_columns and len(columns) > max_columns and question_terms is not None:
+        keep = _key_columns(info)
+        keep.update(
+            column["Field"] for column in columns
+            if question_terms.intersection(tokenize(column["Field"]))
+        )
+        for column in columns:
+            if len(keep) >= max_columns:
+                break
+            keep.add(column["Field"])
+        columns = [column for column in columns if column["Field"] in keep]
+
+    parts = []
+    for column in columns:
+        part = f"{column['Field']} {column.get('Type', '')}".rstrip()
+        key = column.get("Key")
+        if key == "PRI":
+            part += " PK"
+        elif key == "UNI":
+            part += " UQ"
+        fk = foreign_keys.get(column["Field"])
+        if fk:
+            part += f" FK->{fk['references_table']}.{fk['references_column']}"
+        parts.append(part)
+    return f"{table}({', '.join(parts)})"
+
+
+def compile_schema_prompt(
+    schema: Dict[str, Any],
+    question: Optional[str] = None,
+    prune: Optional[bool] = None,
+    max_tables: Optional[int] = None,
+    max_columns: Optional[int] = None
+) -> SchemaPrompt:
+    """Build the compact schema text passed to generate_sql_from_nl"""
+    prune = SCHEMA_PROMPT_PRUNE if prune is None else prune
+    max_tables = SCHEMA_PROMPT_MAX_TABLES if max_tables is None else max_tables
+    max_columns = SCHEMA_PROMPT_MAX_COLUMNS if max_columns is None else max_columns
+
+    if prune and question:
+        tables = select_tables(schema, question, max_tables)
+        question_terms = set(tokenize(question))
+    else:
+        tables = list(schema)
+        question_terms = None
+
+    lines = [PROMPT_HEADER]
+    lines.extend(compile_table(table, schema[table], question_terms, max_columns) for table in tables)
+    text = "\n".join(lines)
+    return SchemaPrompt(text=text, tables=tables, total_tables=len(schema), tokens=estimate_tokens(text))
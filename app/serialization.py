@@ -0,0 +1,215 @@
+# app/serialization.py
+"""
+Column-typed row serialization and fast JSON encoding for query results
+"""
+
+import decimal
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi.responses import Response
+from mysql.connector.constants import FieldType
+
+from .metrics import timed
+from .tracing import current_span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+ColumnConverter = Optional[Callable[[Sequence[Any]], List[Any]]]
+
+# cursor.description flag marking binary (bytes-returning) string/blob columns
+_BINARY_FLAG = 128
+
+
+def _format_timedelta(value: timedelta) -> str:
+    # mysql.connector returns TIME columns as timedelta; render them the way MySQL does
+    sign = ""
+    if value.days < 0:
+        sign, value = "-", -value
+    minutes, seconds = divmod(value.days * 86400 + value.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    if value.microseconds:
+        return "%s%02d:%02d:%02d.%06d" % (sign, hours, minutes, seconds, value.microseconds)
+    return "%s%02d:%02d:%02d" % (sign, hours, minutes, seconds)
+
+
+def _convert_any(value):
+    """Per-cell fallback matching serialize_mysql_data for types without a fixed converter"""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return _format_timedelta(value)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return value
+
+
+def _temporal(value):
+    if isinstance(value, timedelta):
+        return _format_timedelta(value)
+    return value.isoformat()
+
+
+def _text(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    return value
+
+
+def _set(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return _text(value)
+
+
+def _column(func: Callable[[Any], Any]) -> Callable[[Sequence[Any]], List[Any]]:
+    """Lift a cell converter to a whole column, mapping in C when the column has no NULLs"""
+    def convert(values: Sequence[Any]) -> List[Any]:
+        if None in values:
+            return [None if value is None else func(value) for value in values]
+        return list(map(func, values))
+    return convert
+
+
+_NATIVE_TYPES = {
+    FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24,
+    FieldType.FLOAT, FieldType.DOUBLE, FieldType.YEAR, FieldType.NULL
+}
+_STRING_TYPES = {
+    FieldType.VARCHAR, FieldType.VAR_STRING, FieldType.STRING, FieldType.ENUM, FieldType.JSON,
+    FieldType.TINY_BLOB, FieldType.MEDIUM_BLOB, FieldType.LONG_BLOB, FieldType.BLOB
+}
+_TYPE_CONVERTERS = {
+    FieldType.DECIMAL: _column(float),
+    FieldType.NEWDECIMAL: _column(float),
+    FieldType.DATE: _column(date.isoformat),
+    FieldType.NEWDATE: _column(date.isoformat),
+    FieldType.DATETIME: _column(datetime.isoformat),
+    FieldType.TIMESTAMP: _column(datetime.isoformat),
+    FieldType.TIME: _column(_temporal),
+    FieldType.SET: _column(_set)
+}
+# Types orjson encodes itself, identically to their isoformat()
+_ORJSON_NATIVE_TYPES = {FieldType.DATE, FieldType.NEWDATE, FieldType.DATETIME, FieldType.TIMESTAMP}
+_TEXT_CONVERTER = _column(_text)
+_ANY_CONVERTER = _column(_convert_any)
+
+
+def column_converters(description: Sequence[Sequence[Any]]) -> List[ColumnConverter]:
+    """One column converter chosen from each cursor.description type code (None = pass through)"""
+    converters = []
+    for column in description:
+        type_code = column[1]
+        flags = column[7] if len(column) > 7 else None
+        if type_code in _NATIVE_TYPES:
+            converters.append(None)
+        elif type_code in _STRING_TYPES:
+            # Non-binary text already arrives as str; only binary columns need decoding
+            binary = flags is None or flags & _BINARY_FLAG
+            converters.append(_TEXT_CONVERTER if binary else None)
+        else:
+            converters.append(_TYPE_CONVERTERS.get(type_code, _ANY_CONVERTER))
+    return converters
+
+
+class RowSerializer:
+    """Turns tuple rows from a non-dictionary cursor into JSON-ready rows, one column at a time"""
+
+    def __init__(self, description: Sequence[Sequence[Any]]):
+        self.description = description
+        self.columns = [column[0] for column in description]
+        self.converters = column_converters(description)
+        self._converted = [(index, conv) for index, conv in enumerate(self.converters) if conv is not None]
+        self._orjson_converted = [
+            (index, conv) for index, conv in self._converted
+            if description[index][1] not in _ORJSON_NATIVE_TYPES
+        ]
+
+    def values(self, rows: Sequence[Sequence[Any]]) -> List[Sequence[Any]]:
+        """Converted rows in column order"""
+        return self._apply(self._converted, rows)
+
+    @staticmethod
+    def _apply(converted, rows: Sequence[Sequence[Any]]) -> List[Sequence[Any]]:
+        if not converted or not rows:
+            return list(rows)
+        columns = list(zip(*rows))
+        for index, conv in converted:
+            columns[index] = conv(columns[index])
+        return list(zip(*columns))
+
+    def dicts(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """Converted rows as {column: value} dicts (the execute_sql_query row shape)"""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.values(rows)]
+
+    def encode_each(self, rows: Sequence[Sequence[Any]]) -> List[bytes]:
+        """One JSON object per raw row; with orjson, dates and datetimes are encoded natively"""
+        columns = self.columns
+        if orjson is not None:
+            encode = orjson.dumps
+            rows = self._apply(self._orjson_converted, rows)
+            return [encode(dict(zip(columns, row)), default=_orjson_default) for row in rows]
+        return [json.dumps(row).encode("utf-8") for row in self.dicts(rows)]
+
+    def encode_values(self, rows: Sequence[Sequence[Any]]) -> bytes:
+        """Raw rows as comma-separated JSON arrays (no column names, no enclosing brackets)"""
+        if not rows:
+            return b""
+        if orjson is not None:
+            rows = self._apply(self._orjson_converted, rows)
+            return orjson.dumps(rows, default=_orjson_default)[1:-1]
+        return json.dumps(self.values(rows), default=_json_default).encode("utf-8")[1:-1]
+
+
+def _orjson_default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, timedelta):
+        return _format_timedelta(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _json_default(value):
+    converted = _convert_any(value)
+    if converted is value:
+        return str(value)
+    return converted
+
+
+def dumps_bytes(value: Any, indent: bool = False) -> bytes:
+    """Encode to JSON bytes with orjson when installed (datetime, Decimal and bytes handled natively)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(value, default=_orjson_default, option=option)
+    return json.dumps(value, default=_json_default, indent=2 if indent else None).encode("utf-8")
+
+
+def dumps(value: Any, indent: bool = False) -> str:
+    return dumps_bytes(value, indent=indent).decode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded in one pass, skipping FastAPI's jsonable_encoder walk"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        with timed("encode"):
+            body = dumps_bytes(content)
+        current_span().set_attribute("http.response.body.size", len(body))
+        return body
@@ -3,15 +3,33 @@
 Shared utilities for MySQL NLP operations
 """
 
+import contextvars
+import hashlib
 import json
-import boto3
-import mysql.connector
 from mysql.connector import Error
 from botocore.exceptions import ClientError
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List
 from datetime import date, datetime, time
 import decimal
-from .config import DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASS, AWS_REGION, BEDROCK_MODEL_ID
+from .config import (
+    BEDROCK_MODEL_ID, BEDROCK_STREAMING,
+    SCHEMA_INCLUDE_SAMPLES, SCHEMA_SAMPLE_ROWS, SCHEMA_SAMPLE_WORKERS, STREAM_BATCH_SIZE
+)
+from .db_pool import PoolTimeoutError
+from .datasources import current_datasource
+from .bedrock_client import get_bedrock_client
+from .sql_stream import INFERENCE_CONFIG, collect_sql, converse_sql_events
+from .metrics import record_bedrock_usage, timed
+from .tracing import current_span, set_bedrock_usage, span, sql_hash
+from .serialization import RowSerializer, dumps_bytes
+from .sql_safety import check_sql_safety
+from .timeouts import (
+    QueryTimeoutError, current_guard, statement_timeout, stream_statement_timeout, with_max_execution_time
+)
+
+# ER_QUERY_INTERRUPTED (KILL QUERY) and ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME exceeded)
+_TIMEOUT_ERRNOS = {1317, 3024}
 
 def serialize_mysql_data(data):
     """Convert MySQL data types to JSON-serializable formats"""
@@ -31,96 +49,267 @@ def serialize_mysql_data(data):
         return data
 
 def get_db_connection():
-    """Get MySQL database connection"""
+    """Borrow a connection from the current datasource's best endpoint; close() returns it to its pool"""
     try:
-        return mysql.connector.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASS,
-            database=DB_NAME,
-            autocommit=True
-        )
-    except Error as e:
+        return current_datasource().acquire()
+    except (Error, PoolTimeoutError) as e:
         raise Exception(f"Database connection error: {str(e)}")
 
+def _db_attributes(sql_query: str) -> Dict[str, Any]:
+    datasource = current_datasource()
+    return {"db.system": "mysql", "db.namespace": datasource.database, "nlsql.datasource": datasource.name,
+            "db.statement.hash": sql_hash(sql_query)}
+
 def execute_sql_query(sql_query: str) -> Dict[str, Any]:
     """Execute SQL query and return results"""
-    # Security check - only allow SELECT queries
-    sql_upper = sql_query.upper().strip()
-    if not sql_upper.startswith('SELECT'):
-        raise ValueError("Only SELECT queries are allowed for security")
+    check_sql_safety(sql_query)
     
+    with span("mysql.execute_sql_query", _db_attributes(sql_query), kind="client") as current:
+        result = _run_sql_query(sql_query)
+        current.set_attribute("db.response.returned_rows", result["row_count"])
+        if current.is_recording():
+            # Encoding the rows again costs time, so only when the span is exported
+            current.set_attribute("db.response.serialized_bytes", len(dumps_bytes(result["rows"])))
+        return result
+
+def _run_sql_query(sql_query: str) -> Dict[str, Any]:
+    # Set by run_with_deadline so a timed-out or cancelled caller can KILL QUERY this statement
+    guard = current_guard()
     conn = get_db_connection()
+    cursor = None
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(sql_query)
+        if guard is not None:
+            guard.attach(conn.connection_id, conn.pool)
+        cursor = conn.cursor()
+        with timed("execute"):
+            cursor.execute(with_max_execution_time(sql_query, statement_timeout()))
         
-        # Get column names
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        if not cursor.description:
+            cursor.fetchall()
+            return {"columns": [], "rows": [], "row_count": 0}
+        
+        # Converters are picked once per column from the cursor's type codes
+        serializer = RowSerializer(cursor.description)
         
         # Fetch results
-        rows = cursor.fetchall()
+        with timed("fetch"):
+            rows = cursor.fetchall()
         
         # Serialize the data to handle MySQL data types
-        serialized_rows = serialize_mysql_data(rows)
+        with timed("serialize"):
+            serialized_rows = serializer.dicts(rows)
         
         return {
-            "columns": columns,
+            "columns": serializer.columns,
             "rows": serialized_rows,
             "row_count": len(serialized_rows)
         }
+    except Error as e:
+        if e.errno in _TIMEOUT_ERRNOS:
+            raise QueryTimeoutError(f"Query exceeded its time budget: {e.msg}")
+        raise
     finally:
-        cursor.close()
+        if guard is not None:
+            guard.detach()
+        if cursor is not None:
+            cursor.close()
         conn.close()
 
-def get_database_schema() -> Dict[str, Any]:
-    """Get database schema information"""
+def stream_sql_query(sql_query: str, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Any]:
+    """Execute SQL query on an unbuffered cursor and yield cursor.description, then raw row batches.
+
+    Rows are pulled from the server with fetchmany, so memory stays bounded by
+    batch_size however large the result is. Batches are tuples straight from the
+    driver; encoders pick per-column converters from the description. The pooled
+    connection is held until the generator is exhausted or closed; an early close
+    discards the connection rather than draining the remaining rows.
+    
+    The current guard (if any) stays attached until then, so the statement can be
+    killed mid-stream; its deadline, not QUERY_TIMEOUT, bounds the statement.
+    """
+    check_sql_safety(sql_query)
+    
+    guard = current_guard()
     conn = get_db_connection()
+    cursor = None
+    exhausted = False
     try:
-        cursor = conn.cursor(dictionary=True)
+        if guard is not None:
+            guard.attach(conn.connection_id, conn.pool)
+        cursor = conn.cursor(buffered=False)
+        with timed("execute"):
+            cursor.execute(with_max_execution_time(sql_query, stream_statement_timeout()))
+        yield cursor.description or []
         
-        # Get all tables
-        cursor.execute("SHOW TABLES")
-        tables = [list(row.values())[0] for row in cursor.fetchall()]
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+        exhausted = True
+    except Error as e:
+        if e.errno in _TIMEOUT_ERRNOS:
+            raise QueryTimeoutError(f"Query exceeded its time budget: {e.msg}")
+        raise
+    finally:
+        if guard is not None:
+            guard.detach()
+        if exhausted:
+            cursor.close()
+            conn.close()
+        else:
+            conn.discard()
+
+def _text(value):
+    """information_schema values may come back as bytes depending on server collation"""
+    return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else value
+
+def _quote_identifier(name: str) -> str:
+    return "`" + name.replace("`", "``") + "`"
+
+def fetch_sample_rows(table: str, limit: int = SCHEMA_SAMPLE_ROWS) -> List[Dict[str, Any]]:
+    """Fetch the first rows of a table on its own pooled connection"""
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT * FROM {_quote_identifier(table)} LIMIT {int(limit)}")
+        return serialize_mysql_data(cursor.fetchall())
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+def get_database_schema(include_samples: bool = None) -> Dict[str, Any]:
+    """Get database schema information.
+
+    Columns, keys, foreign keys and indexes for every table are read with three
+    bulk information_schema queries instead of a DESCRIBE per table. Column
+    entries keep the DESCRIBE shape (Field, Type, Null, Key, Default, Extra).
+    Sample rows are optional and fetched concurrently over the connection pool.
+    """
+    if include_samples is None:
+        include_samples = SCHEMA_INCLUDE_SAMPLES
+
+    with timed("schema_introspection"), span("mysql.get_database_schema", {"db.system": "mysql"}) as current:
+        schema = _read_database_schema(include_samples)
+        current.set_attribute("db.schema.tables", len(schema))
+        return schema
+
+def _read_database_schema(include_samples: bool) -> Dict[str, Any]:
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
         
         schema = {}
-        for table in tables:
-            # Get table structure
-            cursor.execute(f"DESCRIBE `{table}`")
-            columns = cursor.fetchall()
-            
-            # Get sample data (first 3 rows)
-            cursor.execute(f"SELECT * FROM `{table}` LIMIT 3")
-            sample_data = cursor.fetchall()
-            
-            schema[table] = {
-                "columns": serialize_mysql_data(columns),
-                "sample_data": serialize_mysql_data(sample_data)
-            }
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, EXTRA "
+            "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+        )
+        for table, field, column_type, nullable, key, default, extra in cursor.fetchall():
+            table = _text(table)
+            entry = schema.setdefault(table, {"columns": [], "foreign_keys": [], "indexes": [], "sample_data": []})
+            entry["columns"].append({
+                "Field": _text(field),
+                "Type": _text(column_type),
+                "Null": _text(nullable),
+                "Key": _text(key) or "",
+                "Default": serialize_mysql_data(_text(default)),
+                "Extra": _text(extra) or ""
+            })
         
-        return schema
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME, CONSTRAINT_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME "
+            "FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL "
+            "ORDER BY TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION"
+        )
+        for table, column, constraint, ref_table, ref_column in cursor.fetchall():
+            entry = schema.get(_text(table))
+            if entry is not None:
+                entry["foreign_keys"].append({
+                    "column": _text(column),
+                    "references_table": _text(ref_table),
+                    "references_column": _text(ref_column),
+                    "constraint": _text(constraint)
+                })
+        
+        cursor.execute(
+            "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, COLUMN_NAME "
+            "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+            "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+        )
+        indexes = {}
+        for table, index_name, non_unique, column in cursor.fetchall():
+            table, index_name = _text(table), _text(index_name)
+            if table not in schema:
+                continue
+            index = indexes.get((table, index_name))
+            if index is None:
+                index = {"name": index_name, "unique": not int(non_unique), "columns": []}
+                indexes[(table, index_name)] = index
+                schema[table]["indexes"].append(index)
+            index["columns"].append(_text(column))
     finally:
-        cursor.close()
+        if cursor is not None:
+            cursor.close()
         conn.close()
 
-def generate_sql_from_nl(question: str, schema_info: str = None) -> str:
-    """Generate SQL query from natural language using AWS Bedrock"""
+    if include_samples and schema:
+        workers = max(1, min(SCHEMA_SAMPLE_WORKERS, len(schema)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="schema-sample") as executor:
+            # Pool threads do not inherit context variables; without a copy they would read from the default datasource
+            futures = {
+                table: executor.submit(contextvars.copy_context().run, fetch_sample_rows, table) for table in schema
+            }
+            for table, future in futures.items():
+                schema[table]["sample_data"] = future.result()
+    
+    return schema
+
+# Row count and an order-independent checksum of the DDL-relevant columns of each
+# information_schema view; UPDATE_TIME is left out because every INSERT, UPDATE and DELETE moves it
+_SCHEMA_FINGERPRINT_SQL = " UNION ALL ".join(
+    f"SELECT '{view}', COUNT(*), COALESCE(SUM(CRC32(CONCAT_WS('|', {columns}))), 0) "
+    f"FROM information_schema.{view} WHERE TABLE_SCHEMA = DATABASE()"
+    for view, columns in (
+        ("TABLES", "TABLE_NAME, TABLE_TYPE, CREATE_TIME, TABLE_COMMENT"),
+        ("COLUMNS", "TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, COLUMN_TYPE, IS_NULLABLE, "
+                    "COALESCE(COLUMN_DEFAULT, '<null>'), COLUMN_KEY, EXTRA, COLUMN_COMMENT"),
+        ("STATISTICS", "TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX, COLUMN_NAME, NON_UNIQUE"),
+        ("KEY_COLUMN_USAGE", "TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, ORDINAL_POSITION, "
+                             "COALESCE(REFERENCED_TABLE_NAME, ''), COALESCE(REFERENCED_COLUMN_NAME, '')"),
+    )
+)
+
+def get_schema_fingerprint() -> str:
+    """Hash that changes on DDL only: table CREATE_TIMEs plus checksums of columns, indexes and keys, in one query"""
+    conn = get_db_connection()
+    cursor = None
     try:
-        # Initialize Bedrock client
-        bedrock_client = boto3.client(
-            service_name="bedrock-runtime",
-            region_name=AWS_REGION
-        )
-        
-        # Prepare the prompt
-        prompt = f"""You are an expert SQL query generator for MySQL databases.
+        cursor = conn.cursor()
+        cursor.execute(_SCHEMA_FINGERPRINT_SQL)
+        digest = hashlib.sha256()
+        for view, count, checksum in cursor.fetchall():
+            digest.update(f"{view}|{count}|{checksum}\n".encode("utf-8"))
+        return digest.hexdigest()
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+def build_sql_prompt(question: str, schema_info: str = None, feedback: str = None) -> str:
+    """Prompt sent to Bedrock for one question (feedback: why the last attempt was refused)"""
+    feedback_section = f"\nFeedback on a previous attempt:\n{feedback}\n" if feedback else ""
+    return f"""You are an expert SQL query generator for MySQL databases.
 
 Question: {question}
 
 Database Schema:
 {schema_info if schema_info else "No schema information provided"}
-
+{feedback_section}
 Instructions:
 1. Generate a valid MySQL SELECT query only
 2. Use proper table and column names from the schema
@@ -130,42 +319,66 @@ Instructions:
 
 SQL Query:"""
 
-        # Use Converse API for Claude models
-        response = bedrock_client.converse(
-            modelId=BEDROCK_MODEL_ID,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [{"text": prompt}]
-                }
-            ],
-            inferenceConfig={
-                "maxTokens": 1000,
-                "temperature": 0.1
-            }
-        )
+def clean_generated_sql(sql_query: str) -> str:
+    """Strip markdown code fences and whitespace from model output"""
+    sql_query = sql_query.strip()
+    if sql_query.startswith("```sql"):
+        sql_query = sql_query[6:]
+    if sql_query.startswith("```"):
+        sql_query = sql_query[3:]
+    if sql_query.endswith("```"):
+        sql_query = sql_query[:-3]
+    return sql_query.strip()
 
-        # Extract SQL from Converse API response
-        sql_query = ""
+def generate_sql_from_nl(question: str, schema_info: str = None, feedback: str = None) -> str:
+    """Generate SQL query from natural language using AWS Bedrock (feedback: why the last attempt was refused)"""
+    attributes = {"gen_ai.system": "aws.bedrock", "gen_ai.request.model": BEDROCK_MODEL_ID,
+                  "gen_ai.request.streaming": BEDROCK_STREAMING, "nlsql.regeneration": feedback is not None}
+    with timed("generate"), span("bedrock.generate_sql", attributes, kind="client") as current:
+        sql_query = _generate_sql(question, schema_info, feedback)
+        current.set_attribute("db.statement.hash", sql_hash(sql_query))
+        return sql_query
+
+def _generate_sql(question: str, schema_info: str = None, feedback: str = None) -> str:
+    try:
+        prompt = build_sql_prompt(question, schema_info, feedback)
         
-        if "output" in response and "message" in response["output"]:
-            content = response["output"]["message"].get("content", [])
-            if content and len(content) > 0:
-                sql_query = content[0].get("text", "").strip()
+        if BEDROCK_STREAMING:
+            # ConverseStream: stop reading once the statement ends instead of waiting for trailing prose
+            sql_query = collect_sql(converse_sql_events(prompt))
+        else:
+            # Shared client: credentials, endpoint and TLS connections are reused
+            bedrock_client = get_bedrock_client()
+            
+            # Use Converse API for Claude models
+            with timed("bedrock"):
+                response = bedrock_client.converse(
+                    modelId=BEDROCK_MODEL_ID,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [{"text": prompt}]
+                        }
+                    ],
+                    inferenceConfig=INFERENCE_CONFIG
+                )
+            record_bedrock_usage(response.get("usage"))
+            set_bedrock_usage(current_span(), response.get("usage"))
+
+            # Extract SQL from Converse API response
+            sql_query = ""
+            
+            if "output" in response and "message" in response["output"]:
+                content = response["output"]["message"].get("content", [])
+                if content and len(content) > 0:
+                    sql_query = content[0].get("text", "").strip()
         
         # Check if we got a valid SQL query
         if not sql_query:
             raise Exception("No SQL query generated from Bedrock response")
         
         # Clean up the SQL query (remove markdown formatting if present)
-        if sql_query.startswith("```sql"):
-            sql_query = sql_query[6:]
-        if sql_query.startswith("```"):
-            sql_query = sql_query[3:]
-        if sql_query.endswith("```"):
-            sql_query = sql_query[:-3]
-        
-        sql_query = sql_query.strip()
+        sql_query = clean_generated_sql(sql_query)
         
         # Final validation - ensure we have a non-empty SQL query
         if not sql_query:
@@ -0,0 +1,254 @@
+# app/sql_cache.py
+"""
+Cache of generated SQL keyed on the normalized question and a hash of the schema prompt
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .config import (
+    SQL_CACHE_BACKEND, SQL_CACHE_PATH, SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL,
+    SQL_CACHE_FUZZY_THRESHOLD
+)
+from .shared_utils import generate_sql_from_nl
+
+# Words that never change the meaning of a request for data
+_FILLER_WORDS = {
+    "a", "an", "the", "me", "please", "kindly", "can", "could", "would", "you", "us", "i", "want", "to", "see"
+}
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    words = re.findall(r"[a-z0-9_]+|[<>=]+", (question or "").lower())
+    return " ".join(word for word in words if word not in _FILLER_WORDS)
+
+
+def _token_set(normalized: str) -> frozenset:
+    terms = set()
+    for word in normalized.split():
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return frozenset(terms)
+
+
+def token_set_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the (singularised) word sets of two normalized questions"""
+    set_a, set_b = _token_set(a), _token_set(b)
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+def schema_hash(schema_text: str) -> str:
+    return hashlib.sha256((schema_text or "").encode("utf-8")).hexdigest()
+
+
+def _cache_key(schema_digest: str, normalized: str) -> str:
+    return hashlib.sha256(f"{schema_digest}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU with TTL"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl > 0 and time.time() - entry["created_at"] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def candidates(self, schema_digest: str) -> Iterable[Tuple[str, str]]:
+        with self._lock:
+            return [
+                (key, entry["normalized"]) for key, entry in self._entries.items()
+                if entry["schema_hash"] == schema_digest
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk cache shared by every process that points at the same file"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: float = 3600.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nl_sql_cache ("
+            "key TEXT PRIMARY KEY, schema_hash TEXT NOT NULL, question TEXT NOT NULL, "
+            "normalized TEXT NOT NULL, sql TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nl_sql_cache_schema ON nl_sql_cache (schema_hash)")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT schema_hash, question, normalized, sql, created_at FROM nl_sql_cache WHERE key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl > 0 and now - row[4] > self.ttl:
+                self._conn.execute("DELETE FROM nl_sql_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE nl_sql_cache SET last_access = ? WHERE key = ?", (now, key))
+        return {"schema_hash": row[0], "question": row[1], "normalized": row[2], "sql": row[3], "created_at": row[4]}
+
+    def set(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nl_sql_cache "
+                "(key, schema_hash, question, normalized, sql, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry["schema_hash"], entry["question"], entry["normalized"], entry["sql"],
+                 entry["created_at"], entry["created_at"])
+            )
+            self._conn.execute(
+                "DELETE FROM nl_sql_cache WHERE key IN ("
+                "SELECT key FROM nl_sql_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def candidates(self, schema_digest: str) -> Iterable[Tuple[str, str]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, normalized FROM nl_sql_cache WHERE schema_hash = ?", (schema_digest,)
+            ).fetchall()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM nl_sql_cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM nl_sql_cache").fetchone()[0]
+
+
+class SQLCache:
+    """Exact, normalized and (optionally) fuzzy lookup of previously generated SQL"""
+
+    def __init__(self, backend, fuzzy_threshold: float = 0.0):
+        self.backend = backend
+        self.fuzzy_threshold = fuzzy_threshold
+        self._lock = threading.Lock()
+        self._counts = {"exact": 0, "normalized": 0, "fuzzy": 0, "miss": 0}
+
+    def lookup(self, question: str, schema_text: str) -> Optional[Tuple[str, str]]:
+        """Return (sql, match_type) for a cached answer, or None"""
+        digest = schema_hash(schema_text)
+        normalized = normalize_question(question)
+        entry = self.backend.get(_cache_key(digest, normalized))
+        match = None
+        if entry is not None:
+            match = "exact" if entry["question"] == question.strip() else "normalized"
+        elif self.fuzzy_threshold > 0:
+            best_key, best_score = None, 0.0
+            for key, candidate in self.backend.candidates(digest):
+                score = token_set_similarity(normalized, candidate)
+                if score > best_score:
+                    best_key, best_score = key, score
+            if best_key is not None and best_score >= self.fuzzy_threshold:
+                entry = self.backend.get(best_key)
+                match = "fuzzy" if entry is not None else None
+        with self._lock:
+            self._counts[match or "miss"] += 1
+        return (entry["sql"], match) if match else None
+
+    def store(self, question: str, schema_text: str, sql: str):
+        digest = schema_hash(schema_text)
+        normalized = normalize_question(question)
+        self.backend.set(_cache_key(digest, normalized), {
+            "schema_hash": digest,
+            "question": question.strip(),
+            "normalized": normalized,
+            "sql": sql,
+            "created_at": time.time()
+        })
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = sum(counts.values())
+        hits = lookups - counts["miss"]
+        return {
+            "backend": self.backend.name,
+            "entries": len(self.backend),
+            "fuzzy_threshold": self.fuzzy_threshold,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            **{f"{kind}_hits": count for kind, count in counts.items() if kind != "miss"}
+        }
+
+
+_sql_cache: Optional[SQLCache] = None
+_sql_cache_lock = threading.Lock()
+
+
+def get_sql_cache() -> Optional[SQLCache]:
+    """Process-wide generated-SQL cache, or None when SQL_CACHE_BACKEND is 'off'"""
+    global _sql_cache
+    if _sql_cache is None and SQL_CACHE_BACKEND != "off":
+        with _sql_cache_lock:
+            if _sql_cache is None:
+                if SQL_CACHE_BACKEND == "sqlite":
+                    backend = SQLiteBackend(SQL_CACHE_PATH, SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL)
+                elif SQL_CACHE_BACKEND == "memory":
+                    backend = MemoryBackend(SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL)
+                else:
+                    raise ValueError(f"Unknown SQL_CACHE_BACKEND: {SQL_CACHE_BACKEND}")
+                _sql_cache = SQLCache(backend, fuzzy_threshold=SQL_CACHE_FUZZY_THRESHOLD)
+    return _sql_cache
+
+
+def generate_sql_cached(question: str, schema_text: str) -> Tuple[str, bool]:
+    """generate_sql_from_nl behind the cache; returns (sql, cache_hit)"""
+    cache = get_sql_cache()
+    if cache is not None:
+        hit = cache.lookup(question, schema_text)
+        if hit is not None:
+            return hit[0], True
+    sql_query = generate_sql_from_nl(question, schema_text)
+    if cache is not None:
+        cache.store(question, schema_text, sql_query)
+    return sql_query, False
@@ -0,0 +1,136 @@
+# app/sql_safety.py
+"""
+AST-based read-only policy for every statement sent to MySQL, with cached verdicts
+"""
+
+import functools
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.tokens import TokenType
+
+from .config import SQL_ALLOWED_TABLES, SQL_BLOCKED_SCHEMAS, SQL_DENIED_FUNCTIONS, SQL_SAFETY_CACHE_SIZE
+from .datasources import current_datasource
+
+# Functions that block, sleep, take server-wide locks or read server files: one call can hold a
+# pooled connection (or the server) for as long as it likes
+DENIED_FUNCTIONS = frozenset({
+    "SLEEP", "BENCHMARK", "GET_LOCK", "RELEASE_LOCK", "RELEASE_ALL_LOCKS", "IS_FREE_LOCK", "IS_USED_LOCK",
+    "LOAD_FILE", "MASTER_POS_WAIT", "SOURCE_POS_WAIT", "WAIT_FOR_EXECUTED_GTID_SET",
+    "WAIT_UNTIL_SQL_THREAD_AFTER_GTIDS",
+}) | frozenset(name.upper() for name in SQL_DENIED_FUNCTIONS)
+
+
+class UnsafeQueryError(ValueError):
+    """Raised for statements the safety policy refuses to run"""
+
+
+@dataclass(frozen=True)
+class SafetyVerdict:
+    """Outcome of analyze_sql: whether the statement may run, why not, and the tables it reads.
+
+    tables holds (schema, table) pairs as written, unqualified ones in the current
+    database; it is None when a source is not a plain table (e.g. JSON_TABLE).
+    """
+    allowed: bool
+    reason: Optional[str] = None
+    tables: Optional[Tuple[Tuple[str, str], ...]] = ()
+
+
+def _refuse(reason: str) -> SafetyVerdict:
+    return SafetyVerdict(False, reason)
+
+
+def _function_name(node: exp.Func) -> str:
+    return (node.name if isinstance(node, exp.Anonymous) else node.sql_name()).upper()
+
+
+def _table_allowed(qualified: str, database: str) -> bool:
+    if not SQL_ALLOWED_TABLES:
+        return True
+    name = qualified.split(".", 1)[1] if qualified.startswith(f"{database}.") else qualified
+    return name in SQL_ALLOWED_TABLES or qualified in SQL_ALLOWED_TABLES
+
+
+@functools.lru_cache(maxsize=SQL_SAFETY_CACHE_SIZE)
+def _analyze(sql_query: str, database: str) -> SafetyVerdict:
+    try:
+        tokens = sqlglot.tokenize(sql_query, read="mysql")
+    except SqlglotError:
+        return _refuse("Statement could not be parsed")
+    is_query = bool(tokens) and tokens[0].token_type in (TokenType.SELECT, TokenType.WITH, TokenType.L_PAREN)
+    for token in tokens:
+        if token.token_type == TokenType.INTO and is_query:
+            # SELECT ... INTO OUTFILE / DUMPFILE writes server files; INTO @var has side effects
+            return _refuse("SELECT ... INTO is not allowed")
+        if any(comment.startswith("!") for comment in token.comments):
+            # MySQL runs the contents of /*! ... */ comments; the parser would not see them
+            return _refuse("Executable comments (/*! ... */) are not allowed")
+
+    try:
+        statements = [statement for statement in sqlglot.parse(sql_query, read="mysql") if statement is not None]
+    except SqlglotError:
+        return _refuse("Statement could not be parsed")
+    if len(statements) != 1:
+        return _refuse("Exactly one statement is allowed" if statements else "Empty statement")
+    tree = statements[0]
+    if not isinstance(tree, exp.Query):
+        return _refuse("Only SELECT queries are allowed for security")
+
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    lowered = database.lower()
+    tables: Optional[list] = []
+    for node in tree.walk():
+        if isinstance(node, (exp.DML, exp.DDL, exp.Command)):
+            return _refuse("Only SELECT queries are allowed for security")
+        if isinstance(node, exp.Lock):
+            return _refuse("Locking reads (FOR UPDATE / FOR SHARE / LOCK IN SHARE MODE) are not allowed")
+        if isinstance(node, exp.Func) and _function_name(node) in DENIED_FUNCTIONS:
+            return _refuse(f"Function {_function_name(node)}() is not allowed")
+        if isinstance(node, exp.Table):
+            if not isinstance(node.this, exp.Identifier):
+                # Table functions such as JSON_TABLE(...): no table to name
+                tables = None
+                continue
+            schema, name = node.db.lower(), node.name.lower()
+            if not schema and (name in ctes or name == "dual"):
+                continue
+            if schema in SQL_BLOCKED_SCHEMAS:
+                return _refuse(f"Tables in the {schema} schema are not allowed")
+            if not _table_allowed(f"{schema or lowered}.{name}", lowered):
+                return _refuse(f"Table {node.name} is not in the allowed list")
+            if tables is not None:
+                tables.append((node.db or database, node.name))
+    return SafetyVerdict(True, tables=tuple(dict.fromkeys(tables)) if tables is not None else None)
+
+
+def analyze_sql(sql_query: str) -> SafetyVerdict:
+    """Classify a statement; verdicts are cached per statement text and database, so repeats are a dict lookup.
+
+    Only surrounding whitespace is normalized: collapsing anything else could
+    turn a line comment into one that swallows the rest of the statement.
+    """
+    # Unqualified tables belong to the current datasource's database
+    return _analyze(sql_query.strip(), current_datasource().database)
+
+
+def check_sql_safety(sql_query: str):
+    """Raise UnsafeQueryError unless the statement is a single read-only query the policy allows"""
+    verdict = analyze_sql(sql_query)
+    if not verdict.allowed:
+        raise UnsafeQueryError(verdict.reason)
+
+
+def get_safety_stats() -> Dict[str, Any]:
+    info = _analyze.cache_info()
+    return {
+        "cache_hits": info.hits,
+        "cache_misses": info.misses,
+        "cache_size": info.currsize,
+        "cache_max_size": info.maxsize,
+        "allowed_tables": len(SQL_ALLOWED_TABLES) or None,
+        "blocked_schemas": sorted(SQL_BLOCKED_SCHEMAS)
+    }
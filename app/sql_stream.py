@@ -0,0 +1,180 @@
+# app/sql_stream.py
+"""
+Streaming SQL generation with Bedrock ConverseStream, stopping as soon as the statement is complete
+"""
+
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from .bedrock_client import get_bedrock_client, record_stream
+from .config import BEDROCK_MODEL_ID
+from .metrics import observe, record_bedrock_usage
+from .tracing import current_span, set_bedrock_usage
+
+INFERENCE_CONFIG = {"maxTokens": 1000, "temperature": 0.1}
+
+FENCE = "```"
+# Characters that may start a multi-character token (fence, comment) and need lookahead
+_LOOKAHEAD = {"`", "-", "/", "*"}
+
+
+class SQLStreamExtractor:
+    """Finds where the SQL statement ends in a completion that arrives in pieces.
+
+    The statement ends at a top-level `;` (kept) or at a closing code fence;
+    semicolons and fences inside quotes, backticks and comments are ignored.
+    Only newly arrived text is scanned on each feed().
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._quote: Optional[str] = None
+        self._comment: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, delta: str) -> bool:
+        """Append a piece of the completion; True once the end of the statement is known"""
+        if self.complete:
+            return True
+        self.text += delta
+        if self.start is None and not self._find_start():
+            return False
+        self._scan()
+        return self.complete
+
+    def _find_start(self) -> bool:
+        stripped = self.text.lstrip()
+        if len(stripped) < len(FENCE) and FENCE.startswith(stripped):
+            return False
+        offset = len(self.text) - len(stripped)
+        if stripped.startswith(FENCE):
+            newline = self.text.find("\n", offset)
+            if newline < 0:
+                return False
+            # Skip the opening fence and its language tag (```sql)
+            self.start = newline + 1
+        else:
+            self.start = offset
+        self._pos = self.start
+        return True
+
+    def _scan(self):
+        text, i, n = self.text, self._pos, len(self.text)
+        while i < n:
+            c = text[i]
+            if c in _LOOKAHEAD and i + 2 >= n:
+                break  # wait for more text before deciding what this starts
+            if self._comment == "line":
+                if c == "\n":
+                    self._comment = None
+            elif self._comment == "block":
+                if text.startswith("*/", i):
+                    self._comment = None
+                    i += 1
+            elif self._quote is not None:
+                if c == "\\" and self._quote != "`":
+                    if i + 1 >= n:
+                        break
+                    i += 1
+                elif c == self._quote:
+                    self._quote = None
+            elif text.startswith(FENCE, i):
+                self.end = i
+                break
+            elif c in ("'", '"', "`"):
+                self._quote = c
+            elif c == "#" or text.startswith("-- ", i) or text.startswith("--\n", i):
+                self._comment = "line"
+            elif text.startswith("/*", i):
+                self._comment = "block"
+                i += 1
+            elif c == ";":
+                self.end = i + 1
+                break
+            i += 1
+        self._pos = i
+
+    def sql(self) -> str:
+        """The statement so far (all of the text when no end was found), without fences"""
+        if self.start is None:
+            self._find_start()
+        start = self.start if self.start is not None else 0
+        body = self.text[start:self.end] if self.end is not None else self.text[start:]
+        if self.end is None and body.rstrip().endswith(FENCE):
+            body = body.rstrip()[:-len(FENCE)]
+        return body.strip()
+
+
+def converse_sql_events(prompt: str) -> Iterator[Dict[str, Any]]:
+    """Yield {"type": "token", "text"} per streamed delta, then {"type": "done", "sql", ...}.
+
+    Reading stops as soon as the SQL statement is complete, so trailing
+    explanations are never waited for. The done event reports time-to-first-token.
+    """
+    client = get_bedrock_client()
+    started = time.perf_counter()
+    response = client.converse_stream(
+        modelId=BEDROCK_MODEL_ID,
+        messages=[{"role": "user", "content": [{"text": prompt}]}],
+        inferenceConfig=INFERENCE_CONFIG
+    )
+    stream = response["stream"]
+    extractor = SQLStreamExtractor()
+    first_token_at = None
+    usage = None
+    stopped_early = False
+    try:
+        for event in stream:
+            delta = event.get("contentBlockDelta", {}).get("delta", {}).get("text")
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                before = len(extractor.text)
+                if extractor.feed(delta):
+                    # Pass on the statement's own text only, not what follows the terminator
+                    delta = delta[:max(extractor.end - before, 0)]
+                    if delta:
+                        yield {"type": "token", "text": delta}
+                    stopped_early = True
+                    break
+                yield {"type": "token", "text": delta}
+            elif "metadata" in event:
+                usage = event["metadata"].get("usage")
+    finally:
+        # Drops the rest of the completion; the HTTP connection is not reused
+        stream.close()
+
+    finished = time.perf_counter()
+    ttft_ms = round((first_token_at - started) * 1000, 1) if first_token_at is not None else None
+    total_ms = round((finished - started) * 1000, 1)
+    record_stream(ttft_ms, total_ms, stopped_early)
+    observe("bedrock", finished - started)
+    record_bedrock_usage(usage)
+    current = current_span()
+    set_bedrock_usage(current, usage)
+    if current.is_recording():
+        current.set_attribute("gen_ai.response.ttft_ms", ttft_ms if ttft_ms is not None else -1.0)
+        current.set_attribute("gen_ai.response.stopped_early", stopped_early)
+    yield {
+        "type": "done",
+        "sql": extractor.sql(),
+        "ttft_ms": ttft_ms,
+        "total_ms": total_ms,
+        "stopped_early": stopped_early,
+        "usage": usage
+    }
+
+
+def collect_sql(events: Iterator[Dict[str, Any]]) -> str:
+    """Drain converse_sql_events and return the extracted statement"""
+    sql_query = ""
+    for event in events:
+        if event["type"] == "done":
+            sql_query = event["sql"]
+    return sql_query
@@ -0,0 +1,244 @@
+# app/sql_validation.py
+"""
+Local validation of generated SQL against the cached schema, and a bounded Bedrock repair loop
+"""
+
+import difflib
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+from sqlglot.optimizer.scope import traverse_scope
+
+from .config import SQL_REPAIR_MAX_ATTEMPTS, SQL_VALIDATION
+from .datasources import current_datasource
+from .metrics import record_sql_validation, timed
+from .shared_utils import generate_sql_from_nl
+from .sql_cache import get_sql_cache
+from .timeouts import RequestBudget
+from .tracing import span
+
+_stats = {"validated": 0, "valid": 0, "repaired": 0, "failed": 0, "unverified": 0, "repair_attempts": 0}
+_stats_lock = threading.Lock()
+
+
+class SQLValidationError(Exception):
+    """Raised when generated SQL still references unknown tables or columns after the repair attempts"""
+
+    def __init__(self, message: str, report: Dict[str, Any]):
+        super().__init__(message)
+        self.report = report
+
+
+@dataclass
+class ValidationIssue:
+    """One problem found in a statement; kind is "syntax", "unknown_table" or "unknown_column"."""
+    kind: str
+    message: str
+
+
+@dataclass
+class ValidationResult:
+    """SQL to run and the validation report for the response"""
+    sql: str
+    report: Optional[Dict[str, Any]] = None
+
+
+class _Catalog:
+    """Lower-cased table -> column names of a schema snapshot"""
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.columns: Dict[str, Set[str]] = {
+            table.lower(): {column["Field"].lower() for column in info.get("columns", [])}
+            for table, info in schema.items()
+        }
+
+
+_catalog_lock = threading.Lock()
+_catalog_cache: Tuple[Optional[Dict[str, Any]], Optional[_Catalog]] = (None, None)
+
+
+def _get_catalog(schema: Dict[str, Any]) -> _Catalog:
+    # The schema cache hands out the same dict until it reloads, so one slot is enough
+    global _catalog_cache
+    cached_schema, catalog = _catalog_cache
+    if cached_schema is schema and catalog is not None:
+        return catalog
+    with _catalog_lock:
+        catalog = _Catalog(schema)
+        _catalog_cache = (schema, catalog)
+    return catalog
+
+
+def _suggest(name: str, candidates) -> str:
+    close = difflib.get_close_matches(name.lower(), list(candidates), n=1, cutoff=0.6)
+    return f"; did you mean `{close[0]}`?" if close else ""
+
+
+def _source_name(scope, alias: str) -> str:
+    return next((source.name for key, source in scope.sources.items() if key.lower() == alias), alias)
+
+
+def validate_sql(sql_query: str, schema: Dict[str, Any]) -> List[ValidationIssue]:
+    """Parse the statement and check its table and column references against the schema, without MySQL.
+
+    Only references that can be resolved with certainty are reported: columns of
+    derived tables and CTEs, and unqualified columns in queries reading from
+    them, are left to the database.
+    """
+    if not schema:
+        return []
+    try:
+        tree = sqlglot.parse_one(sql_query, read="mysql")
+    except SqlglotError as e:
+        return [ValidationIssue("syntax", f"Syntax error: {str(e).splitlines()[0]}")]
+    if not isinstance(tree, exp.Query):
+        return []
+    try:
+        scopes = traverse_scope(tree)
+    except SqlglotError:
+        return []
+
+    catalog = _get_catalog(schema)
+    database = current_datasource().database.lower()
+    issues: List[ValidationIssue] = []
+    seen: Set[str] = set()
+
+    def report(kind: str, message: str):
+        if message not in seen:
+            seen.add(message)
+            issues.append(ValidationIssue(kind, message))
+
+    # Tables each scope reads; None when it also reads a derived table, a CTE or another database
+    scope_tables: Dict[int, Optional[Dict[str, Set[str]]]] = {}
+    for scope in scopes:
+        tables: Optional[Dict[str, Set[str]]] = {}
+        for alias, source in scope.sources.items():
+            if not isinstance(source, exp.Table) or (source.db and source.db.lower() != database):
+                tables = None
+                continue
+            name = source.name.lower()
+            if name not in catalog.columns:
+                report("unknown_table", f"Unknown table `{source.name}`{_suggest(name, catalog.columns)}")
+                tables = None
+            elif tables is not None:
+                tables[alias.lower()] = catalog.columns[name]
+        scope_tables[id(scope)] = tables
+
+    for scope in scopes:
+        tables = scope_tables[id(scope)] or {}
+        # MySQL accepts select-list aliases in GROUP BY as well as HAVING and ORDER BY
+        aliases = {
+            select.alias.lower() for select in getattr(scope.expression, "selects", []) if isinstance(select, exp.Alias)
+        }
+        for column in scope.columns:
+            if isinstance(column.this, exp.Star):
+                continue
+            name, qualifier = column.name.lower(), column.table.lower()
+            if qualifier:
+                columns = tables.get(qualifier)
+                if columns is not None and name not in columns:
+                    report("unknown_column",
+                           f"Unknown column `{column.table}.{column.name}`: table "
+                           f"`{_source_name(scope, qualifier)}` has no such column{_suggest(name, columns)}")
+                continue
+            if column.find_ancestor(exp.Select) is not scope.expression or name in aliases:
+                # Unqualified names of nested subqueries are checked in their own scope
+                continue
+            # MySQL resolves an unqualified name in the innermost query first, then outwards
+            visible: Dict[str, Set[str]] = {}
+            current = scope
+            while current is not None:
+                outer = scope_tables.get(id(current))
+                if outer is None:
+                    break
+                visible.update({alias: columns for alias, columns in outer.items() if alias not in visible})
+                current = current.parent
+            if current is None and visible and not any(name in columns for columns in visible.values()):
+                report("unknown_column",
+                       f"Unknown column `{column.name}` in {', '.join(sorted(f'`{t}`' for t in visible))}"
+                       f"{_suggest(name, set().union(*visible.values()))}")
+    return issues
+
+
+def _feedback(sql_query: str, issues: List[ValidationIssue]) -> str:
+    problems = "\n".join(f"- {issue.message}" for issue in issues)
+    return (
+        f"The previous query was:\n{sql_query}\n"
+        f"It does not match the database schema:\n{problems}\n"
+        "Write a corrected query for the same question using only the tables and columns listed in the schema."
+    )
+
+
+def _needs_repair(issues: List[ValidationIssue]) -> bool:
+    """Only unknown tables or columns are repaired; syntax issues alone go to the database as they are"""
+    return any(issue.kind != "syntax" for issue in issues)
+
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def validate_generated_sql(question: str, sql_query: str, schema: Dict[str, Any], schema_text: str,
+                           max_attempts: Optional[int] = None,
+                           budget: Optional[RequestBudget] = None) -> ValidationResult:
+    """Validate generated SQL locally; on problems, ask Bedrock again with them, up to max_attempts times.
+
+    Unknown tables or columns left after the last attempt raise SQLValidationError.
+    Syntax errors alone do not, and are not worth a repair either: sqlglot is
+    stricter than MySQL in places, so such statements run and the database has
+    the final word. No repair starts once budget's generation deadline has passed.
+    """
+    if not SQL_VALIDATION:
+        return ValidationResult(sql_query)
+    max_attempts = SQL_REPAIR_MAX_ATTEMPTS if max_attempts is None else max_attempts
+
+    with timed("validate"):
+        issues = validate_sql(sql_query, schema)
+    found, found_kinds = [issue.message for issue in issues], [issue.kind for issue in issues]
+    attempts = 0
+    with span("sql.validate", {"nlsql.validation.issues": len(issues)}) as current:
+        while _needs_repair(issues) and attempts < max_attempts and not (budget and budget.generation_spent()):
+            attempts += 1
+            candidate = generate_sql_from_nl(question, schema_text, feedback=_feedback(sql_query, issues))
+            with timed("validate"):
+                candidate_issues = validate_sql(candidate, schema)
+            sql_query, issues = candidate, candidate_issues
+        current.set_attribute("nlsql.validation.repairs", attempts)
+
+    if not found:
+        outcome = "valid"
+    elif not issues:
+        outcome = "repaired"
+        cache = get_sql_cache()
+        if cache is not None:
+            # Replace the broken answer so the next identical question gets the working one
+            cache.store(question, schema_text, sql_query)
+    elif all(issue.kind == "syntax" for issue in issues):
+        outcome = "unverified"
+    else:
+        outcome = "failed"
+    _count("validated")
+    _count(outcome)
+    _count("repair_attempts", attempts)
+    record_sql_validation(outcome, attempts, found_kinds)
+
+    report = {"outcome": outcome, "repairs": attempts, "issues_found": found}
+    if issues:
+        report["remaining_issues"] = [issue.message for issue in issues]
+    if outcome == "failed":
+        raise SQLValidationError(
+            f"Generated SQL does not match the schema: {'; '.join(report['remaining_issues'])}", report
+        )
+    return ValidationResult(sql_query, report)
+
+
+def get_validation_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({"enabled": SQL_VALIDATION, "max_repair_attempts": SQL_REPAIR_MAX_ATTEMPTS})
+    return stats
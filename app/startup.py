@@ -0,0 +1,190 @@
+# app/startup.py
+"""
+Fail-fast configuration check before serving, and per-process warmup of pools, clients and caches
+"""
+
+import logging
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import boto3
+
+from .async_exec import get_executor, shutdown_executor
+from .bedrock_client import _create_client, get_bedrock_client
+from .config import (
+    ASYNC_MODE, BEDROCK_CONNECT_TIMEOUT, BEDROCK_MODEL_ID, BEDROCK_RETRY_MODE, DATASOURCE_BALANCE,
+    DB_POOL_MAX_SIZE, DB_POOL_MIN_SIZE, GENERATION_TIMEOUT_SHARE, PLAN_GATE_POLICY, SQL_CACHE_BACKEND,
+    TRACING_EXPORTER
+)
+from .datasources import BALANCE_POLICIES, close_datasources, get_datasources, use_datasource
+from .pagination import plan_page
+from .planner import PLAN_POLICIES
+from .result_cache import get_result_cache
+from .schema_cache import get_cached_schema
+from .schema_prompt import compile_schema_prompt
+from .sql_cache import get_sql_cache
+from .tracing import TRACING_EXPORTERS
+
+logger = logging.getLogger(__name__)
+
+# Set by start_fastapi_server.py, which has already run check_config; workers report time from launch to ready
+LAUNCHED_AT_ENV = "NLSQL_LAUNCHED_AT"
+
+_CHOICES = {
+    "PLAN_GATE_POLICY": PLAN_POLICIES,
+    "SQL_CACHE_BACKEND": {"memory", "sqlite", "off"},
+    "ASYNC_MODE": {"threadpool", "inline"},
+    "TRACING_EXPORTER": TRACING_EXPORTERS,
+    "BEDROCK_RETRY_MODE": {"legacy", "standard", "adaptive"},
+    "DATASOURCE_BALANCE": BALANCE_POLICIES,
+}
+
+_report: Dict[str, Any] = {}
+
+
+def _check_settings() -> List[str]:
+    problems = []
+    values = {
+        "PLAN_GATE_POLICY": PLAN_GATE_POLICY,
+        "SQL_CACHE_BACKEND": SQL_CACHE_BACKEND,
+        "ASYNC_MODE": ASYNC_MODE,
+        "TRACING_EXPORTER": TRACING_EXPORTER,
+        "BEDROCK_RETRY_MODE": BEDROCK_RETRY_MODE,
+        "DATASOURCE_BALANCE": DATASOURCE_BALANCE,
+    }
+    for name, value in values.items():
+        if value not in _CHOICES[name]:
+            problems.append(f"{name}={value!r} is not one of {', '.join(sorted(_CHOICES[name]))}")
+    if not 0 <= DB_POOL_MIN_SIZE <= DB_POOL_MAX_SIZE or DB_POOL_MAX_SIZE < 1:
+        problems.append(f"DB_POOL_MIN_SIZE={DB_POOL_MIN_SIZE} / DB_POOL_MAX_SIZE={DB_POOL_MAX_SIZE}: need 0 <= min <= max, max >= 1")
+    if not 0 < GENERATION_TIMEOUT_SHARE <= 1:
+        problems.append(f"GENERATION_TIMEOUT_SHARE={GENERATION_TIMEOUT_SHARE} must be in (0, 1]")
+    if not BEDROCK_MODEL_ID:
+        problems.append("BEDROCK_MODEL_ID is empty")
+    try:
+        get_datasources()
+    except ValueError as e:
+        problems.append(str(e))
+    return problems
+
+
+def _check_mysql() -> List[str]:
+    """Every endpoint of every datasource; only a datasource with none reachable stops the server.
+
+    An unreachable replica is logged and left out of rotation until its health check passes.
+    """
+    try:
+        registry = get_datasources()
+    except ValueError:
+        # Already reported by _check_settings
+        return []
+    problems = []
+    for name, datasource in registry.datasources.items():
+        down = [endpoint for endpoint in datasource.endpoints if not endpoint.check()]
+        if len(down) == len(datasource.endpoints):
+            problems += [
+                f"MySQL datasource {name} ({endpoint.role} {endpoint.address}/{datasource.database}): "
+                f"{endpoint.last_error}"
+                for endpoint in down
+            ]
+            continue
+        for endpoint in down:
+            logger.warning(f"MySQL datasource {name}: {endpoint.role} {endpoint.address} unreachable: "
+                           f"{endpoint.last_error}")
+    return problems
+
+
+def _check_bedrock() -> Optional[str]:
+    """Credentials resolve and the runtime endpoint accepts TCP connections (no model call, no cost)"""
+    try:
+        if boto3.session.Session().get_credentials() is None:
+            return "Bedrock: no AWS credentials found (environment, shared config or instance role)"
+        endpoint = urlsplit(_create_client().meta.endpoint_url)
+    except Exception as e:
+        return f"Bedrock: {e}"
+    port = endpoint.port or (443 if endpoint.scheme == "https" else 80)
+    try:
+        socket.create_connection((endpoint.hostname, port), timeout=BEDROCK_CONNECT_TIMEOUT).close()
+    except OSError as e:
+        return f"Bedrock endpoint {endpoint.hostname}:{port} unreachable: {e}"
+    return None
+
+
+def check_config(connect: bool = True) -> List[str]:
+    """Problems that would make every request fail; empty when the server can start.
+
+    With connect=False only the settings themselves are checked.
+    """
+    problems = _check_settings()
+    if connect:
+        problems += _check_mysql()
+        bedrock = _check_bedrock()
+        if bedrock:
+            problems.append(bedrock)
+    return problems
+
+
+def _warm_schema():
+    # Loads each schema and builds the prompt text and relevance index the first question would pay for
+    for name in get_datasources().names():
+        with use_datasource(name):
+            compile_schema_prompt(get_cached_schema(), "warmup")
+
+
+def _warm_caches():
+    get_sql_cache()
+    get_result_cache()
+
+
+def warmup() -> Dict[str, Any]:
+    """Open pool connections, build the Bedrock client, load the schema and caches.
+
+    Each step is timed; a failing step is logged and recorded rather than raised,
+    so a worker still starts (and recovers lazily) if MySQL blips during boot.
+    """
+    steps: List[Tuple[str, Callable[[], Any]]] = [
+        ("pool", lambda: get_datasources().warm()),
+        ("bedrock_client", get_bedrock_client),
+        ("schema", _warm_schema),
+        ("caches", _warm_caches),
+        # sqlglot builds its MySQL dialect tables on first parse
+        ("sql_parser", lambda: plan_page("SELECT 1", 1)),
+        ("executor", get_executor),
+    ]
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, step in steps:
+        step_started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warmup step {name} failed: {e}")
+            errors[name] = str(e)
+        timings[f"{name}_ms"] = round((time.perf_counter() - step_started) * 1000, 2)
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return {"steps": timings, "errors": errors}
+
+
+def record_ready(warmup_report: Optional[Dict[str, Any]] = None):
+    """Remember when this process became ready to serve, for /stats"""
+    _report.clear()
+    _report["pid"] = os.getpid()
+    _report["ready_at"] = round(time.time(), 3)
+    launched_at = os.getenv(LAUNCHED_AT_ENV)
+    if launched_at:
+        _report["since_launch_ms"] = round((time.time() - float(launched_at)) * 1000, 2)
+    _report["warmup"] = warmup_report
+
+
+def get_startup_report() -> Dict[str, Any]:
+    return dict(_report)
+
+
+def shutdown():
+    """Release pooled connections and the blocking-I/O executor once in-flight requests have drained"""
+    close_datasources()
+    shutdown_executor(wait=True)
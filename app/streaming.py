@@ -0,0 +1,200 @@
+# app/streaming.py
+"""
+Encode streamed row batches as NDJSON or as a chunked JSON document, and generated SQL as server-sent events
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from fastapi.responses import StreamingResponse
+
+from .async_exec import run_blocking
+from .serialization import RowSerializer, dumps_bytes
+from .shared_utils import build_sql_prompt, clean_generated_sql, stream_sql_query
+from .sql_cache import get_sql_cache
+from .sql_stream import converse_sql_events
+from .metrics import with_timings
+from .tracing import current_span
+from .timeouts import (
+    QueryTimeoutError, RequestBudget, StatementGuard, abandon_statement, run_with_deadline
+)
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json"
+}
+
+RowBatches = Iterator[Sequence[Sequence[Any]]]
+
+
+def ndjson_chunks(header: Dict[str, Any], serializer: RowSerializer, batches: RowBatches) -> Iterator[bytes]:
+    """First line is the header object (columns and request metadata), then one row per line"""
+    yield dumps_bytes({**header, "columns": serializer.columns}) + b"\n"
+    for batch in batches:
+        yield b"".join(line + b"\n" for line in serializer.encode_each(batch))
+
+
+def json_document_chunks(envelope: Dict[str, Any], serializer: RowSerializer, batches: RowBatches) -> Iterator[bytes]:
+    """The regular response document, with result.rows written batch by batch"""
+    # Reopen the serialized envelope to append the streamed "result" member
+    head = dumps_bytes(envelope)[:-1]
+    separator = b"," if envelope else b""
+    yield head + separator + b'"result":{"columns":' + dumps_bytes(serializer.columns) + b',"rows":['
+    row_count = 0
+    for batch in batches:
+        if not batch:
+            continue
+        prefix = b"," if row_count else b""
+        yield prefix + b",".join(serializer.encode_each(batch))
+        row_count += len(batch)
+    yield b'],"row_count":' + str(row_count).encode("ascii") + b"}}"
+
+
+class RowStream:
+    """Row batches from stream_sql_query, with the guard that can KILL QUERY the statement behind them"""
+
+    def __init__(self, rows: Iterator[Any], guard: StatementGuard):
+        self.rows = rows
+        self.guard = guard
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.rows)
+
+    def close(self):
+        self.rows.close()
+
+
+def _close(*generators):
+    for generator in generators:
+        try:
+            generator.close()
+        except ValueError:
+            # Still running on a worker thread after a cancellation; closed when collected
+            pass
+
+
+async def open_row_stream(sql_query: str, timeout: Optional[float] = None,
+                          request=None) -> Tuple[RowSerializer, RowStream]:
+    """Execute the query and return (serializer, remaining batches) so SQL errors surface before streaming.
+
+    timeout covers the whole stream (None: no limit); the statement is killed on the
+    server when it runs out or the client disconnects, while executing or later mid-stream.
+    """
+    guard = StatementGuard(timeout)
+    rows = stream_sql_query(sql_query)
+    try:
+        description = await run_with_deadline(next, rows, timeout=timeout, request=request, guard=guard)
+    except BaseException:
+        _close(rows)
+        raise
+    return RowSerializer(description), RowStream(rows, guard)
+
+
+async def _iterate(chunks: Iterator[bytes], source: Iterator[Any]) -> AsyncIterator[bytes]:
+    guard = getattr(source, "guard", None)
+    expired = False
+    timer = None
+
+    def expire():
+        nonlocal expired
+        expired = True
+        abandon_statement(guard, "deadline_exceeded")
+
+    if guard is not None and guard.deadline is not None:
+        timer = asyncio.get_running_loop().call_later(max(guard.remaining(), 0), expire)
+    sent = 0
+    abandoned = False
+    try:
+        while True:
+            if expired:
+                raise QueryTimeoutError("Stream exceeded its time budget")
+            chunk = await run_blocking(next, chunks, None)
+            if chunk is None:
+                break
+            sent += len(chunk)
+            yield chunk
+    except (asyncio.CancelledError, GeneratorExit):
+        abandoned = True
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+        current_span().set_attribute("http.response.body.size", sent)
+        if abandoned and not expired and guard is not None:
+            # Client went away mid-stream: kill the statement first, or a worker blocked in
+            # fetchmany keeps the generators running (and the server sending rows)
+            abandon_statement(guard, "disconnects", then=lambda: _close(chunks, source))
+        else:
+            # The stream finished or failed: release the cursor and connection now
+            _close(chunks, source)
+
+
+def chunked_response(chunks: Iterator[bytes], batches: RowBatches, media_type: str,
+                     headers: Optional[Dict[str, str]] = None) -> StreamingResponse:
+    """StreamingResponse that encodes on worker threads and closes the row source when done"""
+    return StreamingResponse(_iterate(chunks, batches), media_type=media_type, headers=headers)
+
+
+def rows_streaming_response(envelope: Dict[str, Any], serializer: RowSerializer,
+                            batches: RowBatches, fmt: str) -> StreamingResponse:
+    """StreamingResponse in the requested format ("ndjson" or "json")"""
+    if fmt == "ndjson":
+        chunks = ndjson_chunks(envelope, serializer, batches)
+    else:
+        chunks = json_document_chunks(envelope, serializer, batches)
+    return chunked_response(chunks, batches, STREAM_MEDIA_TYPES[fmt])
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode("ascii") + b"\ndata: " + dumps_bytes(data) + b"\n\n"
+
+
+def generated_sql_sse_chunks(question: str, schema_text: str, envelope: Dict[str, Any],
+                             budget: Optional[RequestBudget] = None, debug: bool = False) -> Iterator[bytes]:
+    """"token" events as Bedrock streams the completion, then "done" (or "error").
+
+    A cached answer is sent as a single token. Fresh SQL is stored in the cache
+    once complete; the stream is abandoned if the request budget runs out.
+    """
+    cache = get_sql_cache()
+    hit = cache.lookup(question, schema_text) if cache is not None else None
+    if hit is not None:
+        yield sse_event("token", {"text": hit[0]})
+        yield sse_event("done", with_timings({**envelope, "generated_sql": hit[0], "cache_hit": True}, debug))
+        return
+
+    events = converse_sql_events(build_sql_prompt(question, schema_text))
+    try:
+        for event in events:
+            if budget is not None and budget.remaining() is not None and budget.remaining() <= 0:
+                yield sse_event("error", {"status": "error", "detail": "Request time budget exhausted"})
+                return
+            if event["type"] == "token":
+                yield sse_event("token", {"text": event["text"]})
+                continue
+            sql_query = clean_generated_sql(event["sql"])
+            if not sql_query:
+                yield sse_event("error", {"status": "error", "detail": "Generated SQL query is empty"})
+                return
+            if cache is not None:
+                cache.store(question, schema_text, sql_query)
+            yield sse_event("done", with_timings({
+                **envelope,
+                "generated_sql": sql_query,
+                "cache_hit": False,
+                "ttft_ms": event["ttft_ms"],
+                "total_ms": event["total_ms"],
+                "stopped_early": event["stopped_early"],
+                "usage": event["usage"]
+            }, debug))
+    except Exception as e:
+        yield sse_event("error", {"status": "error", "detail": f"Error generating SQL: {e}"})
+    finally:
+        # Closes the Bedrock event stream when the client disconnects mid-generation
+        events.close()
@@ -0,0 +1,312 @@
+# app/timeouts.py
+"""
+Request time budgets, MAX_EXECUTION_TIME hints and KILL QUERY on timeout, disconnect or cancellation
+"""
+
+import asyncio
+import contextvars
+import functools
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import sqlglot
+from sqlglot.errors import SqlglotError
+from sqlglot.tokens import Token, TokenType
+
+from .async_exec import get_executor, run_blocking
+from .config import REQUEST_TIMEOUT, GENERATION_TIMEOUT_SHARE, QUERY_TIMEOUT, STREAM_TIMEOUT
+from .db_pool import kill_query
+
+_HAS_HINT = re.compile(r"/\*\+[^*]*MAX_EXECUTION_TIME\s*\(", re.IGNORECASE)
+
+# Deadlines are read through this, so tests can move time for budgets alone
+_clock = time.monotonic
+
+_stats = {"deadline_exceeded": 0, "disconnects": 0, "cancellations": 0, "kills": 0, "kill_failures": 0}
+_stats_lock = threading.Lock()
+
+
+class QueryTimeoutError(Exception):
+    """Raised when generation or a statement runs past its share of the request budget"""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client goes away while its statement is still running"""
+
+
+def _count(key: str):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _skip_parens(tokens: List[Token], i: int) -> int:
+    """Index after the parenthesized group opening at tokens[i]"""
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j].token_type == TokenType.L_PAREN:
+            depth += 1
+        elif tokens[j].token_type == TokenType.R_PAREN:
+            depth -= 1
+            if depth == 0:
+                return j + 1
+    return len(tokens)
+
+
+def _main_query_start(tokens: List[Token]) -> int:
+    """Index of the first token after a leading WITH clause (0 without one)"""
+    if tokens[0].token_type != TokenType.WITH:
+        return 0
+    i = 2 if len(tokens) > 1 and tokens[1].token_type == TokenType.RECURSIVE else 1
+    while i < len(tokens):
+        # name [(columns)] AS (body), ...
+        while i < len(tokens) and tokens[i].token_type != TokenType.ALIAS:
+            i = _skip_parens(tokens, i) if tokens[i].token_type == TokenType.L_PAREN else i + 1
+        i += 1
+        if i < len(tokens) and tokens[i].token_type == TokenType.L_PAREN:
+            i = _skip_parens(tokens, i)
+        if i < len(tokens) and tokens[i].token_type == TokenType.COMMA:
+            i += 1
+            continue
+        return i
+    return i
+
+
+@functools.lru_cache(maxsize=1024)
+def _hint_slot(sql_query: str) -> Optional[Tuple[int, bool]]:
+    """Where the hint goes: (offset, inside an existing hint comment), or None for non-SELECTs.
+
+    MAX_EXECUTION_TIME is only honoured after the first SELECT of the outermost
+    query block: the main query of a WITH statement, the first branch of a UNION.
+    Comments are skipped by the tokenizer, so -- and # comment lines may lead.
+    """
+    try:
+        tokens = sqlglot.tokenize(sql_query, read="mysql")
+    except SqlglotError:
+        return None
+    if not tokens:
+        return None
+    for i in range(_main_query_start(tokens), len(tokens)):
+        token_type = tokens[i].token_type
+        if token_type == TokenType.SELECT:
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if following is not None and following.token_type == TokenType.HINT:
+                # Only the first hint comment of a query block counts: add ours to it
+                return following.end - 1, True
+            return tokens[i].end + 1, False
+        if token_type != TokenType.L_PAREN:
+            return None
+    return None
+
+
+def with_max_execution_time(sql_query: str, timeout: Optional[float]) -> str:
+    """Add a MAX_EXECUTION_TIME(ms) optimizer hint to the outermost SELECT (MySQL 5.7.8+).
+
+    The server aborts the statement itself once the budget is spent, even if the
+    client-side deadline never fires. Statements that already carry the hint, or
+    that are not SELECTs, are returned unchanged.
+    """
+    if timeout is None or timeout <= 0 or _HAS_HINT.search(sql_query):
+        return sql_query
+    slot = _hint_slot(sql_query)
+    if slot is None:
+        return sql_query
+    offset, in_comment = slot
+    hint = f"MAX_EXECUTION_TIME({max(1, math.ceil(timeout * 1000))})"
+    insert = f"{hint} " if in_comment else f" /*+ {hint} */"
+    return sql_query[:offset] + insert + sql_query[offset:]
+
+
+class StatementGuard:
+    """Tracks the connection running the current statement so another thread can KILL QUERY it"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.deadline = _clock() + timeout if timeout is not None else None
+        self._connection_id = None
+        self._pool = None
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - _clock()
+
+    def attach(self, connection_id: Optional[int], pool=None):
+        """pool is the ConnectionPool the connection came from; the kill goes to its server"""
+        with self._lock:
+            if self._cancelled:
+                raise QueryTimeoutError("Statement cancelled before it started")
+            self._connection_id = connection_id
+            self._pool = pool
+
+    def detach(self):
+        # Blocks while a KILL QUERY is in flight, so the connection cannot go back to the
+        # pool (and pick up someone else's statement) before the kill lands
+        with self._lock:
+            self._connection_id = None
+            self._pool = None
+
+    def cancel(self):
+        """KILL QUERY the attached statement (if any); later attach() calls fail"""
+        with self._lock:
+            self._cancelled = True
+            if self._connection_id is None:
+                return
+            try:
+                if self._pool is not None:
+                    self._pool.kill_query(self._connection_id)
+                else:
+                    kill_query(self._connection_id)
+                _count("kills")
+            except Exception:
+                _count("kill_failures")
+
+
+_current_guard: contextvars.ContextVar = contextvars.ContextVar("statement_guard", default=None)
+
+
+def current_guard() -> Optional[StatementGuard]:
+    return _current_guard.get()
+
+
+def statement_timeout() -> Optional[float]:
+    """Seconds left for the statement about to run: the guard's deadline, else QUERY_TIMEOUT"""
+    guard = current_guard()
+    if guard is not None and guard.deadline is not None:
+        return max(guard.remaining(), 0.001)
+    return QUERY_TIMEOUT if QUERY_TIMEOUT > 0 else None
+
+
+def stream_statement_timeout() -> Optional[float]:
+    """Seconds left for a streamed statement: the guard's deadline (None: no limit), else STREAM_TIMEOUT"""
+    guard = current_guard()
+    if guard is not None:
+        remaining = guard.remaining()
+        return max(remaining, 0.001) if remaining is not None else None
+    return STREAM_TIMEOUT if STREAM_TIMEOUT > 0 else None
+
+
+def abandon_statement(guard: StatementGuard, reason: str, then: Optional[Callable] = None):
+    """KILL QUERY the guard's statement on a worker thread, then run then(); reason is the stats key"""
+    _count(reason)
+
+    def _kill():
+        guard.cancel()
+        if then is not None:
+            then()
+
+    # Not awaited: the caller may be a cancelled task that must not block on the kill round trip
+    get_executor().submit(_kill)
+
+
+class RequestBudget:
+    """One request's deadline, shared out between Bedrock generation and SQL execution"""
+
+    def __init__(self, total: Optional[float] = None):
+        self.requested = total if total is not None and total > 0 else None
+        if total is None or total <= 0:
+            total = REQUEST_TIMEOUT
+        elif REQUEST_TIMEOUT > 0:
+            total = min(total, REQUEST_TIMEOUT)
+        self.total = total if total > 0 else None
+        now = _clock()
+        self.deadline = now + total if total > 0 else None
+        # One deadline for all Bedrock stages (generate, validate/repair, plan gate) together
+        self.generation_deadline = now + total * GENERATION_TIMEOUT_SHARE if total > 0 else None
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - _clock()
+
+    def for_generation(self) -> Optional[float]:
+        """What is left of the generation deadline (GENERATION_TIMEOUT_SHARE of the total budget);
+        each stage gets the remainder, not a fresh share"""
+        if self.deadline is None:
+            return None
+        return min(self.remaining(), self.generation_deadline - _clock())
+
+    def generation_spent(self) -> bool:
+        """True once the generation deadline has passed; no further Bedrock round should start"""
+        return self.generation_deadline is not None and _clock() >= self.generation_deadline
+
+    def for_execution(self) -> Optional[float]:
+        """Whatever is left of the budget, capped at QUERY_TIMEOUT per statement"""
+        limits = [limit for limit in (self.remaining(), QUERY_TIMEOUT if QUERY_TIMEOUT > 0 else None)
+                  if limit is not None]
+        return min(limits) if limits else None
+
+    def for_stream(self) -> Optional[float]:
+        """A timeout the request asked for still applies to streams; otherwise STREAM_TIMEOUT (0 = none)"""
+        if self.requested is not None:
+            return self.remaining()
+        return STREAM_TIMEOUT if STREAM_TIMEOUT > 0 else None
+
+
+async def _wait_for_disconnect(request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def run_with_deadline(func: Callable, *args, timeout: Optional[float] = None,
+                            request=None, guard: Optional[StatementGuard] = None, **kwargs) -> Any:
+    """run_blocking with a client-side deadline; the running statement is killed on the server
+    when the deadline passes, the HTTP request disconnects or the awaiting task is cancelled.
+    Pass guard to keep hold of it after the call (e.g. for a statement that goes on streaming)."""
+    if timeout is not None and timeout <= 0:
+        _count("deadline_exceeded")
+        raise QueryTimeoutError("Request time budget exhausted")
+    if guard is None:
+        guard = StatementGuard(timeout)
+    token = _current_guard.set(guard)
+    try:
+        # run_blocking copies the context, so the worker thread sees this guard
+        work = asyncio.ensure_future(run_blocking(func, *args, **kwargs))
+    finally:
+        _current_guard.reset(token)
+
+    watcher = asyncio.ensure_future(_wait_for_disconnect(request)) if request is not None else None
+    try:
+        pending = {work, watcher} if watcher is not None else {work}
+        done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if work in done:
+            return work.result()
+        if watcher is not None and watcher in done:
+            _count("disconnects")
+            raise ClientDisconnectedError("Client disconnected")
+        _count("deadline_exceeded")
+        raise QueryTimeoutError(f"Timed out after {timeout:.1f}s")
+    except BaseException as e:
+        if not work.done():
+            if isinstance(e, asyncio.CancelledError):
+                _count("cancellations")
+            # Not awaited: a cancelled task must not block on the kill round trip
+            get_executor().submit(guard.cancel)
+            work.add_done_callback(_consume_result)
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
+def _consume_result(future):
+    # The abandoned call ends with "query interrupted"; keep asyncio from logging it as unretrieved
+    if not future.cancelled():
+        future.exception()
+
+
+def get_timeout_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "request_timeout": REQUEST_TIMEOUT,
+        "generation_share": GENERATION_TIMEOUT_SHARE,
+        "query_timeout": QUERY_TIMEOUT,
+        "stream_timeout": STREAM_TIMEOUT
+    })
+    return stats
@@ -0,0 +1,146 @@
+# app/tracing.py
+"""
+Optional OpenTelemetry tracing: server spans for HTTP requests and MCP tool calls, child spans for MySQL and Bedrock
+"""
+
+import hashlib
+import inspect
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from .config import TRACING_EXPORTER, TRACING_SERVICE_NAME
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - opentelemetry is optional
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACING_EXPORTERS = {"off", "console", "otlp"}
+
+_configured = False
+
+
+class _NoopSpan:
+    """Stands in for a span when opentelemetry is not installed"""
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def setup_tracing() -> bool:
+    """Install a TracerProvider exporting to TRACING_EXPORTER; True when spans will be exported.
+
+    With TRACING_EXPORTER=off nothing is installed, so spans stay no-ops unless
+    another TracerProvider was set up (e.g. by opentelemetry-instrument).
+    The OTLP exporter reads OTEL_EXPORTER_OTLP_ENDPOINT and friends itself.
+    """
+    global _configured
+    if _configured or TRACING_EXPORTER == "off":
+        return _configured
+    if TRACING_EXPORTER not in TRACING_EXPORTERS:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {TRACING_EXPORTER}")
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+        if TRACING_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            exporter = ConsoleSpanExporter()
+    except ImportError as e:
+        logger.warning(f"TRACING_EXPORTER={TRACING_EXPORTER} but OpenTelemetry is not installed ({e}); tracing disabled")
+        return False
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+    return True
+
+
+def _tracer():
+    return trace.get_tracer("mysql-nlp")
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: str = "internal") -> Iterator[Any]:
+    """Child span of whatever is current (worker threads inherit it through run_blocking)"""
+    if trace is None:
+        yield _NOOP_SPAN
+        return
+    with _tracer().start_as_current_span(
+        name, kind=getattr(SpanKind, kind.upper()), attributes=attributes
+    ) as current:
+        yield current
+
+
+def current_span() -> Any:
+    return trace.get_current_span() if trace is not None else _NOOP_SPAN
+
+
+def sql_hash(sql_query: str) -> str:
+    """Short stable digest of a statement, so spans can be grouped without recording the SQL text"""
+    return hashlib.sha256(" ".join(sql_query.split()).encode("utf-8")).hexdigest()[:16]
+
+
+def set_bedrock_usage(current: Any, usage: Optional[Dict[str, Any]]):
+    if usage and current.is_recording():
+        current.set_attribute("gen_ai.usage.input_tokens", int(usage.get("inputTokens", 0)))
+        current.set_attribute("gen_ai.usage.output_tokens", int(usage.get("outputTokens", 0)))
+
+
+def fastapi_traces_requests() -> bool:
+    """Recent FastAPI releases emit OpenTelemetry server spans natively (FastAPI(telemetry=...))"""
+    from fastapi import FastAPI
+    return trace is not None and "telemetry" in inspect.signature(FastAPI.__init__).parameters
+
+
+class TracingMiddleware:
+    """ASGI middleware: one SERVER span per HTTP request, continuing any incoming traceparent.
+
+    Only needed on FastAPI versions without native tracing.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if trace is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        context = propagate.extract(headers)
+
+        with _tracer().start_as_current_span(
+            f"{scope['method']} {scope['path']}", context=context, kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]}
+        ) as server_span:
+
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    server_span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    # Name by route template so traces group per endpoint
+                    server_span.update_name(f"{scope['method']} {route}")
+                    server_span.set_attribute("http.route", route)
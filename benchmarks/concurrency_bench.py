@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the FastAPI request path
+
+Drives /query in-process (ASGI, no network) with schema lookup, Bedrock and
+MySQL replaced by sleeps of configurable latency, and reports throughput as
+the number of in-flight requests grows. Run once per ASYNC_MODE to compare
+the thread-pool execution layer with blocking calls on the event loop.
+
+Usage: python benchmarks/concurrency_bench.py [--levels 1,4,16,64] [--bedrock-ms 200] [--db-ms 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _patch_app(bedrock_ms: float, db_ms: float):
+    import app.main as main
+    import app.result_cache as result_cache
+    from app.planner import GateResult
+
+    def fake_schema(force_refresh=False):
+        time.sleep(db_ms / 1000)
+        return {"Courses": {"columns": [{"Field": "id", "Type": "int", "Key": "PRI"}], "foreign_keys": []}}
+
+    def fake_generate(question, schema_text):
+        time.sleep(bedrock_ms / 1000)
+        return "SELECT * FROM Courses", False
+
+    def fake_execute(sql_query):
+        time.sleep(db_ms / 1000)
+        return {"columns": ["id"], "rows": [{"id": 1}], "row_count": 1}
+
+    main.get_cached_schema = fake_schema
+    main.generate_sql_cached = fake_generate
+    # No EXPLAIN round trip; /query pages go through the result cache module's execute_sql_query
+    main.gate_generated_sql = lambda question, sql_query, schema_text: GateResult(sql_query)
+    result_cache.execute_sql_query = fake_execute
+    return main.app
+
+
+async def _run_level(app, concurrency: int, requests_per_worker: int) -> dict:
+    import httpx
+
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in range(requests_per_worker):
+                started = time.perf_counter()
+                response = await client.post("/query", json={"query": "show all courses"})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1)
+    }
+
+
+def run_single(args) -> list:
+    app = _patch_app(args.bedrock_ms, args.db_ms)
+    return [asyncio.run(_run_level(app, level, args.requests)) for level in args.levels]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", default="1,4,16,64", type=lambda v: [int(x) for x in v.split(",")])
+    parser.add_argument("--requests", default=5, type=int, help="requests per concurrent client")
+    parser.add_argument("--bedrock-ms", default=200.0, type=float)
+    parser.add_argument("--db-ms", default=20.0, type=float)
+    parser.add_argument("--modes", default="inline,threadpool")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_single(args)))
+        return
+
+    # ASYNC_MODE is read at import time, so each mode runs in its own interpreter
+    for mode in args.modes.split(","):
+        env = dict(os.environ, ASYNC_MODE=mode)
+        argv = [sys.executable, __file__, "--child", "--levels", ",".join(map(str, args.levels)),
+                "--requests", str(args.requests), "--bedrock-ms", str(args.bedrock_ms), "--db-ms", str(args.db_ms)]
+        output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+        print(f"\nASYNC_MODE={mode}")
+        print(f"{'in-flight':>10} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+        for row in json.loads(output.strip().splitlines()[-1]):
+            print(f"{row['concurrency']:>10} {row['requests']:>9} {row['throughput_rps']:>8} "
+                  f"{row['p50_ms']:>8} {row['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main()
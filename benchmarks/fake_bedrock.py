@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Bedrock runtime Converse and ConverseStream APIs
+
+Answers with canned SQL after a configurable delay, so the whole request path
+(botocore client, connection pool, retries, streaming) runs without AWS. Point
+the app at it with BEDROCK_ENDPOINT_URL=http://127.0.0.1:<port>.
+
+The SQL comes from --responses (a JSON object of regex -> SQL, matched against
+the question) or, failing that, from the schema in the prompt: the first table
+whose name appears in the question (else the first table listed), with
+COUNT(*) for "how many" questions.
+
+Latency model: --latency-ms before the first token, then --token-ms per output
+token (about 4 characters), with +/- --jitter spread. ConverseStream sends the
+tokens as they are "generated"; Converse answers once all would be done.
+--throttle-rate answers that fraction of calls with a ThrottlingException.
+
+Usage: python benchmarks/fake_bedrock.py [--port 8089] [--latency-ms 300] [--token-ms 10]
+                                         [--explain-words 0] [--throttle-rate 0] [--responses canned.json]
+"""
+
+import argparse
+import binascii
+import json
+import random
+import re
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+_QUESTION = re.compile(r"^Question:\s*(.*)$", re.MULTILINE)
+_SCHEMA = re.compile(r"Database Schema:\n(.*?)\n(?:Feedback on a previous attempt:|Instructions:)", re.DOTALL)
+_TABLE = re.compile(r"^`?(\w+)`?\(", re.MULTILINE)
+_PATH = re.compile(r"^/model/(?P<model>[^/]+)/(?P<operation>converse|converse-stream)$")
+
+
+class FakeBedrockSettings:
+    def __init__(self, latency_ms: float = 300.0, token_ms: float = 10.0, jitter: float = 0.1,
+                 explain_words: int = 0, throttle_rate: float = 0.0, responses: Optional[Dict[str, str]] = None):
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+        self.jitter = jitter
+        self.explain_words = explain_words
+        self.throttle_rate = throttle_rate
+        self.responses = [(re.compile(pattern, re.IGNORECASE), sql) for pattern, sql in (responses or {}).items()]
+        self.calls = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+
+
+def canned_sql(prompt: str, settings: FakeBedrockSettings) -> str:
+    match = _QUESTION.search(prompt)
+    question = match.group(1) if match else prompt
+    for pattern, sql in settings.responses:
+        if pattern.search(question):
+            return sql
+    schema = _SCHEMA.search(prompt)
+    tables = _TABLE.findall(schema.group(1)) if schema else []
+    if not tables:
+        return "SELECT 1"
+    lowered = question.lower()
+    table = next((t for t in tables if t.lower() in lowered), tables[0])
+    if "how many" in lowered or "count" in lowered:
+        return f"SELECT COUNT(*) AS total FROM {table}"
+    return f"SELECT * FROM {table} LIMIT 10"
+
+
+def completion_text(sql: str, settings: FakeBedrockSettings) -> str:
+    """The model's answer: fenced SQL, optionally followed by an explanation the app should not wait for"""
+    text = f"```sql\n{sql};\n```"
+    if settings.explain_words:
+        text += "\n" + " ".join(["This query returns the requested rows."] * max(settings.explain_words // 6, 1))
+    return text
+
+
+def split_tokens(text: str) -> List[str]:
+    return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+
+def _spread(milliseconds: float, jitter: float) -> float:
+    return max(milliseconds * (1 + random.uniform(-jitter, jitter)), 0.0) / 1000
+
+
+def _header(name: str, value: str) -> bytes:
+    name_bytes, value_bytes = name.encode("utf-8"), value.encode("utf-8")
+    # Header value type 7 = string
+    return struct.pack(">B", len(name_bytes)) + name_bytes + struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+
+
+def event_message(event_type: str, payload: dict) -> bytes:
+    """One application/vnd.amazon.eventstream frame, as botocore's event stream parser expects"""
+    headers = (_header(":event-type", event_type) + _header(":content-type", "application/json")
+               + _header(":message-type", "event"))
+    body = json.dumps(payload).encode("utf-8")
+    prelude = struct.pack(">II", 12 + len(headers) + len(body) + 4, len(headers))
+    prelude += struct.pack(">I", binascii.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + headers + body
+    return message + struct.pack(">I", binascii.crc32(message) & 0xFFFFFFFF)
+
+
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: FakeBedrockSettings = FakeBedrockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        match = _PATH.match(self.path)
+        if match is None:
+            self._send_json(404, {"message": f"Unknown path {self.path}"})
+            return
+        settings = self.settings
+        with settings.lock:
+            settings.calls += 1
+            throttle = random.random() < settings.throttle_rate
+            settings.throttled += int(throttle)
+        if throttle:
+            self._send_json(429, {"message": "Too many requests, please wait before trying again."},
+                            {"x-amzn-ErrorType": "ThrottlingException:http://internal.amazon.com/coral/com.amazon.bedrock/"})
+            return
+
+        request = json.loads(body or b"{}")
+        prompt = "".join(
+            block.get("text", "") for message in request.get("messages", []) for block in message.get("content", [])
+        )
+        tokens = split_tokens(completion_text(canned_sql(prompt, settings), settings))
+        usage = {"inputTokens": len(prompt) // 4, "outputTokens": len(tokens), "totalTokens": len(prompt) // 4 + len(tokens)}
+        started = time.perf_counter()
+        time.sleep(_spread(settings.latency_ms, settings.jitter))
+
+        if match.group("operation") == "converse":
+            time.sleep(_spread(settings.token_ms * len(tokens), settings.jitter))
+            self._send_json(200, {
+                "output": {"message": {"role": "assistant", "content": [{"text": "".join(tokens)}]}},
+                "stopReason": "end_turn",
+                "usage": usage,
+                "metrics": {"latencyMs": int((time.perf_counter() - started) * 1000)}
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self._write_chunk(event_message("messageStart", {"role": "assistant"}))
+            for token in tokens:
+                self._write_chunk(event_message("contentBlockDelta", {"contentBlockIndex": 0, "delta": {"text": token}}))
+                time.sleep(_spread(settings.token_ms, settings.jitter))
+            self._write_chunk(event_message("contentBlockStop", {"contentBlockIndex": 0}))
+            self._write_chunk(event_message("messageStop", {"stopReason": "end_turn"}))
+            self._write_chunk(event_message("metadata", {
+                "usage": usage, "metrics": {"latencyMs": int((time.perf_counter() - started) * 1000)}
+            }))
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading once it had the whole statement
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_bedrock(settings: FakeBedrockSettings, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Serve on a daemon thread; port 0 picks a free port (server.server_address[1])"""
+    handler = type("Handler", (FakeBedrockHandler,), {"settings": settings})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-bedrock", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", default=8089, type=int)
+    parser.add_argument("--latency-ms", default=300.0, type=float, help="delay before the first token")
+    parser.add_argument("--token-ms", default=10.0, type=float, help="delay per output token")
+    parser.add_argument("--jitter", default=0.1, type=float, help="+/- fraction applied to each delay")
+    parser.add_argument("--explain-words", default=0, type=int, help="prose appended after the SQL")
+    parser.add_argument("--throttle-rate", default=0.0, type=float, help="fraction of calls answered with 429")
+    parser.add_argument("--responses", help="JSON file of {question regex: SQL}")
+    args = parser.parse_args()
+
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+    settings = FakeBedrockSettings(args.latency_ms, args.token_ms, args.jitter, args.explain_words,
+                                   args.throttle_rate, responses)
+    server = start_fake_bedrock(settings, args.host, args.port)
+    print(f"Fake Bedrock listening on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
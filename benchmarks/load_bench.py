@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark for /query, /sql, /schema and the MCP tools
+
+Runs the real request path (schema cache, prompt compilation, botocore client,
+plan gate, pagination, MySQL driver, serialization) against a fake Bedrock
+server (benchmarks/fake_bedrock.py) and a MySQL/MariaDB database seeded with
+benchmarks/mysql_fixture.py. Nothing talks to AWS.
+
+Scenarios:
+  query         POST /query with a fresh question each time (SQL cache miss, Bedrock called)
+  query_cached  POST /query cycling through a few questions (SQL cache hits after the first round)
+  sql           POST /sql with max_age=0 (always executed)
+  sql_cached    POST /sql with a fixed statement (result cache hits)
+  schema        GET /schema
+  mcp_query     query_database tool with a fresh question each time
+  mcp_sql       execute_sql tool with max_age=0
+  mcp_schema    get_schema tool
+
+For each scenario: p50/p95/p99 latency, throughput, errors and the process RSS
+(current and peak). --json writes the results; --baseline compares p95 and
+throughput with an earlier --json file and exits 1 on a regression larger than
+--max-regression, so it can gate CI.
+
+HTTP scenarios run in-process over ASGI unless --url points at a running
+server (start that server with BEDROCK_ENDPOINT_URL at the fake, e.g.
+--bedrock-port 8089, and pass --server-pid to report its RSS). App settings can
+be varied per run with --env KEY=VALUE (e.g. --env BEDROCK_STREAMING=true).
+
+Usage: python benchmarks/load_bench.py [--scenarios query,sql,schema,mcp_query] [--concurrency 8]
+           [--requests 200] [--seed --tables 20 --rows 10000] [--bedrock-latency-ms 300 --bedrock-token-ms 5]
+           [--json results.json] [--baseline previous.json --max-regression 0.2]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_bedrock import FakeBedrockSettings, start_fake_bedrock
+from mysql_fixture import seed
+
+HTTP_SCENARIOS = ["query", "query_cached", "sql", "sql_cached", "schema"]
+MCP_SCENARIOS = ["mcp_query", "mcp_sql", "mcp_schema"]
+SCENARIOS = HTTP_SCENARIOS + MCP_SCENARIOS
+
+
+def rss_mb(pid: str = "self"):
+    """(current, peak) resident set size in MB; peak is only known for this process"""
+    current = peak = None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    peak = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if peak is not None:
+        return current, peak
+    if pid != "self":
+        return current, None
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return current, round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(math.ceil(fraction * len(ordered)) - 1, 0))]
+
+
+class Workload:
+    """Builds each scenario's next request from the tables in the benchmark database"""
+
+    def __init__(self, tables):
+        self.tables = sorted(tables) or ["t000"]
+        self._counter = itertools.count()
+
+    def fresh_question(self) -> str:
+        n = next(self._counter)
+        table = self.tables[n % len(self.tables)]
+        # The number keeps the normalized question unique, so the SQL cache never answers
+        return f"show rows from {table} where quantity is above {n}"
+
+    def cached_question(self) -> str:
+        n = next(self._counter)
+        return f"show rows from {self.tables[n % min(len(self.tables), 5)]}"
+
+    def statement(self) -> str:
+        n = next(self._counter)
+        return f"SELECT * FROM {self.tables[n % len(self.tables)]} WHERE id <= {100 + n % 50}"
+
+    def fixed_statement(self) -> str:
+        return f"SELECT * FROM {self.tables[0]} WHERE id <= 100"
+
+
+def http_call(client, workload: Workload, scenario: str):
+    if scenario == "query":
+        return client.post("/query", json={"query": workload.fresh_question()})
+    if scenario == "query_cached":
+        return client.post("/query", json={"query": workload.cached_question()})
+    if scenario == "sql":
+        return client.post("/sql", json={"sql": workload.statement(), "max_age": 0})
+    if scenario == "sql_cached":
+        return client.post("/sql", json={"sql": workload.fixed_statement()})
+    return client.get("/schema")
+
+
+async def mcp_call(workload: Workload, scenario: str) -> str:
+    from mcp_server import handle_call_tool
+    if scenario == "mcp_query":
+        contents = await handle_call_tool("query_database", {"question": workload.fresh_question()})
+    elif scenario == "mcp_sql":
+        contents = await handle_call_tool("execute_sql", {"sql": workload.statement(), "max_age": 0})
+    else:
+        contents = await handle_call_tool("get_schema", {})
+    text = contents[0].text
+    if text.startswith("Error"):
+        raise RuntimeError(text[:200])
+    return text
+
+
+async def run_scenario(scenario: str, workload: Workload, client, concurrency: int, requests: int,
+                       warmup: int, server_pid: str) -> dict:
+    async def one():
+        if scenario in MCP_SCENARIOS:
+            await mcp_call(workload, scenario)
+            return
+        response = await http_call(client, workload, scenario)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+    for _ in range(warmup):
+        await one()
+
+    latencies, errors = [], []
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < requests:
+            started = time.perf_counter()
+            try:
+                await one()
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                errors.append(str(e))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    current, peak = rss_mb(server_pid if scenario in HTTP_SCENARIOS else "self")
+    return {
+        "scenario": scenario,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "rss_mb": current,
+        "peak_rss_mb": peak
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Scenarios whose p95 grew, or throughput fell, by more than max_regression"""
+    regressions = []
+    for name, row in results.items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {row['p95_ms']} ms")
+        if before["throughput_rps"] and row["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {row['throughput_rps']} req/s")
+    return regressions
+
+
+async def run(args, fake) -> dict:
+    import httpx
+    from app.schema_cache import get_cached_schema
+
+    # Table names drive the generated questions and statements
+    workload = Workload(get_cached_schema().keys())
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=120)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120)
+
+    results = {}
+    async with client:
+        for scenario in args.scenarios:
+            calls_before = fake.calls if fake else 0
+            row = await run_scenario(scenario, workload, client, args.concurrency, args.requests,
+                                     args.warmup, args.server_pid or "self")
+            row["bedrock_calls"] = (fake.calls - calls_before) if fake else None
+            results[scenario] = row
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default="query,query_cached,sql,sql_cached,schema,mcp_query,mcp_sql,mcp_schema",
+                        type=lambda v: v.split(","))
+    parser.add_argument("--concurrency", default=8, type=int)
+    parser.add_argument("--requests", default=200, type=int, help="measured requests per scenario")
+    parser.add_argument("--warmup", default=5, type=int, help="unmeasured requests per scenario")
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--server-pid", help="PID of the --url server, to report its RSS")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="app setting for this run")
+    parser.add_argument("--bedrock-url", help="use an already running fake Bedrock instead of starting one")
+    parser.add_argument("--bedrock-port", default=0, type=int, help="port for the fake Bedrock (0 = any)")
+    parser.add_argument("--bedrock-latency-ms", default=300.0, type=float)
+    parser.add_argument("--bedrock-token-ms", default=5.0, type=float)
+    parser.add_argument("--bedrock-throttle-rate", default=0.0, type=float)
+    parser.add_argument("--seed", action="store_true", help="seed the benchmark database first")
+    parser.add_argument("--database", default="nlsql_bench")
+    parser.add_argument("--tables", default=20, type=int)
+    parser.add_argument("--rows", default=10000, type=int)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare with")
+    parser.add_argument("--max-regression", default=0.2, type=float, help="allowed p95/throughput change (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {unknown}; choose from {SCENARIOS}")
+
+    if args.seed:
+        result = seed(os.getenv("DB_HOST", "127.0.0.1"), int(os.getenv("DB_PORT", 3306)),
+                      os.getenv("DB_USER", "root"), os.getenv("DB_PASSWORD", "bench"),
+                      args.database, args.tables, args.rows)
+        print(f"{args.database}: {args.tables} tables x {args.rows} rows "
+              f"({'reused' if result['reused'] else 'seeded in %ss' % result['seconds']})")
+
+    fake = None
+    bedrock_url = args.bedrock_url
+    if not bedrock_url:
+        fake = FakeBedrockSettings(args.bedrock_latency_ms, args.bedrock_token_ms,
+                                   throttle_rate=args.bedrock_throttle_rate)
+        server = start_fake_bedrock(fake, port=args.bedrock_port)
+        bedrock_url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"Fake Bedrock on {bedrock_url}")
+
+    # app.config reads the environment at import time, so everything is set before the first app import
+    os.environ["BEDROCK_ENDPOINT_URL"] = bedrock_url
+    os.environ["DB_NAME"] = args.database
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    for setting in args.env:
+        key, _, value = setting.partition("=")
+        os.environ[key] = value
+
+    started_rss = rss_mb()[0]
+    results = asyncio.run(run(args, fake))
+
+    print(f"\n{'scenario':<14} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'rss MB':>8} {'peak MB':>8} {'bedrock':>8}")
+    for row in results.values():
+        print(f"{row['scenario']:<14} {row['requests']:>8} {row['errors']:>6} {row['throughput_rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {str(row['rss_mb']):>8} "
+              f"{str(row['peak_rss_mb']):>8} {str(row['bedrock_calls']):>8}")
+        if row["first_error"]:
+            print(f"  first error: {row['first_error']}")
+
+    report = {
+        "settings": {
+            "concurrency": args.concurrency, "requests": args.requests, "url": args.url, "env": args.env,
+            "bedrock_latency_ms": args.bedrock_latency_ms, "bedrock_token_ms": args.bedrock_token_ms,
+            "database": args.database
+        },
+        "start_rss_mb": started_rss,
+        "scenarios": results
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.max_regression:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Synthetic MySQL/MariaDB schema for benchmarks
+
+Creates a database of --tables tables named t000, t001, ... Each table has an
+id primary key, a foreign key to the previous table (indexed), an int, a
+decimal, a date, a datetime and a varchar column plus --extra-columns padding
+columns, and --rows deterministic rows. Schema size drives introspection and
+prompt compilation cost; row count drives execution and serialization cost.
+
+Connects with DB_HOST / DB_PORT / DB_USER / DB_PASSWORD (or the flags below). With
+--docker a throwaway MariaDB container is started first and its settings
+printed, so nothing needs to be installed beyond Docker.
+
+Usage: python benchmarks/mysql_fixture.py [--database nlsql_bench] [--tables 20] [--rows 10000]
+                                          [--extra-columns 4] [--docker] [--drop]
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+
+INSERT_BATCH = 1000
+DOCKER_IMAGE = "mariadb:11"
+DOCKER_NAME = "nlsql-bench-mysql"
+_WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def table_name(index: int) -> str:
+    return f"t{index:03d}"
+
+
+def _create_table_sql(index: int, extra_columns: int) -> str:
+    columns = [
+        "id INT NOT NULL PRIMARY KEY",
+        "parent_id INT NULL" if index else None,
+        "quantity INT NOT NULL",
+        "amount DECIMAL(12, 2) NOT NULL",
+        "created_on DATE NOT NULL",
+        "updated_at DATETIME NOT NULL",
+        "label VARCHAR(64) NOT NULL",
+    ]
+    columns += [f"extra_{c} VARCHAR(32) NULL" for c in range(extra_columns)]
+    constraints = []
+    if index:
+        constraints = [
+            "INDEX idx_parent (parent_id)",
+            f"CONSTRAINT fk_{table_name(index)}_parent FOREIGN KEY (parent_id) REFERENCES {table_name(index - 1)} (id)"
+        ]
+    body = ",\n  ".join([c for c in columns if c] + constraints)
+    return f"CREATE TABLE {table_name(index)} (\n  {body}\n) ENGINE=InnoDB"
+
+
+def _rows(index: int, rows: int, extra_columns: int, parent_rows: int):
+    rng = random.Random(index)
+    start = datetime(2024, 1, 1)
+    for row_id in range(1, rows + 1):
+        row = [row_id]
+        if index:
+            row.append(rng.randint(1, parent_rows) if parent_rows else None)
+        row += [
+            rng.randint(0, 1000),
+            round(rng.uniform(0, 10000), 2),
+            date(2024, 1, 1) + timedelta(days=rng.randint(0, 365)),
+            start + timedelta(minutes=rng.randint(0, 525600)),
+            f"{rng.choice(_WORDS)}-{row_id}",
+        ]
+        row += [rng.choice(_WORDS) for _ in range(extra_columns)]
+        yield tuple(row)
+
+
+def connect(host: str, port: int, user: str, password: str, database: str = None):
+    return mysql.connector.connect(host=host, port=port, user=user, password=password, database=database,
+                                   autocommit=False)
+
+
+def seed(host: str, port: int, user: str, password: str, database: str, tables: int, rows: int,
+         extra_columns: int = 4, drop: bool = False) -> dict:
+    """Create and fill the synthetic schema; returns {"tables", "rows", "seconds", "reused"}.
+
+    An existing database with at least `tables` tables is reused as-is unless drop=True."""
+    started = time.perf_counter()
+    conn = connect(host, port, user, password)
+    cursor = conn.cursor()
+    try:
+        if drop:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}`")
+        cursor.execute(f"USE `{database}`")
+        cursor.execute(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s", (database,)
+        )
+        if cursor.fetchone()[0] >= tables:
+            # Already seeded at this size or larger; reuse it
+            return {"tables": tables, "rows": rows, "seconds": round(time.perf_counter() - started, 2), "reused": True}
+
+        for index in range(tables):
+            cursor.execute(f"DROP TABLE IF EXISTS {table_name(index)}")
+            cursor.execute(_create_table_sql(index, extra_columns))
+            width = 6 + (1 if index else 0) + extra_columns
+            insert = f"INSERT INTO {table_name(index)} VALUES ({', '.join(['%s'] * width)})"
+            batch = []
+            for row in _rows(index, rows, extra_columns, rows if index else 0):
+                batch.append(row)
+                if len(batch) >= INSERT_BATCH:
+                    cursor.executemany(insert, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert, batch)
+            conn.commit()
+        cursor.execute("ANALYZE TABLE " + ", ".join(table_name(i) for i in range(tables)))
+        cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return {"tables": tables, "rows": rows, "seconds": round(time.perf_counter() - started, 2), "reused": False}
+
+
+def start_docker(port: int, password: str, timeout: float = 120.0):
+    """Start (or reuse) a MariaDB container on 127.0.0.1:port and wait until it accepts connections"""
+    running = subprocess.run(["docker", "ps", "-q", "-f", f"name={DOCKER_NAME}"], capture_output=True, text=True)
+    if not running.stdout.strip():
+        subprocess.run(["docker", "rm", "-f", DOCKER_NAME], capture_output=True)
+        subprocess.run([
+            "docker", "run", "-d", "--name", DOCKER_NAME, "-p", f"127.0.0.1:{port}:3306",
+            "-e", f"MARIADB_ROOT_PASSWORD={password}", DOCKER_IMAGE
+        ], check=True, capture_output=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connect("127.0.0.1", port, "root", password).close()
+            return
+        except mysql.connector.Error:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("DB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", default=int(os.getenv("DB_PORT", 3306)), type=int)
+    parser.add_argument("--user", default=os.getenv("DB_USER", "root"))
+    parser.add_argument("--password", default=os.getenv("DB_PASSWORD", "bench"))
+    parser.add_argument("--database", default="nlsql_bench")
+    parser.add_argument("--tables", default=20, type=int)
+    parser.add_argument("--rows", default=10000, type=int, help="rows per table")
+    parser.add_argument("--extra-columns", default=4, type=int, help="padding varchar columns per table")
+    parser.add_argument("--docker", action="store_true", help=f"start a {DOCKER_IMAGE} container first")
+    parser.add_argument("--drop", action="store_true", help="drop and recreate the database")
+    args = parser.parse_args()
+
+    if args.docker:
+        args.host, args.user = "127.0.0.1", "root"
+        start_docker(args.port, args.password)
+    result = seed(args.host, args.port, args.user, args.password, args.database, args.tables, args.rows,
+                  args.extra_columns, args.drop)
+    state = "reused" if result["reused"] else f"seeded in {result['seconds']}s"
+    print(f"{args.database}: {args.tables} tables x {args.rows} rows ({state})")
+    print(f"DB_HOST={args.host} DB_PORT={args.port} DB_USER={args.user} DB_PASSWORD={args.password} DB_NAME={args.database}")
+
+
+if __name__ == "__main__":
+    main()
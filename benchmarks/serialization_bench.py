@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark: recursive serialize_mysql_data vs the column-typed RowSerializer
+
+Builds a synthetic wide result set (ints, decimals, dates, datetimes, times and
+strings) and times each path from driver rows to JSON bytes:
+
+  legacy      dict rows -> serialize_mysql_data -> json.dumps
+  typed       tuple rows -> RowSerializer.dicts -> json.dumps
+  typed+fast  tuple rows -> RowSerializer.dicts -> dumps_bytes (orjson when installed)
+  direct      tuple rows -> RowSerializer.encode_each (orjson straight from driver values)
+
+Usage: python benchmarks/serialization_bench.py [--rows 20000] [--width 24] [--repeat 5] [--no-time]
+"""
+
+import argparse
+import decimal
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mysql.connector.constants import FieldType
+
+from app.serialization import RowSerializer, dumps_bytes, orjson
+from app.shared_utils import serialize_mysql_data
+
+_COLUMN_KINDS = [
+    (FieldType.LONG, lambda i: i),
+    (FieldType.NEWDECIMAL, lambda i: decimal.Decimal(i) / 100),
+    (FieldType.DATE, lambda i: date(2024, 1, 1) + timedelta(days=i % 365)),
+    (FieldType.DATETIME, lambda i: datetime(2024, 1, 1, 12, 0) + timedelta(minutes=i)),
+    (FieldType.TIME, lambda i: timedelta(seconds=i % 86400)),
+    (FieldType.VAR_STRING, lambda i: f"value-{i}"),
+]
+
+
+def build(rows: int, width: int, include_time: bool = True):
+    pool = [kind for kind in _COLUMN_KINDS if include_time or kind[0] != FieldType.TIME]
+    kinds = [pool[c % len(pool)] for c in range(width)]
+    description = [(f"col_{c}", kind[0], None, None, None, None, 1, 0) for c, kind in enumerate(kinds)]
+    tuples = [tuple(make(r + c) for c, (_, make) in enumerate(kinds)) for r in range(rows)]
+    names = [d[0] for d in description]
+    dict_rows = [dict(zip(names, row)) for row in tuples]
+    return description, tuples, dict_rows
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--width", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-time", action="store_true",
+                        help="leave out TIME columns (the legacy path never converts them, see below)")
+    args = parser.parse_args()
+
+    description, tuples, dict_rows = build(args.rows, args.width, include_time=not args.no_time)
+    serializer = RowSerializer(description)
+
+    # serialize_mysql_data leaves TIME values (timedelta) untouched, so the legacy path needs
+    # default=str to encode them at all -- it does no conversion work for those columns
+    legacy_default = str
+
+    cases = {
+        "legacy": lambda: json.dumps(serialize_mysql_data(dict_rows), default=legacy_default).encode(),
+        "typed": lambda: json.dumps(serializer.dicts(tuples)).encode(),
+        "typed+fast": lambda: dumps_bytes(serializer.dicts(tuples)),
+        "direct": lambda: b",".join(serializer.encode_each(tuples)),
+    }
+    print(f"{args.rows} rows x {args.width} columns, best of {args.repeat} "
+          f"(orjson {'available' if orjson else 'not installed'})")
+    baseline = None
+    for name, func in cases.items():
+        elapsed = best_of(args.repeat, func)
+        baseline = baseline or elapsed
+        print(f"  {name:<11} {elapsed * 1000:9.1f} ms   {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
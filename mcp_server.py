@@ -4,26 +4,33 @@ MCP Server for NLP to SQL conversion using AWS Bedrock and MySQL RDS
 """
 
 import asyncio
-import json
+import contextlib
 import logging
-from typing import Any, Dict, List, Optional, Sequence
-import os
+import time
+import weakref
+from typing import Any, Dict, List, Sequence
 from dotenv import load_dotenv
 
 from mcp.server import Server
 from mcp.server.models import InitializationOptions
 from mcp.server.stdio import stdio_server
-from mcp.types import (
-    Resource,
-    Tool,
-    TextContent,
-    ImageContent,
-    EmbeddedResource,
-    LoggingLevel
-)
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp.types import Tool, TextContent
 
 # Import shared utilities
-from app.shared_utils import execute_sql_query, get_database_schema, generate_sql_from_nl
+from app.context import AppContext, get_app_context
+from app.datasources import get_datasources, use_datasource
+from app.schema_prompt import compile_schema_prompt
+from app.sql_cache import generate_sql_cached
+from app.pagination import decode_cursor, execute_sql_page
+from app.timeouts import RequestBudget, run_with_deadline
+from app.planner import QueryRejectedError, gate_generated_sql
+from app.sql_validation import SQLValidationError, validate_generated_sql
+from app.batch import run_batch
+from app.serialization import dumps
+from app.metrics import record_tool_call, request_timings, timed, with_timings
+from app.tracing import current_span, setup_tracing, span
+from app.config import MCP_HTTP_HOST, MCP_HTTP_PORT, MCP_SESSION_CONCURRENCY
 
 # Load environment variables
 load_dotenv()
@@ -42,10 +49,45 @@ class SimpleNotificationOptions:
 
 # All database and Bedrock operations are now handled by shared_utils
 
+# Metric label for calls naming a tool that does not exist
+_TOOL_NAMES = {
+    "query_database", "execute_sql", "get_schema", "generate_sql", "batch_query", "invalidate_schema_cache"
+}
+
+# Tool calls in flight per client session; entries go away with their session
+_session_slots: "weakref.WeakKeyDictionary[Any, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _session_slot() -> Any:
+    """Semaphore bounding this session's concurrent tool calls, so one busy agent cannot take every connection"""
+    if MCP_SESSION_CONCURRENCY <= 0:
+        return contextlib.nullcontext()
+    try:
+        session = server.request_context.session
+    except LookupError:
+        return contextlib.nullcontext()
+    slot = _session_slots.get(session)
+    if slot is None:
+        slot = _session_slots[session] = asyncio.Semaphore(MCP_SESSION_CONCURRENCY)
+    return slot
+
+def _json_content(payload: Any) -> List[TextContent]:
+    with timed("encode"):
+        text = dumps(payload, indent=True)
+    current_span().set_attribute("mcp.response.size", len(text))
+    return [TextContent(type="text", text=text)]
+
+def _database_property() -> Dict[str, Any]:
+    registry = get_datasources()
+    return {
+        "type": "string",
+        "enum": registry.names(),
+        "description": f"Datasource to run against (default {registry.default}); reads go to its replicas"
+    }
+
 @server.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available MCP tools"""
-    return [
+    tools = [
         Tool(
             name="query_database",
             description="Execute a natural language query on the MySQL database using AWS Bedrock to convert to SQL",
@@ -55,6 +97,22 @@ async def handle_list_tools() -> List[Tool]:
                     "question": {
                         "type": "string",
                         "description": "Natural language question about the database"
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": "Time budget in seconds; the query is killed on the server when it runs out"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": "Rows per page (defaults to the server row limit)"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous page to fetch the following rows"
+                    },
+                    "debug": {
+                        "type": "boolean",
+                        "description": "Include per-stage timings (schema, Bedrock, execute, fetch, ...) in the result"
                     }
                 },
                 "required": ["question"]
@@ -69,6 +127,26 @@ async def handle_list_tools() -> List[Tool]:
                     "sql": {
                         "type": "string",
                         "description": "SQL SELECT query to execute"
+                    },
+                    "max_age": {
+                        "type": "number",
+                        "description": "Maximum age in seconds of a cached result; 0 forces a fresh read"
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": "Time budget in seconds; the query is killed on the server when it runs out"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": "Rows per page (defaults to the server row limit)"
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "next_cursor from a previous page to fetch the following rows"
+                    },
+                    "debug": {
+                        "type": "boolean",
+                        "description": "Include per-stage timings (schema, Bedrock, execute, fetch, ...) in the result"
                     }
                 },
                 "required": ["sql"]
@@ -91,75 +169,208 @@ async def handle_list_tools() -> List[Tool]:
                     "question": {
                         "type": "string",
                         "description": "Natural language question to convert to SQL"
+                    },
+                    "timeout": {
+                        "type": "number",
+                        "description": "Time budget in seconds for generating the SQL"
                     }
                 },
                 "required": ["question"]
             }
+        ),
+        Tool(
+            name="batch_query",
+            description="Generate (and optionally execute) SQL for a list of natural language questions in one call",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "questions": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Natural language questions; duplicates are answered once"
+                    },
+                    "execute": {
+                        "type": "boolean",
+                        "description": "Also run each generated query (default true)"
+                    },
+                    "page_size": {
+                        "type": "integer",
+                        "description": "Rows per result (defaults to the server row limit)"
+                    }
+                },
+                "required": ["questions"]
+            }
+        ),
+        Tool(
+            name="invalidate_schema_cache",
+            description="Drop the cached database schema so it is reloaded on the next call",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
+    # Every tool can target any configured datasource
+    database = _database_property()
+    for tool in tools:
+        tool.inputSchema["properties"]["database"] = database
+    return tools
 
 @server.call_tool()
 async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> Sequence[TextContent]:
     """Handle tool calls"""
+    status = "error"
+    tool = name if name in _TOOL_NAMES else "unknown"
+    with request_timings() as timings, span(f"mcp.tool {tool}", {"mcp.tool.name": name}, kind="server") as current:
+        try:
+            with use_datasource(arguments.get("database")):
+                async with _session_slot():
+                    contents = await _call_tool(_session_context(), name, arguments)
+            status = "success"
+            return contents
+        except Exception as e:
+            logger.error(f"Error in tool call {name}: {e}")
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
+        finally:
+            current.set_attribute("mcp.tool.status", status)
+            record_tool_call(tool, status, time.perf_counter() - timings.started)
+
+def _session_context() -> AppContext:
+    """The context the server lifespan hands to handlers, or the process-wide one for in-process callers"""
     try:
-        if name == "query_database":
-            question = arguments.get("question")
-            if not question:
-                return [TextContent(type="text", text="Error: Question is required")]
-            
+        return server.request_context.lifespan_context
+    except LookupError:
+        # Called directly (terminal client, CLI, tests) rather than through a session
+        return get_app_context()
+
+async def _call_tool(context: AppContext, name: str, arguments: Dict[str, Any]) -> Sequence[TextContent]:
+    if name == "query_database":
+        question = arguments.get("question")
+        cursor = arguments.get("cursor")
+        if not question and not cursor:
+            return [TextContent(type="text", text="Error: Question is required")]
+        
+        # Cancelling the tool call kills the running statement on the server
+        budget = RequestBudget(arguments.get("timeout"))
+        page_size, plan, validation, forced_limit = arguments.get("page_size"), None, None, None
+        if cursor:
+            # Later pages re-run the SQL carried by the cursor; Bedrock is not called
+            sql_query, schema_prompt, cache_hit = decode_cursor(cursor)[0], None, None
+        else:
             # Get schema for better SQL generation
-            schema = get_database_schema()
-            schema_str = json.dumps(schema, indent=2)
+            schema = await context.schema()
+            schema_prompt = compile_schema_prompt(schema, question)
             
             # Generate SQL from natural language
-            sql_query = generate_sql_from_nl(question, schema_str)
-            
-            # Execute the generated SQL
-            result = execute_sql_query(sql_query)
+            sql_query, cache_hit = await run_with_deadline(
+                generate_sql_cached, question, schema_prompt.text, timeout=budget.for_generation()
+            )
             
-            response = {
-                "question": question,
-                "generated_sql": sql_query,
-                "result": result
-            }
+            # Check tables and columns against the schema; Bedrock repairs what does not match
+            try:
+                checked = await run_with_deadline(
+                    validate_generated_sql, question, sql_query, schema, schema_prompt.text, budget=budget,
+                    timeout=budget.remaining()
+                )
+            except SQLValidationError as e:
+                return _json_content({"error": str(e), "generated_sql": sql_query, "validation": e.report})
+            sql_query, validation = checked.sql, checked.report
             
-            return [TextContent(type="text", text=json.dumps(response, indent=2))]
+            # Check the plan before running it; may regenerate, reject or cap the query
+            try:
+                gate = await run_with_deadline(
+                    gate_generated_sql, question, sql_query, schema_prompt.text, schema=schema, budget=budget,
+                    timeout=budget.remaining()
+                )
+            except QueryRejectedError as e:
+                return _json_content({"error": str(e), "plan": e.plan})
+            sql_query, plan, forced_limit = gate.sql, gate.plan, gate.page_size
+            if forced_limit:
+                page_size = min(page_size, forced_limit) if page_size else forced_limit
         
-        elif name == "execute_sql":
-            sql = arguments.get("sql")
-            if not sql:
-                return [TextContent(type="text", text="Error: SQL query is required")]
-            
-            result = execute_sql_query(sql)
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+        # Execute one page of the generated SQL; later pages stay within the gate's forced limit
+        result, _ = await run_with_deadline(
+            execute_sql_page, sql_query, page_size, cursor, max_age=0, cap=forced_limit,
+            timeout=budget.for_execution()
+        )
         
-        elif name == "get_schema":
-            schema = get_database_schema()
-            return [TextContent(type="text", text=json.dumps(schema, indent=2))]
+        response = {
+            "question": question,
+            "generated_sql": sql_query,
+            "schema_prompt": schema_prompt.summary() if schema_prompt else None,
+            "cache_hit": cache_hit,
+            "validation": validation,
+            "plan": plan,
+            "result": result
+        }
         
-        elif name == "generate_sql":
-            question = arguments.get("question")
-            if not question:
-                return [TextContent(type="text", text="Error: Question is required")]
-            
-            # Get schema for better SQL generation
-            schema = get_database_schema()
-            schema_str = json.dumps(schema, indent=2)
-            
-            # Generate SQL from natural language
-            sql_query = generate_sql_from_nl(question, schema_str)
-            
-            return [TextContent(type="text", text=f"Generated SQL: {sql_query}")]
+        return _json_content(with_timings(response, arguments.get("debug", False)))
+    
+    elif name == "execute_sql":
+        sql = arguments.get("sql")
+        if not sql:
+            return [TextContent(type="text", text="Error: SQL query is required")]
         
-        else:
-            return [TextContent(type="text", text=f"Unknown tool: {name}")]
+        result, cache_hit = await run_with_deadline(
+            execute_sql_page, sql, arguments.get("page_size"), arguments.get("cursor"),
+            max_age=arguments.get("max_age"), timeout=RequestBudget(arguments.get("timeout")).for_execution()
+        )
+        return _json_content(with_timings({**result, "cache_hit": cache_hit}, arguments.get("debug", False)))
+    
+    elif name == "get_schema":
+        schema = await context.schema()
+        return _json_content(schema)
     
-    except Exception as e:
-        logger.error(f"Error in tool call {name}: {e}")
-        return [TextContent(type="text", text=f"Error: {str(e)}")]
+    elif name == "generate_sql":
+        question = arguments.get("question")
+        if not question:
+            return [TextContent(type="text", text="Error: Question is required")]
+        
+        # Get schema for better SQL generation
+        schema = await context.schema()
+        schema_prompt = compile_schema_prompt(schema, question)
+        
+        # Generate SQL from natural language
+        sql_query, cache_hit = await run_with_deadline(
+            generate_sql_cached, question, schema_prompt.text,
+            timeout=RequestBudget(arguments.get("timeout")).remaining()
+        )
+        logger.info(
+            f"generate_sql: schema prompt {schema_prompt.tokens} tokens "
+            f"({len(schema_prompt.tables)}/{schema_prompt.total_tables} tables)"
+        )
+        
+        return [TextContent(
+            type="text",
+            text=f"Generated SQL: {sql_query}\nCache hit: {str(cache_hit).lower()}"
+        )]
+    
+    elif name == "batch_query":
+        questions = arguments.get("questions")
+        if not questions:
+            return [TextContent(type="text", text="Error: Questions are required")]
+        
+        # Schema is loaded once; questions fan out to Bedrock and MySQL concurrently
+        schema = await context.schema()
+        items, summary = [], None
+        async for item in run_batch(
+            questions, schema, execute=arguments.get("execute", True), page_size=arguments.get("page_size")
+        ):
+            if "summary" in item:
+                summary = item["summary"]
+            else:
+                items.append(item)
+        items.sort(key=lambda item: item["index"])
+        return _json_content({"items": items, "summary": summary})
+    
+    elif name == "invalidate_schema_cache":
+        context.invalidate_schema()
+        return [TextContent(type="text", text="Schema cache invalidated")]
+    
+    else:
+        return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
-async def main():
-    """Main entry point for the MCP server"""
+async def _serve_stdio():
     async with stdio_server() as (read_stream, write_stream):
         await server.run(
             read_stream,
@@ -174,5 +385,50 @@ async def main():
             )
         )
 
+class _ASGIEndpoint:
+    """Lets a Route pass the raw ASGI call through (a Mount would redirect /mcp to /mcp/)"""
+
+    def __init__(self, handler):
+        self.handler = handler
+
+    async def __call__(self, scope, receive, send):
+        await self.handler(scope, receive, send)
+
+async def _serve_http(context: AppContext, host: str, port: int):
+    """Streamable HTTP on /mcp: every client session is served by this process and shares its context"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.routing import Route
+
+    session_manager = StreamableHTTPSessionManager(app=server)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app):
+        # Warm before the first client connects rather than at its initialize
+        context.start_warmup()
+        async with session_manager.run():
+            yield
+
+    app = Starlette(routes=[Route("/mcp", endpoint=_ASGIEndpoint(session_manager.handle_request))], lifespan=lifespan)
+    logger.info(f"MCP streamable HTTP endpoint: http://{host}:{port}/mcp")
+    await uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="info")).serve()
+
+async def main(transport: str = "stdio", host: str = MCP_HTTP_HOST, port: int = MCP_HTTP_PORT):
+    """Main entry point for the MCP server: "stdio" (one client) or "http" (many concurrent sessions)"""
+    setup_tracing()
+    # Owns the pool, Bedrock client, schema and caches for the life of the process; the
+    # session lifespan starts warming them as the client initializes
+    context = get_app_context()
+    server.lifespan = context.lifespan
+    try:
+        if transport == "http":
+            await _serve_http(context, host, port)
+        elif transport == "stdio":
+            await _serve_stdio()
+        else:
+            raise ValueError(f"Unknown MCP transport: {transport}")
+    finally:
+        await context.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,35 +1,121 @@
 #!/usr/bin/env python3
 """
 Startup script for the FastAPI MySQL NLP Server
+
+Production defaults: API_WORKERS uvicorn worker processes (0 = one per CPU), uvloop and
+httptools when installed, no auto-reload. MySQL and Bedrock settings are checked once
+here before any worker starts (exit code 1 on failure); each worker then warms its own
+connection pool, Bedrock client, schema and caches before accepting requests. On SIGTERM
+or Ctrl+C the server stops accepting connections and gives in-flight requests up to
+API_GRACEFUL_TIMEOUT seconds to finish.
+
+Usage: python start_fastapi_server.py [--dev] [--workers N] [--check-only]
+  --dev         one worker with auto-reload (same as API_RELOAD=true)
+  --workers N   override API_WORKERS
+  --check-only  run the startup check and exit
 """
 
-import uvicorn
+import argparse
+import atexit
+import importlib.util
 import os
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+
+import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-if __name__ == "__main__":
-    print("Starting MySQL NLP FastAPI Server...")
-    print("Make sure you have:")
-    print("1. Configured your .env file with database credentials")
-    print("2. AWS credentials configured for Bedrock access")
-    print("3. Required Python packages installed")
-    print("-" * 50)
-    
+
+def cpu_count() -> int:
+    """CPUs this process may run on (respects container and taskset limits where the OS exposes them)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def _share_metrics_across_workers():
+    """Each worker is its own process; prometheus_client aggregates them through a shared directory"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR") or not _installed("prometheus_client"):
+        return
+    directory = tempfile.mkdtemp(prefix="nlsql-metrics-")
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dev", action="store_true", help="single worker with auto-reload")
+    parser.add_argument("--workers", type=int, help="worker processes (0 = one per CPU)")
+    parser.add_argument("--check-only", action="store_true", help="check MySQL and Bedrock settings, then exit")
+    args = parser.parse_args()
+
     # Get configuration from environment
     host = os.getenv("API_HOST", "0.0.0.0")
     port = int(os.getenv("API_PORT", 8000))
-    reload = os.getenv("API_RELOAD", "true").lower() == "true"
-    
-    print(f"Starting server on http://{host}:{port}")
-    print("API Documentation available at: http://localhost:8000/docs")
+    reload = args.dev or os.getenv("API_RELOAD", "false").lower() == "true"
+    workers = args.workers if args.workers is not None else int(os.getenv("API_WORKERS", 0))
+    workers = 1 if reload else (workers or cpu_count())
+    graceful_timeout = float(os.getenv("API_GRACEFUL_TIMEOUT", 30))
+    loop = "uvloop" if _installed("uvloop") else "asyncio"
+    http = "httptools" if _installed("httptools") else "h11"
+
+    started = time.time()
+    if workers > 1:
+        _share_metrics_across_workers()
+    if not os.getenv("CURSOR_SECRET"):
+        # Any worker may serve the next page, so all of them must accept each other's cursors
+        os.environ["CURSOR_SECRET"] = secrets.token_hex(32)
+
+    # Imported after the environment is final: app.config and prometheus_client read it at import
+    from app.config import STARTUP_CHECK
+    from app.datasources import get_datasources
+    from app.startup import LAUNCHED_AT_ENV, check_config
+
+    if STARTUP_CHECK or args.check_only:
+        check_started = time.perf_counter()
+        problems = check_config()
+        if problems:
+            print("Startup check failed:", file=sys.stderr)
+            for problem in problems:
+                print(f"  - {problem}", file=sys.stderr)
+            sys.exit(1)
+        print(f"Startup check passed in {(time.perf_counter() - check_started) * 1000:.0f} ms")
+    if args.check_only:
+        return
+
+    os.environ[LAUNCHED_AT_ENV] = str(started)
+    mode = "development (auto-reload)" if reload else "production"
+    print(f"Starting MySQL NLP FastAPI Server on http://{host}:{port} [{mode}]")
+    registry = get_datasources()
+    connections = registry.max_connections()
+    print(f"  workers: {workers} (up to {workers * connections} MySQL connections: {connections} per worker "
+          f"across {len(registry.datasources)} datasource(s))")
+    print(f"  event loop: {loop}, HTTP parser: {http}")
+    print(f"  graceful shutdown: {graceful_timeout:g}s to drain in-flight requests")
+    print(f"API Documentation available at: http://localhost:{port}/docs")
     print("Press Ctrl+C to stop the server")
-    
+
     uvicorn.run(
         "app.main:app",
         host=host,
         port=port,
-        reload=reload
-    )
\ No newline at end of file
+        reload=reload,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=graceful_timeout
+    )
+
+
+if __name__ == "__main__":
+    main()
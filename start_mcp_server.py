@@ -1,19 +1,29 @@
 #!/usr/bin/env python3
 """
 Startup script for the MCP MySQL NLP Server
+
+Usage: python start_mcp_server.py [--transport stdio|http] [--host 127.0.0.1] [--port 8001]
+  stdio  one client, which launches this process (default)
+  http   streamable HTTP on http://HOST:PORT/mcp; many agents share one pool and cache
 """
 
+import argparse
 import asyncio
 import sys
-import os
 from pathlib import Path
 
 # Add the current directory to Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from mcp_server import main
+from app.config import MCP_HTTP_HOST, MCP_HTTP_PORT
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default=MCP_HTTP_HOST, help="listen address for --transport http")
+    parser.add_argument("--port", default=MCP_HTTP_PORT, type=int, help="listen port for --transport http")
+    args = parser.parse_args()
     try:
         print("Starting MySQL NLP MCP Server...")
         print("Make sure you have:")
@@ -23,9 +33,12 @@ if __name__ == "__main__":
         print("-" * 50)
         print("NOTE: This server is designed to work with MCP clients.")
         print("If you're testing, use: python test_mcp_server.py")
-        print("If you're connecting with an MCP client, this server will wait for connections...")
+        if args.transport == "http":
+            print(f"Serving MCP over streamable HTTP at http://{args.host}:{args.port}/mcp")
+        else:
+            print("If you're connecting with an MCP client, this server will wait for connections...")
         print("-" * 50)
-        asyncio.run(main())
+        asyncio.run(main(args.transport, args.host, args.port))
     except KeyboardInterrupt:
         print("\nShutting down MCP server...")
     except Exception as e:
@@ -0,0 +1,104 @@
+"""
+Offline tests: no MySQL, Bedrock or network. Anything that would connect is replaced per test.
+"""
+
+import itertools
+import json
+import os
+import sys
+import threading
+
+import mysql.connector
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time; keep a developer's .env from changing what is tested
+os.environ.setdefault("STARTUP_CHECK", "false")
+os.environ.setdefault("STARTUP_WARMUP", "false")
+os.environ.setdefault("SQL_CACHE_BACKEND", "memory")
+os.environ.setdefault("TRACING_EXPORTER", "off")
+
+from app import datasources  # noqa: E402  (after the settings above)
+
+
+_connection_ids = itertools.count(1)
+
+
+class FakeServer:
+    """One MySQL host: its tables, their UPDATE_TIME, and a log of (thread, statement) it was sent"""
+
+    def __init__(self, host, tables, update_time="2026-01-01 00:00:00"):
+        self.host = host
+        self.tables = tables
+        self.update_time = update_time
+        self.log = []
+
+
+class FakeCursor:
+    def __init__(self, server, dictionary=False):
+        self.server = server
+        self.dictionary = dictionary
+        self.description = None
+        self._rows = []
+
+    def execute(self, sql, params=None):
+        server = self.server
+        server.log.append((threading.current_thread().name, sql))
+        self.description, self._rows = None, []
+        if "information_schema.COLUMNS" in sql:
+            self._rows = [(table, "id", "int", "NO", "PRI", None, "") for table in server.tables]
+        elif "information_schema.TABLES" in sql:
+            pairs = zip(params[::2], params[1::2])
+            self._rows = [(schema, table, "2025-01-01 00:00:00", server.update_time)
+                          for schema, table in pairs if table in server.tables]
+        elif sql.startswith("SELECT * FROM `"):
+            self._rows = [{"id": 1, "server": server.host}]
+        elif sql.lstrip().upper().startswith("SELECT") and "information_schema" not in sql:
+            self.description = [("server", 253, None, None, None, None, 1, 0, 45)]
+            self._rows = [(server.host,)]
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, server):
+        self.server = server
+        self.connection_id = next(_connection_ids)
+
+    def cursor(self, dictionary=False, buffered=True):
+        return FakeCursor(self.server, dictionary)
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_mysql(monkeypatch):
+    """Two datasources on fake servers: "default" (host main-db) and "sales" (sales-db plus replicas r1 and r2).
+
+    Returns host -> FakeServer; nothing connects to a real MySQL.
+    """
+    servers = {
+        "main-db": FakeServer("main-db", ["users"]),
+        "sales-db": FakeServer("sales-db", ["orders", "refunds"]),
+        "sales-r1": FakeServer("sales-r1", ["orders", "refunds"], "2026-01-01 00:00:01"),
+        "sales-r2": FakeServer("sales-r2", ["orders", "refunds"], "2026-01-01 00:00:02"),
+    }
+    monkeypatch.setattr(mysql.connector, "connect", lambda **options: FakeConnection(servers[options["host"]]))
+    registry = datasources.load_datasources(json.dumps({
+        "default": {"host": "main-db", "database": "shop", "replicas": []},
+        "sales": {"host": "sales-db", "database": "salesdb", "replicas": ["sales-r1", "sales-r2"]},
+    }))
+    registry.health_interval = 0
+    monkeypatch.setattr(datasources, "_registry", registry)
+    yield servers
+    registry.close()
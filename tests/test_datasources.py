@@ -0,0 +1,44 @@
+from app import result_cache
+from app.datasources import use_datasource
+from app.result_cache import ResultCache, execute_sql_query_cached
+from app.shared_utils import get_database_schema
+
+
+def test_schema_and_sample_rows_come_from_the_selected_datasource(fake_mysql):
+    with use_datasource("sales"):
+        schema = get_database_schema(include_samples=True)
+    assert sorted(schema) == ["orders", "refunds"]
+    for table in schema.values():
+        # Sample rows are fetched on pool threads; they must not fall back to the default datasource
+        assert table["sample_data"][0]["server"] in {"sales-r1", "sales-r2"}
+    assert not any("SELECT * FROM" in sql for _, sql in fake_mysql["main-db"].log)
+
+    assert list(get_database_schema(include_samples=True)) == ["users"]
+
+
+def test_result_cache_reads_versions_and_rows_from_one_replica(fake_mysql, monkeypatch):
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache())
+    sql = "SELECT COUNT(*) FROM orders"
+    with use_datasource("sales"):
+        calls = [execute_sql_query_cached(sql) for _ in range(4)]
+
+    for host in ("sales-r1", "sales-r2"):
+        statements = [statement for _, statement in fake_mysql[host].log if "SET SESSION" not in statement]
+        # One miss per replica: its table versions, then the rows, both on that replica
+        assert "information_schema.TABLES" in statements[0]
+        assert statements[1].endswith("COUNT(*) FROM orders")
+    # Entries are per replica, each served from (and validated on) the replica it was read from
+    assert [hit for _, hit in calls] == [False, False, True, True]
+    assert [result["rows"][0]["server"] for result, _ in calls] == ["sales-r1", "sales-r2", "sales-r1", "sales-r2"]
+
+
+def test_pinning_an_endpoint_borrows_no_connection(fake_mysql, monkeypatch):
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache())
+    with use_datasource("sales") as sales:
+        with sales.pin_endpoint() as endpoint:
+            assert sum(e.pool.stats()["acquires"] for e in sales.endpoints) == 0
+            assert endpoint in sales.replicas
+        hits = [execute_sql_query_cached("SELECT COUNT(*) FROM orders")[1] for _ in range(4)]
+    assert hits == [False, False, True, True]
+    # A miss borrows for the versions and the rows, a hit only for the versions
+    assert sum(e.pool.stats()["acquires"] for e in sales.endpoints) == 2 + 2 + 1 + 1
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+from app.db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.connected = True
+        self.closed = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+class Connector:
+    """connect callable that remembers every connection it opened"""
+
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self):
+        conn = FakeConnection(len(self.opened) + 1)
+        self.opened.append(conn)
+        return conn
+
+
+@pytest.fixture
+def connect():
+    return Connector()
+
+
+def make_pool(connect, **options):
+    options.setdefault("reap_interval", 0)
+    return ConnectionPool(connect, **options)
+
+
+def test_returned_connection_is_reused(connect):
+    pool = make_pool(connect)
+    with pool.acquire() as conn:
+        first = conn.number
+    with pool.acquire() as conn:
+        assert conn.number == first
+    assert len(connect.opened) == 1
+    assert pool.stats()["acquires"] == 2
+
+
+def test_connection_past_max_lifetime_is_recycled_on_borrow(connect):
+    pool = make_pool(connect, max_lifetime=0.05)
+    pool.warm()
+    time.sleep(0.1)
+    with pool.acquire() as conn:
+        assert conn.number == 2
+    assert connect.opened[0].closed
+    stats = pool.stats()
+    assert stats["recycled"] == 1
+    assert stats["total"] == 1
+
+
+def test_connection_past_max_lifetime_is_closed_on_return(connect):
+    pool = make_pool(connect, max_lifetime=0.05)
+    conn = pool.acquire()
+    time.sleep(0.1)
+    conn.close()
+    assert connect.opened[0].closed
+    assert pool.stats()["idle"] == 0
+
+
+def test_reap_closes_idle_connections_above_min_size(connect):
+    pool = make_pool(connect, min_size=1, idle_timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+    first.close()
+    second.close()
+    time.sleep(0.1)
+    assert pool.reap() == 1
+    stats = pool.stats()
+    assert stats["reaped"] == 1
+    assert stats["total"] == stats["idle"] == 1
+
+
+def test_reap_keeps_recently_used_connections(connect):
+    pool = make_pool(connect, min_size=0, idle_timeout=60)
+    pool.acquire().close()
+    assert pool.reap() == 0
+    assert pool.stats()["idle"] == 1
+
+
+def test_unhealthy_connection_is_replaced_on_borrow(connect):
+    pool = make_pool(connect)
+    pool.acquire().close()
+    connect.opened[0].connected = False
+    with pool.acquire() as conn:
+        assert conn.number == 2
+    assert connect.opened[0].closed
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_health_check_can_be_turned_off(connect):
+    pool = make_pool(connect, health_check=False)
+    pool.acquire().close()
+    connect.opened[0].connected = False
+    with pool.acquire() as conn:
+        assert conn.number == 1
+
+
+def test_full_pool_times_out(connect):
+    pool = make_pool(connect, max_size=1)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    held.close()
+    assert pool.stats()["timeouts"] == 1
@@ -0,0 +1,125 @@
+import base64
+import zlib
+
+import pytest
+import sqlglot
+
+from app import pagination
+from app.pagination import decode_cursor, encode_cursor, execute_sql_page, page_size_for, plan_page
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("SELECT * FROM t", 20, 10)
+    assert decode_cursor(token) == ("SELECT * FROM t", 20, 10, None)
+    assert decode_cursor(encode_cursor("SELECT 1", 0, 5, cap=50)) == ("SELECT 1", 0, 5, 50)
+
+
+def _unsigned(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(zlib.compress(payload)).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("token", [
+    "",
+    "not-a-cursor",
+    # The old unsigned format, or a hand-made token carrying arbitrary SQL
+    _unsigned(b'{"sql":"SELECT * FROM salaries","offset":0,"page_size":1000}'),
+    _unsigned(b'{"sql":"SELECT * FROM salaries","offset":0,"page_size":1000}') + ".AAAA",
+])
+def test_forged_cursors_are_refused(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_tampered_cursor_is_refused():
+    signature = encode_cursor("SELECT 1", 0, 5, cap=5).split(".")[1]
+    other_body = encode_cursor("SELECT 1", 0, 5000).split(".")[0]
+    with pytest.raises(ValueError):
+        decode_cursor(f"{other_body}.{signature}")
+
+
+def test_cursor_past_cap_is_refused():
+    # Never issued, but a signed token must still respect its own cap
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("SELECT 1", 40, 20, cap=50))
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """execute_sql_query_cached over a 100-row table, honouring LIMIT/OFFSET of the rewritten SQL"""
+    executed = []
+
+    def execute(sql_query, max_age=None):
+        executed.append(sql_query)
+        tree = sqlglot.parse_one(sql_query, read="mysql")
+        limit = int(tree.args["limit"].expression.this)
+        offset = int(tree.args["offset"].expression.this) if tree.args.get("offset") else 0
+        rows = [{"id": i} for i in range(100)][offset:offset + limit]
+        return {"columns": ["id"], "rows": rows, "row_count": len(rows)}, False
+
+    monkeypatch.setattr(pagination, "execute_sql_query_cached", execute)
+    return executed
+
+
+def _all_pages(sql_query, page_size, cap=None):
+    ids, cursor = [], None
+    while True:
+        result, _ = execute_sql_page(sql_query, page_size, cursor, cap=None if cursor else cap)
+        ids += [row["id"] for row in result["rows"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_pages_cover_the_result(table):
+    assert _all_pages("SELECT id FROM t", 30) == list(range(100))
+
+
+def test_cursors_stay_within_the_cap(table):
+    assert _all_pages("SELECT id FROM t", 20, cap=45) == list(range(45))
+    assert _all_pages("SELECT id FROM t", 45, cap=45) == list(range(45))
+
+
+def test_cursor_is_bound_to_its_query(table):
+    result, _ = execute_sql_page("SELECT id FROM t", 10)
+    with pytest.raises(ValueError):
+        execute_sql_page("SELECT id FROM salaries", 10, result["next_cursor"])
+
+
+@pytest.mark.parametrize("sql, page_size, offset, expected", [
+    ("SELECT id FROM t", 10, 0, "SELECT id FROM t LIMIT 11 OFFSET 0"),
+    ("SELECT id FROM t", 10, 30, "SELECT id FROM t LIMIT 11 OFFSET 30"),
+    # A LIMIT in the query is honoured: pages never read past it
+    ("SELECT id FROM t LIMIT 25", 10, 20, "SELECT id FROM t LIMIT 5 OFFSET 20"),
+    ("SELECT id FROM t LIMIT 25", 10, 30, "SELECT id FROM t LIMIT 0 OFFSET 30"),
+    ("SELECT id FROM t LIMIT 5 OFFSET 100", 10, 0, "SELECT id FROM t LIMIT 5 OFFSET 100"),
+    ("SELECT id FROM a UNION SELECT id FROM b", 10, 0, "SELECT id FROM a UNION SELECT id FROM b LIMIT 11 OFFSET 0"),
+])
+def test_plan_page(sql, page_size, offset, expected):
+    page = plan_page(sql, page_size, offset)
+    assert page.paginated
+    assert page.sql == expected
+    assert (page.offset, page.page_size) == (offset, page_size)
+
+
+def test_plan_page_without_lookahead():
+    assert plan_page("SELECT id FROM t", 10, lookahead=False).sql == "SELECT id FROM t LIMIT 10 OFFSET 0"
+
+
+@pytest.mark.parametrize("sql, page_size", [
+    ("SELECT id FROM t", 0),
+    ("SHOW TABLES", 10),
+    ("SELECT id FROM t LIMIT ?", 10),
+    ("SELECT FROM WHERE (", 10),
+])
+def test_plan_page_leaves_statement_alone(sql, page_size):
+    page = plan_page(sql, page_size)
+    assert page.sql == sql and not page.paginated
+
+
+def test_page_size_for(monkeypatch):
+    monkeypatch.setattr(pagination, "QUERY_ROW_LIMIT", 1000)
+    monkeypatch.setattr(pagination, "QUERY_MAX_PAGE_SIZE", 5000)
+    assert page_size_for(None) == 1000
+    assert page_size_for(50) == 50
+    assert page_size_for(10 ** 6) == 5000
+    assert page_size_for(0) == 0
@@ -0,0 +1,86 @@
+import pytest
+from mysql.connector import Error
+
+from app import planner
+from app.planner import QueryRejectedError, gate_generated_sql, summarize_plan
+
+SCHEMA = {"orders": {"columns": [{"Field": "id"}, {"Field": "customer_id"}, {"Field": "total"}]}}
+
+
+def _plan(rows, access="ALL"):
+    return {"query_block": {"cost_info": {"query_cost": "1.00"},
+                            "table": {"table_name": "orders", "access_type": access,
+                                      "rows_examined_per_scan": rows}}}
+
+
+EXPENSIVE = "SELECT * FROM orders"
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Stub Bedrock, EXPLAIN and the SQL cache; plans maps SQL -> EXPLAIN document (or an exception)"""
+    state = {"plans": {EXPENSIVE: _plan(5_000_000)}, "replies": [], "stored": []}
+
+    def explain_sql(sql_query):
+        plan = state["plans"][sql_query]
+        if isinstance(plan, Exception):
+            raise plan
+        return plan
+
+    class Cache:
+        def store(self, question, schema_text, sql_query):
+            state["stored"].append(sql_query)
+
+    monkeypatch.setattr(planner, "explain_sql", explain_sql)
+    monkeypatch.setattr(planner, "generate_sql_from_nl", lambda *args, **kwargs: state["replies"].pop(0))
+    monkeypatch.setattr(planner, "get_sql_cache", lambda: Cache())
+    monkeypatch.setattr(planner, "PLAN_MAX_REGENERATIONS", 1)
+    monkeypatch.setattr(planner, "PLAN_MAX_ROWS_EXAMINED", 1_000_000)
+    return state
+
+
+def test_summarize_plan_flags_large_full_scans():
+    summary = summarize_plan(_plan(5_000_000))
+    assert summary.rows_examined == 5_000_000
+    assert summary.full_scans[0]["table"] == "orders"
+    assert summary.violations
+    assert not summarize_plan(_plan(10, "ref")).violations
+
+
+def test_cheaper_candidate_is_accepted_and_cached(gate):
+    cheap = "SELECT * FROM orders WHERE id = 1"
+    gate["plans"][cheap] = _plan(1, "const")
+    gate["replies"].append(cheap)
+    result = gate_generated_sql("q", EXPENSIVE, "schema", policy="regenerate", schema=SCHEMA)
+    assert result.sql == cheap and result.plan["action"] == "run"
+    assert gate["stored"] == [cheap]
+
+
+def test_candidate_whose_explain_fails_keeps_the_original(gate):
+    broken = "SELECT * FROM orders WHERE"
+    gate["plans"][broken] = Error(msg="You have an error in your SQL syntax", errno=1064)
+    gate["replies"].append(broken)
+    # The original's plan decides: a 422 rejection, not a 500 from the candidate's EXPLAIN
+    with pytest.raises(QueryRejectedError) as rejected:
+        gate_generated_sql("q", EXPENSIVE, "schema", policy="regenerate", schema=SCHEMA)
+    assert rejected.value.plan["regenerations"] == 1
+    assert gate["stored"] == []
+
+
+def test_candidate_naming_unknown_columns_is_dropped(gate):
+    candidate = "SELECT amount FROM orders WHERE id = 1"
+    gate["plans"][candidate] = _plan(1, "const")
+    gate["replies"].append(candidate)
+    with pytest.raises(QueryRejectedError):
+        gate_generated_sql("q", EXPENSIVE, "schema", policy="regenerate", schema=SCHEMA)
+    assert gate["stored"] == []
+
+
+def test_no_regeneration_once_the_generation_deadline_has_passed(gate):
+    class Spent:
+        def generation_spent(self):
+            return True
+
+    with pytest.raises(QueryRejectedError) as rejected:
+        gate_generated_sql("q", EXPENSIVE, "schema", policy="regenerate", schema=SCHEMA, budget=Spent())
+    assert rejected.value.plan["regenerations"] == 0
@@ -0,0 +1,49 @@
+import pytest
+
+from app import result_cache
+from app.result_cache import ResultCache, execute_sql_query_cached
+
+
+@pytest.fixture
+def cache(fake_mysql, monkeypatch):
+    """Result cache over stubbed version reads; versions maps table name -> version, runs counts executions"""
+    state = {"versions": {}, "runs": 0, "asked": []}
+
+    def get_table_versions(tables):
+        state["asked"].append(sorted(table for _, table in tables))
+        return {table: state["versions"].get(table[1], "v1") for table in tables}
+
+    def execute_sql_query(sql_query):
+        state["runs"] += 1
+        return {"columns": ["n"], "rows": [{"n": state["runs"]}], "row_count": 1}
+
+    monkeypatch.setattr(result_cache, "_result_cache", ResultCache())
+    monkeypatch.setattr(result_cache, "get_table_versions", get_table_versions)
+    monkeypatch.setattr(result_cache, "execute_sql_query", execute_sql_query)
+    return state
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM t1 STRAIGHT_JOIN t2 ON t1.a = t2.a", ["t1", "t2"]),
+    ("SELECT * FROM (t1, t2)", ["t1", "t2"]),
+    ("SELECT * FROM t1 WHERE id IN (SELECT id FROM t2)", ["t1", "t2"]),
+    ("SELECT EXTRACT(YEAR FROM created_at) AS y, 'from nowhere' AS s FROM t1", ["t1"]),
+])
+def test_every_table_invalidates(cache, sql, tables):
+    assert execute_sql_query_cached(sql)[1] is False
+    assert cache["asked"][0] == tables
+    assert execute_sql_query_cached(sql)[1] is True
+    # A write to the last table (e.g. the STRAIGHT_JOIN side) must make the result stale
+    cache["versions"][tables[-1]] = "v2"
+    result, hit = execute_sql_query_cached(sql)
+    assert not hit and result["rows"] == [{"n": 2}]
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1",
+    "SELECT * FROM JSON_TABLE('[1]', '$[*]' COLUMNS (a INT PATH '$')) AS jt",
+])
+def test_statements_without_known_tables_are_not_cached(cache, sql):
+    execute_sql_query_cached(sql)
+    execute_sql_query_cached(sql)
+    assert cache["runs"] == 2 and cache["asked"] == []
@@ -0,0 +1,131 @@
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from mysql.connector.constants import FieldType
+
+from app import serialization
+from app.serialization import RowSerializer, dumps_bytes
+
+BINARY = 128
+
+
+def column(name, type_code, flags=0):
+    return (name, type_code, None, None, None, None, 1, flags, 63)
+
+
+DESCRIPTION = [
+    column("id", FieldType.LONG),
+    column("price", FieldType.NEWDECIMAL),
+    column("day", FieldType.DATE),
+    column("at", FieldType.DATETIME),
+    column("span", FieldType.TIME),
+    column("name", FieldType.VAR_STRING),
+    column("blob", FieldType.BLOB, BINARY),
+    column("tags", FieldType.SET),
+]
+
+ROWS = [
+    (1, Decimal("9.50"), date(2024, 1, 2), datetime(2024, 1, 2, 3, 4, 5), timedelta(hours=26, minutes=3),
+     "widget", b"\xc3\xa9t\xc3\xa9", {"b", "a"}),
+    (2, None, None, None, None, None, None, None),
+]
+
+EXPECTED = [
+    {"id": 1, "price": 9.5, "day": "2024-01-02", "at": "2024-01-02T03:04:05", "span": "26:03:00",
+     "name": "widget", "blob": "été", "tags": ["a", "b"]},
+    {"id": 2, "price": None, "day": None, "at": None, "span": None, "name": None, "blob": None, "tags": None},
+]
+
+
+@pytest.fixture(params=["orjson", "json"])
+def encoder(request, monkeypatch):
+    """Runs a test with orjson and again with the standard-library fallback"""
+    if request.param == "json":
+        monkeypatch.setattr(serialization, "orjson", None)
+    elif serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    return request.param
+
+
+def test_native_and_text_columns_pass_through():
+    converters = serialization.column_converters(DESCRIPTION)
+    assert converters[0] is None
+    assert converters[5] is None
+    assert converters[6] is not None
+
+
+def test_binary_flag_missing_means_decode():
+    converters = serialization.column_converters([("name", FieldType.VAR_STRING)])
+    assert converters[0]([b"abc", None]) == ["abc", None]
+
+
+def test_dicts_convert_each_column():
+    assert RowSerializer(DESCRIPTION).dicts(ROWS) == EXPECTED
+
+
+def test_values_keep_column_order():
+    values = RowSerializer(DESCRIPTION).values(ROWS)
+    assert [list(row) for row in values] == [list(row.values()) for row in EXPECTED]
+
+
+def test_empty_result():
+    serializer = RowSerializer(DESCRIPTION)
+    assert serializer.dicts([]) == []
+    assert serializer.encode_values([]) == b""
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (timedelta(0), "00:00:00"),
+        (timedelta(seconds=1, microseconds=500), "00:00:01.000500"),
+        (-timedelta(hours=1, minutes=2), "-01:02:00"),
+        (timedelta(days=34, hours=22, minutes=59, seconds=59), "838:59:59"),
+    ],
+)
+def test_time_columns_render_like_mysql(value, expected):
+    serializer = RowSerializer([column("span", FieldType.TIME)])
+    assert serializer.dicts([(value,)]) == [{"span": expected}]
+
+
+def test_unknown_type_falls_back_per_cell():
+    serializer = RowSerializer([column("value", FieldType.GEOMETRY)])
+    rows = [(Decimal("1.25"),), (b"x",), (time(1, 2),), (None,)]
+    assert [row["value"] for row in serializer.dicts(rows)] == [1.25, "x", "01:02:00", None]
+
+
+def test_encode_each_matches_dicts(encoder):
+    encoded = RowSerializer(DESCRIPTION).encode_each(ROWS)
+    assert [json.loads(line) for line in encoded] == EXPECTED
+
+
+def test_encode_values_is_a_bare_array_body(encoder):
+    body = RowSerializer(DESCRIPTION).encode_values(ROWS)
+    assert json.loads(b"[" + body + b"]") == [list(row.values()) for row in EXPECTED]
+
+
+def test_dumps_bytes_handles_mysql_types(encoder):
+    value = {
+        "price": Decimal("2.5"),
+        "day": date(2024, 1, 2),
+        "at": datetime(2024, 1, 2, 3, 4, 5),
+        "span": timedelta(minutes=90),
+        "blob": b"abc",
+        "tags": frozenset({"y", "x"}),
+        "missing": None,
+    }
+    assert json.loads(dumps_bytes(value)) == {
+        "price": 2.5,
+        "day": "2024-01-02",
+        "at": "2024-01-02T03:04:05",
+        "span": "01:30:00",
+        "blob": "abc",
+        "tags": ["x", "y"],
+        "missing": None,
+    }
+
+
+def test_dumps_bytes_indent(encoder):
+    assert dumps_bytes({"a": [1]}, indent=True).decode("utf-8").startswith("{\n  ")
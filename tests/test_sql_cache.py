@@ -0,0 +1,125 @@
+import time
+
+import pytest
+
+from app.sql_cache import (
+    MemoryBackend, SQLCache, SQLiteBackend, normalize_question, token_set_similarity
+)
+
+SCHEMA = "Table: orders\nColumns: id, total, created_at"
+
+
+def entry(normalized, sql="SELECT 1", created_at=None, schema_hash="h"):
+    return {
+        "schema_hash": schema_hash,
+        "question": normalized,
+        "normalized": normalized,
+        "sql": sql,
+        "created_at": time.time() if created_at is None else created_at,
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_backend(request, tmp_path):
+    """Builds either backend with the given size and TTL"""
+    def make(max_entries=1000, ttl=3600.0):
+        if request.param == "memory":
+            return MemoryBackend(max_entries, ttl)
+        return SQLiteBackend(str(tmp_path / "cache.db"), max_entries, ttl)
+    return make
+
+
+def test_normalize_question_drops_filler_and_punctuation():
+    assert normalize_question("Can you please show me the Orders?") == "show orders"
+    assert normalize_question("orders with total >= 100") == "orders with total >= 100"
+
+
+def test_token_set_similarity_ignores_plurals():
+    assert token_set_similarity("list orders", "list order") == 1.0
+    assert token_set_similarity("list orders", "") == 0.0
+    assert token_set_similarity("count orders by day", "count orders") == 0.5
+
+
+def test_entries_expire_after_ttl(make_backend):
+    backend = make_backend(ttl=60)
+    backend.set("fresh", entry("fresh"))
+    backend.set("stale", entry("stale", created_at=time.time() - 120))
+    assert backend.get("fresh")["normalized"] == "fresh"
+    assert backend.get("stale") is None
+    assert len(backend) == 1
+
+
+def test_zero_ttl_never_expires(make_backend):
+    backend = make_backend(ttl=0)
+    backend.set("old", entry("old", created_at=0))
+    assert backend.get("old") is not None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", entry("a"))
+    backend.set("b", entry("b"))
+    backend.get("a")
+    backend.set("c", entry("c"))
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.get("c") is not None
+
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=2)
+    now = time.time()
+    backend.set("a", entry("a", created_at=now - 30))
+    backend.set("b", entry("b", created_at=now - 20))
+    backend.get("a")
+    backend.set("c", entry("c", created_at=now - 10))
+    assert backend.get("b") is None
+    assert backend.get("a") is not None
+    assert backend.get("c") is not None
+
+
+def test_exact_and_normalized_hits():
+    cache = SQLCache(MemoryBackend())
+    cache.store("Show me the orders", SCHEMA, "SELECT * FROM orders")
+    assert cache.lookup("Show me the orders", SCHEMA) == ("SELECT * FROM orders", "exact")
+    assert cache.lookup("show orders!", SCHEMA) == ("SELECT * FROM orders", "normalized")
+    assert cache.lookup("show orders", "Table: customers") is None
+
+
+def test_fuzzy_hit_above_threshold():
+    cache = SQLCache(MemoryBackend(), fuzzy_threshold=0.6)
+    cache.store("total of orders per customer", SCHEMA, "SELECT customer_id, SUM(total) FROM orders GROUP BY 1")
+    sql, match = cache.lookup("order total per customer", SCHEMA)
+    assert match == "fuzzy"
+    assert sql.startswith("SELECT customer_id")
+
+
+def test_fuzzy_miss_below_threshold():
+    cache = SQLCache(MemoryBackend(), fuzzy_threshold=0.6)
+    cache.store("total of orders per customer", SCHEMA, "SELECT 1")
+    assert cache.lookup("orders per day", SCHEMA) is None
+
+
+def test_fuzzy_matching_is_off_by_default():
+    cache = SQLCache(MemoryBackend())
+    cache.store("total of orders per customer", SCHEMA, "SELECT 1")
+    assert cache.lookup("order total per customer", SCHEMA) is None
+
+
+def test_fuzzy_matching_stays_within_one_schema():
+    cache = SQLCache(MemoryBackend(), fuzzy_threshold=0.6)
+    cache.store("total of orders per customer", "Table: other", "SELECT 1")
+    assert cache.lookup("order total per customer", SCHEMA) is None
+
+
+def test_stats_count_hits_by_kind():
+    cache = SQLCache(MemoryBackend(), fuzzy_threshold=0.6)
+    cache.store("list orders", SCHEMA, "SELECT * FROM orders")
+    cache.lookup("list orders", SCHEMA)
+    cache.lookup("List the orders", SCHEMA)
+    cache.lookup("list order", SCHEMA)
+    cache.lookup("list customers", SCHEMA)
+    stats = cache.stats()
+    assert stats["lookups"] == 4
+    assert stats["hits"] == 3
+    assert (stats["exact_hits"], stats["normalized_hits"], stats["fuzzy_hits"]) == (1, 1, 1)
@@ -0,0 +1,60 @@
+import pytest
+
+from app.datasources import current_datasource
+from app.sql_safety import UnsafeQueryError, analyze_sql, check_sql_safety
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM orders",
+    "select id from orders where note = 'x; DROP TABLE orders'",
+    "WITH recent AS (SELECT * FROM orders) SELECT * FROM recent",
+    "(SELECT id FROM orders) UNION (SELECT id FROM customers)",
+    "/* report */ SELECT COUNT(*) FROM orders",
+    "SELECT `into` FROM orders",
+])
+def test_allowed(sql):
+    assert analyze_sql(sql).allowed
+
+
+@pytest.mark.parametrize("sql, reason", [
+    ("SELECT 1; DROP TABLE orders", "one statement"),
+    ("SELECT 1; SELECT 2", "one statement"),
+    ("SELECT * FROM orders INTO OUTFILE '/tmp/orders.csv'", "INTO"),
+    ("SELECT * INTO DUMPFILE '/tmp/x' FROM orders", "INTO"),
+    ("SELECT id INTO @id FROM orders LIMIT 1", "INTO"),
+    ("SELECT 1 /*! , (SELECT password FROM mysql.user) */", "Executable comments"),
+    ("/*!50000 DROP TABLE orders */ SELECT 1", "Executable comments"),
+    ("SELECT * FROM orders FOR UPDATE", "Locking"),
+    ("SELECT * FROM orders LOCK IN SHARE MODE", "Locking"),
+    ("SELECT SLEEP(10)", "SLEEP"),
+    ("SELECT id FROM orders WHERE SLEEP(1) = 0", "SLEEP"),
+    ("SELECT BENCHMARK(100000000, MD5('x'))", "BENCHMARK"),
+    ("DELETE FROM orders", "Only SELECT"),
+    ("SHOW TABLES", "Only SELECT"),
+    ("SELECT * FROM mysql.user", "mysql schema"),
+])
+def test_refused(sql, reason):
+    verdict = analyze_sql(sql)
+    assert not verdict.allowed
+    assert reason in verdict.reason
+    with pytest.raises(UnsafeQueryError):
+        check_sql_safety(sql)
+
+
+@pytest.mark.parametrize("sql, tables", [
+    ("SELECT * FROM orders o JOIN sales.Customers c ON c.id = o.customer_id",
+     [(None, "orders"), ("sales", "Customers")]),
+    ("SELECT * FROM t1 STRAIGHT_JOIN t2 ON t1.a = t2.a", [(None, "t1"), (None, "t2")]),
+    ("SELECT * FROM (t1, t2)", [(None, "t1"), (None, "t2")]),
+    ("SELECT * FROM t1 WHERE id IN (SELECT id FROM t2) AND EXISTS (SELECT 1 FROM t1)", [(None, "t1"), (None, "t2")]),
+    ("SELECT EXTRACT(YEAR FROM created), 'from t9' FROM t1", [(None, "t1")]),
+    ("WITH recent AS (SELECT * FROM t1) SELECT * FROM recent", [(None, "t1")]),
+    ("SELECT 1 FROM dual", []),
+])
+def test_tables_read(sql, tables):
+    database = current_datasource().database
+    assert analyze_sql(sql).tables == tuple((schema or database, table) for schema, table in tables)
+
+
+def test_table_functions_leave_tables_unknown():
+    assert analyze_sql("SELECT * FROM JSON_TABLE('[1]', '$[*]' COLUMNS (a INT PATH '$')) AS jt").tables is None
@@ -0,0 +1,62 @@
+import pytest
+
+from app.sql_stream import SQLStreamExtractor
+
+
+def _splits(text):
+    """The text as one piece, one character at a time, and cut in two at every position"""
+    yield [text]
+    yield list(text)
+    for i in range(1, len(text)):
+        yield [text[:i], text[i:]]
+
+
+def _extract(pieces):
+    extractor = SQLStreamExtractor()
+    for piece in pieces:
+        if extractor.feed(piece):
+            break
+    return extractor
+
+
+@pytest.mark.parametrize("completion, sql", [
+    ("SELECT 1;", "SELECT 1;"),
+    ("```sql\nSELECT id FROM t\n```\nThis lists the ids.", "SELECT id FROM t"),
+    ("```\nSELECT 1;\n```", "SELECT 1;"),
+    ("SELECT ';' AS s, \"```\" AS f;", "SELECT ';' AS s, \"```\" AS f;"),
+    ("SELECT `a;b` FROM t;", "SELECT `a;b` FROM t;"),
+    ("SELECT 'it\\'s;' AS s;", "SELECT 'it\\'s;' AS s;"),
+    ("SELECT 1 -- not the end;\n, 2;", "SELECT 1 -- not the end;\n, 2;"),
+    ("SELECT 1 # not the end;\n, 2;", "SELECT 1 # not the end;\n, 2;"),
+    ("SELECT 1 /* ; ``` */ + 2;", "SELECT 1 /* ; ``` */ + 2;"),
+    ("SELECT 10-1;", "SELECT 10-1;"),
+])
+def test_statement_end_survives_any_chunk_boundary(completion, sql):
+    for pieces in _splits(completion + " trailing explanation; more"):
+        extractor = _extract(pieces)
+        assert extractor.complete, pieces
+        assert extractor.sql() == sql, pieces
+
+
+@pytest.mark.parametrize("completion", [
+    "SELECT id FROM t",
+    "SELECT 'open ; quote",
+    "```sql\nSELECT 1 -- ;",
+])
+def test_unterminated_statement_is_not_complete(completion):
+    for pieces in _splits(completion):
+        extractor = _extract(pieces)
+        assert not extractor.complete, pieces
+
+
+def test_sql_without_end_drops_fences():
+    extractor = SQLStreamExtractor()
+    extractor.feed("```sql\nSELECT 1\n")
+    assert extractor.sql() == "SELECT 1"
+
+
+def test_feed_stops_at_the_end():
+    extractor = SQLStreamExtractor()
+    assert extractor.feed("SELECT 1; SELECT 2")
+    assert extractor.feed("; more")
+    assert extractor.sql() == "SELECT 1;"
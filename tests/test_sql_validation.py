@@ -0,0 +1,76 @@
+import pytest
+
+from app import sql_validation
+from app.sql_validation import SQLValidationError, validate_generated_sql, validate_sql
+
+SCHEMA = {
+    "orders": {"columns": [{"Field": "id"}, {"Field": "customer_id"}, {"Field": "total"}]},
+    "customers": {"columns": [{"Field": "id"}, {"Field": "name"}]},
+}
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    """generate_sql_from_nl answering with queued replies; calls records each feedback"""
+    replies, calls = [], []
+
+    def generate(question, schema_text, feedback=None):
+        calls.append(feedback)
+        return replies.pop(0)
+
+    monkeypatch.setattr(sql_validation, "generate_sql_from_nl", generate)
+    monkeypatch.setattr(sql_validation, "SQL_VALIDATION", True)
+    monkeypatch.setattr(sql_validation, "get_sql_cache", lambda: None)
+    return replies, calls
+
+
+def test_issue_kinds():
+    assert validate_sql("SELECT id, total FROM orders", SCHEMA) == []
+    assert [i.kind for i in validate_sql("SELECT id FROM order_items", SCHEMA)] == ["unknown_table"]
+    assert [i.kind for i in validate_sql("SELECT o.amount FROM orders o", SCHEMA)] == ["unknown_column"]
+    assert [i.kind for i in validate_sql("SELECT id FROM orders WHERE (", SCHEMA)] == ["syntax"]
+
+
+def test_syntax_only_issues_are_not_repaired(bedrock):
+    replies, calls = bedrock
+    result = validate_generated_sql("q", "SELECT id FROM orders WHERE (", SCHEMA, "schema", max_attempts=2)
+    assert calls == []
+    assert result.report["outcome"] == "unverified"
+
+
+def test_unknown_column_is_repaired(bedrock):
+    replies, calls = bedrock
+    replies.append("SELECT o.total FROM orders o")
+    result = validate_generated_sql("q", "SELECT o.amount FROM orders o", SCHEMA, "schema", max_attempts=2)
+    assert len(calls) == 1 and "amount" in calls[0]
+    assert result.sql == "SELECT o.total FROM orders o"
+    assert result.report["outcome"] == "repaired"
+
+
+def test_repair_stops_once_only_syntax_issues_remain(bedrock):
+    replies, calls = bedrock
+    replies.extend(["SELECT total FROM orders WHERE (", "SELECT total FROM orders"])
+    result = validate_generated_sql("q", "SELECT amount FROM orders", SCHEMA, "schema", max_attempts=2)
+    assert len(calls) == 1
+    assert result.report["outcome"] == "unverified"
+
+
+def test_unrepaired_catalog_issues_fail(bedrock):
+    replies, calls = bedrock
+    replies.extend(["SELECT amount FROM orders", "SELECT amount FROM orders"])
+    with pytest.raises(SQLValidationError):
+        validate_generated_sql("q", "SELECT amount FROM orders", SCHEMA, "schema", max_attempts=2)
+    assert len(calls) == 2
+
+
+class _SpentBudget:
+    def generation_spent(self):
+        return True
+
+
+def test_no_repair_once_the_generation_deadline_has_passed(bedrock):
+    replies, calls = bedrock
+    with pytest.raises(SQLValidationError):
+        validate_generated_sql("q", "SELECT amount FROM orders", SCHEMA, "schema", max_attempts=2,
+                               budget=_SpentBudget())
+    assert calls == []
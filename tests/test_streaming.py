@@ -0,0 +1,124 @@
+import asyncio
+import threading
+
+import pytest
+from mysql.connector import Error
+
+from app import shared_utils
+from app.streaming import _iterate, ndjson_chunks, open_row_stream
+from app.timeouts import QueryTimeoutError
+
+DESCRIPTION = [("id", 3, None, None, None, None, 1, 0, 63)]
+
+
+class FakePool:
+    def __init__(self):
+        self.killed = []
+
+    def kill_query(self, connection_id):
+        self.killed.append(connection_id)
+        self.connection.interrupted.set()
+
+
+class FakeCursor:
+    """Yields one batch, then blocks in fetchmany until the statement is killed"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.batches = 0
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+        self.description = DESCRIPTION
+
+    def fetchmany(self, size):
+        self.batches += 1
+        if self.batches == 1:
+            return [(1,), (2,)]
+        if not self.connection.interrupted.wait(5):
+            raise AssertionError("statement was never killed")
+        raise Error(msg="Query execution was interrupted", errno=1317)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    connection_id = 42
+
+    def __init__(self):
+        self.pool = FakePool()
+        self.pool.connection = self
+        self.executed = []
+        self.interrupted = threading.Event()
+        self.discarded = threading.Event()
+
+    def cursor(self, buffered=True):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+    def discard(self):
+        self.discarded.set()
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(shared_utils, "get_db_connection", lambda: conn)
+    return conn
+
+
+async def _open(sql, timeout=None):
+    serializer, batches = await open_row_stream(sql, timeout=timeout)
+    return _iterate(ndjson_chunks({}, serializer, batches), batches)
+
+
+def test_stream_without_timeout_has_no_statement_limit(connection):
+    async def main():
+        stream = await _open("SELECT id FROM t")
+        await stream.aclose()
+
+    asyncio.run(main())
+    # QUERY_TIMEOUT is for buffered statements; a long export must not be cut off by it
+    assert connection.executed == ["SELECT id FROM t"]
+
+
+def test_stream_timeout_becomes_the_hint(connection):
+    async def main():
+        stream = await _open("SELECT id FROM t", timeout=120)
+        await stream.aclose()
+
+    asyncio.run(main())
+    assert "MAX_EXECUTION_TIME(1" in connection.executed[0]
+
+
+def test_disconnect_kills_the_streaming_statement(connection):
+    async def main():
+        stream = await _open("SELECT id FROM t")
+        assert (await stream.__anext__()).startswith(b'{"columns"')
+        await stream.__anext__()
+        # The client leaves while a worker is blocked fetching the next batch
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+    asyncio.run(main())
+    assert connection.discarded.wait(5)
+    assert connection.pool.killed == [42]
+
+
+def test_deadline_kills_the_streaming_statement(connection):
+    async def main():
+        stream = await _open("SELECT id FROM t", timeout=0.2)
+        with pytest.raises(QueryTimeoutError):
+            async for _ in stream:
+                pass
+
+    asyncio.run(main())
+    assert connection.pool.killed == [42]
+    assert connection.discarded.wait(5)
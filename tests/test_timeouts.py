@@ -0,0 +1,83 @@
+import pytest
+
+from app import timeouts
+from app.timeouts import with_max_execution_time
+
+HINT = "/*+ MAX_EXECUTION_TIME(1500) */"
+
+
+@pytest.mark.parametrize(
+    "sql, expected",
+    [
+        ("SELECT 1", f"SELECT {HINT} 1"),
+        ("select id from t", f"select {HINT} id from t"),
+        ("/* report */ SELECT 1", f"/* report */ SELECT {HINT} 1"),
+        ("-- daily\nSELECT 1", f"-- daily\nSELECT {HINT} 1"),
+        ("# daily\nSELECT 1", f"# daily\nSELECT {HINT} 1"),
+        (
+            "WITH x AS (SELECT 1 AS a) SELECT a FROM x",
+            f"WITH x AS (SELECT 1 AS a) SELECT {HINT} a FROM x",
+        ),
+        (
+            "-- tree\nWITH RECURSIVE n (i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5) SELECT i FROM n",
+            f"-- tree\nWITH RECURSIVE n (i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 5) SELECT {HINT} i FROM n",
+        ),
+        (
+            "WITH a AS (SELECT 1), b AS (SELECT 2) SELECT * FROM a, b",
+            f"WITH a AS (SELECT 1), b AS (SELECT 2) SELECT {HINT} * FROM a, b",
+        ),
+        ("(SELECT 1) UNION (SELECT 2)", f"(SELECT {HINT} 1) UNION (SELECT 2)"),
+        ("SELECT /*+ BKA(t) */ 1", "SELECT /*+ BKA(t) MAX_EXECUTION_TIME(1500) */ 1"),
+        ("select 'SELECT' as s", f"select {HINT} 'SELECT' as s"),
+    ],
+)
+def test_hint_goes_on_outermost_select(sql, expected):
+    assert with_max_execution_time(sql, 1.5) == expected
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT /*+ MAX_EXECUTION_TIME(10) */ 1",
+        "SHOW TABLES",
+        "DESCRIBE orders",
+        "EXPLAIN SELECT 1",
+    ],
+)
+def test_hint_left_out(sql):
+    assert with_max_execution_time(sql, 1.5) == sql
+
+
+def test_no_timeout_leaves_sql_alone():
+    assert with_max_execution_time("SELECT 1", None) == "SELECT 1"
+    assert with_max_execution_time("SELECT 1", 0) == "SELECT 1"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_generation_share_is_spent_across_stages(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(timeouts, "_clock", clock)
+    monkeypatch.setattr(timeouts, "GENERATION_TIMEOUT_SHARE", 0.5)
+    budget = timeouts.RequestBudget(20)
+    assert budget.for_generation() == pytest.approx(10)
+    clock.now += 4  # generate
+    assert budget.for_generation() == pytest.approx(6)
+    clock.now += 6  # validate and repair
+    assert budget.for_generation() == pytest.approx(0)
+    # Execution still gets the rest of the request budget
+    assert budget.remaining() == pytest.approx(10)
+
+
+def test_stream_budget(monkeypatch):
+    monkeypatch.setattr(timeouts, "STREAM_TIMEOUT", 0)
+    assert timeouts.RequestBudget().for_stream() is None
+    monkeypatch.setattr(timeouts, "STREAM_TIMEOUT", 300)
+    assert timeouts.RequestBudget().for_stream() == 300
+    assert timeouts.RequestBudget(5).for_stream() == pytest.approx(5, abs=0.1)